@@ -0,0 +1,8 @@
+"""Benchmarks of max_dump over the max files of the tests.
+
+    $ python -m benchmarks run -o results.json
+    $ python -m benchmarks run --filter Scene -o new.json --baseline results.json
+    $ python -m benchmarks compare results.json new.json
+
+See `benchmarks.suite'.
+"""
@@ -0,0 +1,86 @@
+"""Command line of the benchmarks, see `benchmarks'.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from benchmarks import suite
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Benchmarks of max_dump')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    help = "Run the benchmarks"
+    run_parser = commands.add_parser('run', help=help)
+    run_parser.add_argument('--data', default=suite.DATA_DIR,
+                            help="Directory of the max files")
+    run_parser.add_argument('--repeat', type=int, default=5,
+                            help="Timed runs of every case")
+    run_parser.add_argument('--filter', dest='pattern',
+                            help="Run the cases whose name or file name "
+                                 "contains the string")
+    run_parser.add_argument('--output', '-o', metavar='FILE',
+                            help="Write the report as JSON to the file")
+    run_parser.add_argument('--synthetic', type=int, nargs='+', default=[],
+                            metavar='OBJECTS',
+                            help="Also run over synthetic files with that "
+                                 "many scene objects, see max_dump.synthetic")
+    run_parser.add_argument('--baseline', metavar='FILE',
+                            help="Compare the results with the report")
+    run_parser.add_argument('--threshold', type=float,
+                            default=suite.THRESHOLD,
+                            help="Relative change reported as a regression")
+
+    help = "Compare a report with a baseline report"
+    compare_parser = commands.add_parser('compare', help=help)
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('report')
+    compare_parser.add_argument('--threshold', type=float,
+                                default=suite.THRESHOLD,
+                                help="Relative change reported as "
+                                     "a regression")
+    args = parser.parse_args(argv)
+
+    if args.command == 'compare':
+        return report_changes(suite.load_report(args.baseline),
+                              suite.load_report(args.report), args.threshold)
+
+    baseline = suite.load_report(args.baseline) if args.baseline else None
+    with tempfile.TemporaryDirectory() as synthetic_dir:
+        cases = suite.collect_cases(args.data, args.pattern)
+        for objects in args.synthetic:
+            fname = os.path.join(synthetic_dir,
+                                 'synthetic-{}.max'.format(objects))
+            cases.extend(suite.synthetic_cases(fname, objects, args.pattern))
+        report = suite.run(
+            cases, args.repeat,
+            progress=lambda result: print(suite.format_result(result),
+                                          flush=True)
+        )
+    if args.output:
+        with open(args.output, 'w') as fout:
+            json.dump(report, fout, indent=4)
+    if baseline is not None:
+        return report_changes(baseline, report, args.threshold)
+    return 0
+
+
+def report_changes(baseline, report, threshold):
+    """Print the changes, return 1 if any of them is a regression.
+    """
+    changes = suite.compare(baseline, report, threshold)
+    for change in changes:
+        print(suite.format_change(change))
+    regressions = sum(change["regression"] for change in changes)
+    print("{} regressions of {} compared metrics".format(regressions,
+                                                          len(changes)))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
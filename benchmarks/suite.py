@@ -0,0 +1,322 @@
+"""Benchmark cases over the max files of a directory and their reports.
+
+Every case is timed `repeat' times after a warm up run, then run once
+more under tracemalloc for the peak of memory it allocates, so the
+timings do not pay for the tracing.
+"""
+import gc
+import glob
+import importlib
+import json
+import os
+import platform
+import time
+import tracemalloc
+from collections import namedtuple
+
+from max_dump import storage_parser as sp
+from max_dump.dump_cameras import dump_cameras
+from max_dump.file_props_parser import PROPS_STREAM, extract_file_props
+from max_dump.max_file import CLASS_DIRECTORY, DLL_DIRECTORY, SCENE, MaxFile
+from max_dump.synthetic import Spec, generate
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                        'max_dump', 'tests', 'data')
+FORMAT_VERSION = 1
+PERCENTILES = (50, 90, 99)
+# Relative slowdown, or growth of the peak memory, reported as a regression
+THRESHOLD = 0.1
+# Smaller slowdowns are noise, in seconds
+MIN_SLOWDOWN = 0.001
+# Property set streams, like the one of file properties, are not chunk
+# streams.
+PROPERTY_SET_PREFIX = '\x05'
+
+# `run(setup())' is measured, `setup' is not.  `size' is the number of
+# bytes and `chunks' the number of chunks the case processes, None if it
+# does not make sense.
+Case = namedtuple('Case', ('name', 'fname', 'setup', 'run', 'size',
+                           'chunks'))
+
+# Decoders of the streams, modules that fail to import are reported as
+# skipped cases.
+DECODERS = (
+    (CLASS_DIRECTORY, 'max_dump.class_directory_3', 'ClassDecoder'),
+    (DLL_DIRECTORY, 'max_dump.dll_directory', 'DllDecoder'),
+)
+
+
+class Skipped(Exception):
+    pass
+
+
+def _no_setup():
+    return None
+
+
+def file_cases(fname):
+    """Return the cases of the max file.
+    """
+    streams = {}
+    with MaxFile(fname) as max_file:
+        for name in max_file.listdir():
+            buf = max_file.read_stream(name)
+            if name.startswith(PROPERTY_SET_PREFIX):
+                streams[name] = (len(buf), None)
+                continue
+            try:
+                streams[name] = (len(buf), _count_chunks(buf))
+            except Exception:
+                streams[name] = (len(buf), None)
+
+    cases = []
+    for name, (size, chunks) in sorted(streams.items()):
+        if chunks is not None:
+            cases.append(Case('storage_parse:' + name, fname, _no_setup,
+                              _storage_parse(fname, name), size, chunks))
+    scene_streams = [streams[name] for name in (SCENE, CLASS_DIRECTORY)
+                     if name in streams]
+    cases.append(Case(
+        'dump_cameras', fname, _no_setup, lambda _: dump_cameras(fname),
+        sum(size for size, _ in scene_streams),
+        sum(chunks or 0 for _, chunks in scene_streams)
+    ))
+    if PROPS_STREAM in streams:
+        cases.append(Case('extract_file_props', fname, _no_setup,
+                          lambda _: extract_file_props(fname),
+                          streams[PROPS_STREAM][0], None))
+    for name in (CLASS_DIRECTORY, DLL_DIRECTORY):
+        if streams.get(name, (0, None))[1] is not None:
+            cases.append(Case('parsed:' + name, fname,
+                              _read_chunks(fname, name), _decode_parsed,
+                              *streams[name]))
+    for name, module, decoder in DECODERS:
+        if streams.get(name, (0, None))[1] is not None:
+            cases.append(Case('decoder:' + module.rsplit('.', 1)[1], fname,
+                              _read_nodes(fname, name),
+                              _decode(module, decoder), *streams[name]))
+    return cases
+
+
+def _storage_parse(fname, name):
+    return lambda _: sp.storage_parse(fname, name)
+
+
+def _read_chunks(fname, name):
+    return lambda: sp.parse_chunks(_read_stream(fname, name))
+
+
+def _read_nodes(fname, name):
+    return lambda: sp.parse_buffer(_read_stream(fname, name))
+
+
+def _decode(module, decoder):
+    return lambda nodes: _load_decoder(module, decoder)().decode(nodes)
+
+
+def _read_stream(fname, name):
+    # A copy, the file is closed.
+    return bytes(sp.read_stream(fname, name))
+
+
+def _count_chunks(buf):
+    count = 0
+    for event in sp.iter_chunks(buf):
+        if event.kind != sp.EXIT:
+            count += 1
+    return count
+
+
+def _decode_parsed(chunks):
+    """Decode every known value, see KNOWN_TYPES.
+    """
+    stack = list(chunks)
+    while stack:
+        chunk = stack.pop()
+        if chunk.is_container():
+            stack.extend(chunk.childs)
+        else:
+            chunk.parsed
+
+
+def _load_decoder(module, decoder):
+    try:
+        return getattr(importlib.import_module(module), decoder)
+    except (ImportError, AttributeError) as e:
+        raise Skipped("{}: {}".format(type(e).__name__, e))
+
+
+def collect_cases(data_dir=DATA_DIR, pattern=None):
+    """Return the cases of the max files in the directory.
+
+    `pattern' keeps the cases whose name or file name contains it.
+    """
+    cases = []
+    for fname in sorted(glob.glob(os.path.join(data_dir, '*.max'))):
+        cases.extend(file_cases(fname))
+    return _matching(cases, pattern)
+
+
+def synthetic_cases(fname, objects, pattern=None):
+    """Generate a synthetic file with that many objects, return its cases.
+
+    The file is the same for the same number of objects.
+    """
+    generate(fname, Spec(objects=objects))
+    return _matching(file_cases(fname), pattern)
+
+
+def _matching(cases, pattern):
+    if pattern:
+        cases = [case for case in cases
+                 if pattern in case.name
+                 or pattern in os.path.basename(case.fname)]
+    return cases
+
+
+def percentile(values, q):
+    """Return the `q' percentile of the sorted values, interpolated.
+    """
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position -
+                                                              lower)
+
+
+def measure(case, repeat=5):
+    """Return the result of the case as a dictionary.
+    """
+    result = {
+        "case": case.name,
+        "file": os.path.basename(case.fname),
+        "size": case.size,
+        "chunks": case.chunks,
+    }
+    try:
+        case.run(case.setup())
+    except Skipped as e:
+        result["skipped"] = str(e)
+        return result
+    except Exception as e:
+        result["error"] = "{}: {}".format(type(e).__name__, e)
+        return result
+
+    times = []
+    for _ in range(repeat):
+        arg = case.setup()
+        gc.collect()
+        start = time.perf_counter()
+        case.run(arg)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    wall = {"min": times[0], "max": times[-1],
+            "mean": sum(times) / len(times)}
+    for q in PERCENTILES:
+        wall["p{}".format(q)] = percentile(times, q)
+    result["repeat"] = repeat
+    result["wall"] = wall
+    median = wall["p50"]
+    if case.size is not None and median:
+        result["mb_per_s"] = case.size / median / 1e6
+    if case.chunks is not None and median:
+        result["chunks_per_s"] = case.chunks / median
+
+    arg = case.setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        case.run(arg)
+        result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result
+
+
+def run(cases, repeat=5, progress=None):
+    """Measure the cases and return the report.
+
+    `progress(result)' is called after every case.
+    """
+    results = []
+    for case in cases:
+        result = measure(case, repeat)
+        results.append(result)
+        if progress is not None:
+            progress(result)
+    return {
+        "version": FORMAT_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def load_report(fname):
+    with open(fname) as fin:
+        report = json.load(fin)
+    if report.get("version") != FORMAT_VERSION:
+        raise ValueError("Unsupported report version in {}: {}"
+                         .format(fname, report.get("version")))
+    return report
+
+
+def compare(baseline, report, threshold=THRESHOLD):
+    """Return the changes of the report against the baseline.
+
+    A change is a dictionary holding the case, the file, the metric,
+    both values, their ratio and whether the change is a regression.
+    Only the median wall time and the peak memory are compared, a median
+    slower by less than MIN_SLOWDOWN is not a regression.
+    """
+    old_results = {(result["case"], result["file"]): result
+                   for result in baseline["results"]}
+    changes = []
+    for result in report["results"]:
+        old = old_results.get((result["case"], result["file"]))
+        if old is None or "wall" not in result or "wall" not in old:
+            continue
+        for metric, old_value, new_value, min_change in (
+                ("p50", old["wall"]["p50"], result["wall"]["p50"],
+                 MIN_SLOWDOWN),
+                ("peak_bytes", old.get("peak_bytes"),
+                 result.get("peak_bytes"), 0)):
+            if not old_value or new_value is None:
+                continue
+            ratio = new_value / old_value
+            changes.append({
+                "case": result["case"],
+                "file": result["file"],
+                "metric": metric,
+                "baseline": old_value,
+                "value": new_value,
+                "ratio": ratio,
+                "regression": (ratio > 1 + threshold
+                               and new_value - old_value > min_change),
+            })
+    return changes
+
+
+def format_result(result):
+    name = "{} {}".format(result["file"], result["case"])
+    for status in ("skipped", "error"):
+        if status in result:
+            return "{:<60} {}: {}".format(name, status, result[status])
+    wall = result["wall"]
+    parts = ["p50 {:8.2f} ms".format(wall["p50"] * 1e3),
+             "p90 {:8.2f} ms".format(wall["p90"] * 1e3)]
+    if "mb_per_s" in result:
+        parts.append("{:8.1f} MB/s".format(result["mb_per_s"]))
+    if "chunks_per_s" in result:
+        parts.append("{:10.0f} chunks/s".format(result["chunks_per_s"]))
+    parts.append("peak {:8.1f} KiB".format(result["peak_bytes"] / 1024))
+    return "{:<60} {}".format(name, "  ".join(parts))
+
+
+def format_change(change):
+    return "{:<60} {:<10} {:>7.1%}{}".format(
+        "{} {}".format(change["file"], change["case"]), change["metric"],
+        change["ratio"] - 1, "  REGRESSION" if change["regression"] else ""
+    )
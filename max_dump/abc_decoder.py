@@ -1,10 +1,19 @@
 import abc
 
+from . import storage_parser as sp
+
 
 class AbstractDecoder(abc.ABC):
-    idn2class_map = {}
-    CONTAINERS = {}
-    NODES = {}
+    # Classes of the decoded chunks, each one decodes the chunks of its
+    # STORAGE_TYPE, see `storage_parser.KNOWN_TYPES'.
+    DECODED_CLASSES = ()
+    # Storage types of the chunks whose children are decoded too
+    CONTAINERS = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.storage_type2class = {klass.STORAGE_TYPE: klass
+                                  for klass in cls.DECODED_CLASSES}
 
     def decode(self, nodes):
         return self._decode_many(nodes)
@@ -14,14 +23,16 @@ class AbstractDecoder(abc.ABC):
 
     def _decode_one(self, node):
         idn = node.idn
-
-        if idn not in self.idn2class_map:
+        known_type = sp.KNOWN_TYPES.get(idn)
+        klass = None
+        if known_type is not None:
+            klass = self.storage_type2class.get(known_type.storage_type)
+        if klass is None:
             self._raise_unknown_id_exc(idn)
 
-        klass = self.idn2class_map[idn]
         decoded_node = klass._decode(node)
 
-        if idn in self.CONTAINERS:
+        if klass.STORAGE_TYPE in self.CONTAINERS:
             decoded_node.childs = self._decode_many(node.childs)
 
         return decoded_node
@@ -0,0 +1,112 @@
+"""asyncio counterparts of the extraction functions.
+
+Reading and parsing a max file is blocking, so the work runs in an
+executor, the default one of the loop unless another is given:
+
+>>> cams = await adump_cameras(max_fname)
+>>> async for max_fname, props in aextract_many(paths, extract_file_props,
+...                                             limit=4):
+...     ...
+
+Cancelling a coroutine cancels the wait, a parse already running in a
+worker thread completes but its result is dropped.
+"""
+import asyncio
+import functools
+
+from . import storage_parser as sp
+from .dump_cameras import dump_cameras
+from .file_props_parser import extract_file_props
+
+
+DEFAULT_LIMIT = 4
+
+
+async def run_blocking(func, *args, executor=None):
+    """Run `func(*args)' in the executor and return its result.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor,
+                                      functools.partial(func, *args))
+
+
+async def adump_cameras(max_file, executor=None):
+    return await run_blocking(dump_cameras, max_file, executor=executor)
+
+
+async def aextract_file_props(max_file, executor=None):
+    return await run_blocking(extract_file_props, max_file,
+                              executor=executor)
+
+
+async def astorage_parse(max_fname, stream_name,
+                         representations=sp.DEFAULT_REPRESENTATIONS,
+                         executor=None):
+    return await run_blocking(
+        functools.partial(sp.storage_parse,
+                          representations=representations),
+        max_fname, stream_name, executor=executor
+    )
+
+
+async def aextract_many(paths, func=dump_cameras, limit=DEFAULT_LIMIT,
+                        executor=None, return_exceptions=False):
+    """Yield (path, func(path)) of the paths in the order they are done.
+
+    At most `limit' calls are in flight, the next path is taken only when
+    a call is done, so a slow consumer holds the producer back.  `paths'
+    may be an iterable or an async iterable.
+
+    An exception of `func' is raised after the calls in flight are
+    cancelled, or yielded in place of the result when `return_exceptions'
+    is true.
+    """
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    loop = asyncio.get_running_loop()
+    next_path = _path_getter(paths)
+    # Futures in flight and their paths
+    pending = {}
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < limit:
+                try:
+                    path = await next_path()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                future = loop.run_in_executor(executor, func, path)
+                pending[future] = path
+            if not pending:
+                return
+            done, _ = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    result = e
+                yield path, result
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _path_getter(paths):
+    """Return a coroutine function returning the next path.
+    """
+    if hasattr(paths, '__aiter__'):
+        return paths.__aiter__().__anext__
+    iterator = iter(paths)
+
+    async def next_path():
+        try:
+            return next(iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+    return next_path
@@ -0,0 +1,237 @@
+"""Run an extraction over many max files with a pool of processes.
+
+    $ max_dump batch --jobs 8 library/ 'renders/**/*.max' > cameras.ndjson
+    $ find . -name '*.max' | max_dump batch --props -
+
+Every file produces one JSON line as soon as it is done, either
+{"path": ..., "ok": true, "result": ...} or
+{"path": ..., "ok": false, "error": {"type": ..., "message": ...}}.
+The largest files are scheduled first, so a huge file does not start last
+and keep the pool waiting for it.  A file that kills its worker gets an
+error record, the other files are run again in a new pool.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from max_dump.cache import ParseCache
+from max_dump.cli import (STREAM_NAMES, PRINTABLE_REPRESENTATIONS,
+                          stream_result)
+from max_dump.dump_cameras import dump_cameras
+from max_dump.file_props_parser import extract_file_props
+from max_dump.max_file import MaxFile
+from max_dump.storage_parser import DEFAULT_REPRESENTATIONS
+
+
+GLOB_CHARS = '*?['
+
+# Cache of a worker process of the pool, see `init_worker'.
+_cache = None
+
+
+def collect_paths(sources, stdin=None):
+    """Return max files of the directories, glob patterns and file names.
+
+    The source '-' reads file names from `stdin', one per line.
+    """
+    paths = []
+    for source in sources:
+        if source == '-':
+            stdin = sys.stdin if stdin is None else stdin
+            paths.extend(line.strip() for line in stdin if line.strip())
+        elif os.path.isdir(source):
+            for root, _, fnames in os.walk(source):
+                paths.extend(os.path.join(root, fname)
+                             for fname in sorted(fnames)
+                             if fname.lower().endswith('.max'))
+        elif any(c in source for c in GLOB_CHARS):
+            paths.extend(sorted(glob.glob(source, recursive=True)))
+        else:
+            paths.append(source)
+    # Drop duplicates, keep the order.
+    return list(dict.fromkeys(paths))
+
+
+def largest_first(paths):
+    def size(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            # Let the worker report the error.
+            return 0
+    return sorted(paths, key=size, reverse=True)
+
+
+def init_worker(cache_dir):
+    global _cache
+    _cache = _make_cache(cache_dir)
+
+
+def _make_cache(cache_dir):
+    return ParseCache(cache_dir) if cache_dir else None
+
+
+def extract(max_fname, mode, stream_name=None,
+            representations=DEFAULT_REPRESENTATIONS, cache=None):
+    if mode == 'cameras':
+        compute = lambda: dump_cameras(max_fname)
+    elif mode == 'props':
+        compute = lambda: extract_file_props(max_fname)
+    else:
+        def compute():
+            with MaxFile(max_fname) as max_file:
+                return stream_result(max_file, stream_name, representations)
+    if cache is None:
+        return compute()
+    return cache.get(max_fname, 'batch_' + mode,
+                     (stream_name, tuple(representations)), compute)
+
+
+def error_record(max_fname, e):
+    return {"path": max_fname, "ok": False,
+            "error": {"type": e.__class__.__name__, "message": str(e)}}
+
+
+def process_file(max_fname, mode, stream_name=None,
+                 representations=DEFAULT_REPRESENTATIONS, cache=None):
+    """Return the record of the file, errors are reported not raised.
+    """
+    try:
+        result = extract(max_fname, mode, stream_name, representations,
+                         cache)
+    except Exception as e:
+        return error_record(max_fname, e)
+    return {"path": max_fname, "ok": True, "result": result}
+
+
+def _process_in_worker(max_fname, mode, stream_name, representations):
+    return process_file(max_fname, mode, stream_name, representations,
+                        _cache)
+
+
+def run_batch(paths, mode, stream_name=None,
+              representations=DEFAULT_REPRESENTATIONS, jobs=1,
+              cache_dir=None):
+    """Yield records of the files in the order they are done.
+
+    A file whose worker dies, or whose result can not be sent back, gets
+    an error record too.  When a worker dies, the files that were in the
+    pool are run again one per pool, so only the file that kills its
+    worker gets the error.
+    """
+    paths = largest_first(paths)
+    args = (mode, stream_name, representations)
+    if jobs == 1:
+        cache = _make_cache(cache_dir)
+        for path in paths:
+            yield process_file(path, *args, cache=cache)
+        return
+    pending = deque(paths)
+    while pending:
+        suspects = yield from _run_pool(pending, args, jobs, cache_dir)
+        if len(suspects) == 1:
+            yield error_record(*suspects[0])
+            continue
+        for path, _ in suspects:
+            for path, e in (yield from _run_pool(deque([path]), args, 1,
+                                                 cache_dir)):
+                yield error_record(path, e)
+
+
+def _run_pool(pending, args, jobs, cache_dir):
+    """Yield records of the files taken from `pending' with a pool of
+    `jobs' processes, running at most `jobs' files at once.
+
+    Return (path, error) of the files running when the pool breaks, the
+    files not yet run stay in `pending'.
+    """
+    running = {}
+    suspects = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                             initargs=(cache_dir, )) as executor:
+        try:
+            while running or pending and not suspects:
+                while pending and not suspects and len(running) < jobs:
+                    path = pending.popleft()
+                    try:
+                        future = executor.submit(_process_in_worker, path,
+                                                 *args)
+                    except BrokenProcessPool:
+                        pending.appendleft(path)
+                        break
+                    running[future] = path
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = running.pop(future)
+                    try:
+                        yield future.result()
+                    except BrokenProcessPool as e:
+                        # Every running file fails with the pool.
+                        suspects.append((path, e))
+                    except Exception as e:
+                        # PicklingError and the like
+                        yield error_record(path, e)
+        finally:
+            for future in running:
+                future.cancel()
+    return suspects
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+            prog='max_dump batch',
+            description='Run an extraction over many max files, '
+                        'print one JSON line per file'
+    )
+    help = "Max files, directories, glob patterns or - to read from stdin"
+    parser.add_argument('sources', nargs='+', metavar='SOURCE', help=help)
+
+    group = parser.add_mutually_exclusive_group()
+    help = "List cameras, the default"
+    group.add_argument('--cameras', dest='mode', action='store_const',
+                       const='cameras', help=help)
+    help = "Extract file properties"
+    group.add_argument('--props', dest='mode', action='store_const',
+                       const='props', help=help)
+    help = "Parse chunk-based stream"
+    group.add_argument('--parse-stream', choices=STREAM_NAMES,
+                       metavar='STREAM_NAME', help=help)
+
+    help = ("Representations of the values of --parse-stream, "
+            "default: {}".format(' '.join(DEFAULT_REPRESENTATIONS)))
+    parser.add_argument('--repr', nargs='+', dest='representations',
+                        choices=PRINTABLE_REPRESENTATIONS,
+                        default=DEFAULT_REPRESENTATIONS, help=help)
+
+    help = "Number of worker processes, default: number of CPUs"
+    parser.add_argument('-j', '--jobs', type=int,
+                        default=os.cpu_count() or 1, help=help)
+
+    help = "Keep results in the directory and reuse them for unchanged files"
+    parser.add_argument('--cache', metavar='DIR', help=help)
+    args = parser.parse_args(argv)
+
+    mode = args.mode or 'cameras'
+    if args.parse_stream:
+        mode = 'parse_stream'
+    paths = collect_paths(args.sources)
+    errors = 0
+    for record in run_batch(paths, mode, args.parse_stream,
+                            args.representations, max(args.jobs, 1),
+                            args.cache):
+        errors += not record["ok"]
+        # One line per record, flushed so that consumers see it at once.
+        sys.stdout.write(json.dumps(record, ensure_ascii=False) + '\n')
+        sys.stdout.flush()
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
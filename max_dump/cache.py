@@ -0,0 +1,233 @@
+"""Cache of extraction results keyed by the identity of the max file.
+
+A file is identified by its resolved path, size, modification time and
+inode; an optional content hash guards against tools that restore the
+modification time.  Results live in an in-process LRU tier and, when a
+directory is given, in an on-disk tier of pickle files whose total size
+is capped.  The least recently used files are removed first.
+
+>>> cache = ParseCache('/var/cache/max_dump')
+>>> cams = cache.dump_cameras(max_fname)
+>>> cache.stats.asdict()
+{'hits': 0, 'disk_hits': 0, 'misses': 1, 'evictions': 0, 'disk_evictions': 0}
+"""
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+import attr
+
+from . import storage_parser as sp
+from .dump_cameras import dump_cameras
+from .file_props_parser import extract_file_props
+
+
+DEFAULT_MAX_ENTRIES = 128
+DEFAULT_MAX_DISK_BYTES = 256 * 1024 * 1024
+HASH_BLOCK_SIZE = 1024 * 1024
+# Eviction removes files until the disk tier is down to that share of its
+# cap, so a full cache is not scanned again on every write.
+DISK_LOW_WATER = 0.9
+SUFFIX = '.pickle'
+
+
+def file_identity(max_fname, content_hash=False):
+    """Return a tuple identifying the current contents of the file.
+
+    The content hash is computed on every call, a file rewritten with its
+    size, inode and modification time kept has the same rest of the
+    identity.
+    """
+    path = os.path.realpath(max_fname)
+    st = os.stat(path)
+    identity = (path, st.st_size, st.st_mtime_ns, st.st_ino)
+    if content_hash:
+        identity += (_content_hash(path), )
+    return identity
+
+
+def _content_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as fin:
+        for block in iter(lambda: fin.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@attr.s(slots=True)
+class CacheStats:
+    hits = attr.ib(default=0)
+    disk_hits = attr.ib(default=0)
+    misses = attr.ib(default=0)
+    evictions = attr.ib(default=0)
+    disk_evictions = attr.ib(default=0)
+
+    def asdict(self):
+        return attr.asdict(self)
+
+
+class ParseCache:
+    """Two tier cache of `storage_parse', `extract_file_props' and
+    `dump_cameras' results.
+
+    Cached results are shared between callers, they must not be modified.
+    """
+
+    def __init__(self, directory=None, max_entries=DEFAULT_MAX_ENTRIES,
+                 max_disk_bytes=DEFAULT_MAX_DISK_BYTES, content_hash=False):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.content_hash = content_hash
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        # bytes in the disk tier as far as this process knows, counted
+        # once it is needed
+        self._disk_bytes = None
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, max_fname, name, args, compute):
+        """Return the cached result of `compute()' for the file.
+
+        `name' and `args' tell apart results of different extractions.
+        """
+        key = (name, args, file_identity(max_fname, self.content_hash))
+        entries = self._entries
+        if key in entries:
+            entries.move_to_end(key)
+            self.stats.hits += 1
+            return entries[key]
+        path = self._disk_path(key)
+        found, result = self._load(path, key)
+        if found:
+            self.stats.disk_hits += 1
+        else:
+            self.stats.misses += 1
+            result = compute()
+            self._dump(path, key, result)
+        entries[key] = result
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self.stats.evictions += 1
+        return result
+
+    def storage_parse(self, max_fname, stream_name,
+                      representations=sp.DEFAULT_REPRESENTATIONS):
+        representations = tuple(representations)
+        return self.get(
+            max_fname, 'storage_parse', (stream_name, representations),
+            lambda: sp.storage_parse(max_fname, stream_name,
+                                     representations=representations)
+        )
+
+    def extract_file_props(self, max_fname):
+        return self.get(max_fname, 'extract_file_props', (),
+                        lambda: extract_file_props(max_fname))
+
+    def dump_cameras(self, max_fname):
+        return self.get(max_fname, 'dump_cameras', (),
+                        lambda: dump_cameras(max_fname))
+
+    def clear(self):
+        """Drop both tiers.
+        """
+        self._entries.clear()
+        self._digests.clear()
+        for path in self._disk_files():
+            _remove(path)
+        self._disk_bytes = None
+
+    def _disk_path(self, key):
+        if self.directory is None:
+            return None
+        name = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, name + SUFFIX)
+
+    def _load(self, path, key):
+        if path is None:
+            return False, None
+        try:
+            with open(path, 'rb') as fin:
+                stored_key, result = pickle.load(fin)
+        except OSError:
+            return False, None
+        except Exception:
+            # A corrupt pickle fails in many ways.
+            _remove(path)
+            return False, None
+        if stored_key != key:
+            return False, None
+        try:
+            # Keep the file recently used for the eviction.
+            os.utime(path)
+        except OSError:
+            pass
+        return True, result
+
+    def _dump(self, path, key, result):
+        if path is None:
+            return
+        if self._disk_bytes is None:
+            self._disk_bytes = self._scan_disk()[1]
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        try:
+            with open(tmp_path, 'wb') as fout:
+                pickle.dump((key, result), fout,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+                size = fout.tell()
+            try:
+                # The file replaced is no longer counted.
+                self._disk_bytes -= os.stat(path).st_size
+            except OSError:
+                pass
+            os.replace(tmp_path, path)
+        except OSError:
+            _remove(tmp_path)
+            return
+        self._disk_bytes += size
+        if self._disk_bytes > self.max_disk_bytes:
+            self._evict_disk()
+
+    def _disk_files(self):
+        if self.directory is None:
+            return []
+        return [os.path.join(self.directory, name)
+                for name in os.listdir(self.directory)
+                if name.endswith(SUFFIX)]
+
+    def _scan_disk(self):
+        """Return (mtime, size, path) of the files of the disk tier and
+        their total size.
+        """
+        files = []
+        total = 0
+        for path in self._disk_files():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime_ns, st.st_size, path))
+            total += st.st_size
+        return files, total
+
+    def _evict_disk(self):
+        # Other processes may share the directory, it is scanned again.
+        files, total = self._scan_disk()
+        files.sort()
+        low_water = self.max_disk_bytes * DISK_LOW_WATER
+        for _, size, path in files:
+            if total <= low_water:
+                break
+            _remove(path)
+            total -= size
+            self.stats.disk_evictions += 1
+        self._disk_bytes = total
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -3,7 +3,6 @@
 import textwrap
 import typing as t
 from enum import Enum
-from struct import unpack
 
 from . import storage_parser as sp
 from . import dll_directory as dld
@@ -12,6 +11,8 @@ from .abc_decoder import AbstractDecoder
 
 
 class ClassHeader(utils.SimpleEqualityMixin, utils.ReprMixin):
+    STORAGE_TYPE = sp.StorageType.CLASS_HEADER
+
     def __init__(
             self,
             dll_index: int,
@@ -25,9 +26,10 @@ class ClassHeader(utils.SimpleEqualityMixin, utils.ReprMixin):
 
     @classmethod
     def _decode(cls, st_value: sp.StorageValue) -> 'ClassHeader':
-        assert len(st_value.value) == 16, \
+        layout = sp.KNOWN_TYPES[st_value.idn].layout
+        assert len(st_value.value) == layout.size, \
             "Length of the class header string must be 16"
-        dll_index, *class_id, super_class_id = unpack('4i', st_value.value)
+        dll_index, *class_id, super_class_id = layout.unpack(st_value.value)
         inst = cls(dll_index, tuple(class_id), super_class_id)
         inst._raw = st_value._raw
         return inst
@@ -50,12 +52,16 @@ class ClassName(
 ):
     """Name of the class.
     """
+    STORAGE_TYPE = sp.StorageType.CLASS_DESCRIPTION
+
     @classmethod
     def _decode(cls, st_value: sp.StorageValue) -> 'ClassName':
         return super()._decode(st_base=st_value)
 
 
 class ClassEntry(utils.SimpleEqualityMixin):
+    STORAGE_TYPE = sp.StorageType.CLASS_ENTRY
+
     def __init__(
             self,
             header: ClassHeader,
@@ -120,12 +126,7 @@ class ClassEntry(utils.SimpleEqualityMixin):
 
 
 class ClassDecoder(AbstractDecoder):
-    idn2class_map = {
-        0x2040: ClassEntry,
-        0x2042: ClassName,
-        0x2060: ClassHeader,
-    }
-    NODES = {0x2042, 0x2060}
+    DECODED_CLASSES = (ClassEntry, ClassName, ClassHeader)
 
     @staticmethod
     def _raise_unknown_id_exc(idn):
@@ -1,47 +1,100 @@
 import argparse
 import json
+import os
+import sys
 
 import attr
 import hexdump
 
 import max_dump
 from max_dump.file_props_parser import extract_file_props
-from max_dump.storage_parser import storage_parse, read_stream
+from max_dump.max_file import MaxFile
+from max_dump.query import QueryError, compile_query
+from max_dump.storage_parser import DEFAULT_REPRESENTATIONS, ParseStats
 from max_dump.class_frontend import terse_class
 from max_dump.dll_frontend import terse_dll
 from max_dump.scene_frontend import link_scene_and_class
 from max_dump.dump_cameras import dump_cameras
+from max_dump.extractors import EXTRACTORS, extract
+from max_dump.json_writer import FORMATS, PRETTY, JsonWriter
+from max_dump.scene_index import get_class_list
+from max_dump.snapshot import export_stream
 
 
 STREAM_NAMES = ('ClassData', 'ClassDirectory3', 'Config', 'DllDirectory',
                 'FileAssetMetaData3', 'SaveConfigData', 'Scene',
                 'ScriptedCustAttribDefs', 'VideoPostQueue')
+# Representations of values that can be printed, the raw `value' can not.
+PRINTABLE_REPRESENTATIONS = ('hex_spaced', 'utf_16', 'ascii', 'parsed')
+# The terse output of these streams is built from parsed values only.
+TERSE_REPRESENTATIONS = ('parsed', )
 
 
 def dumps(c):
     return json.dumps(c, indent=4, ensure_ascii=False)
 
 
-def dump_stream(max_fname, stream_name):
+def dump_stream(max_file, stream_name, out=None):
     """Print contents of the stream as hex string.
     """
-    ba = read_stream(max_fname, stream_name)
-    print(hexdump.dump(ba))
+    ba = max_file.read_stream(stream_name)
+    print(hexdump.dump(ba), file=out)
 
 
-def parse_stream(max_fname, stream_name):
-    c = storage_parse(max_fname, stream_name)
+def parse_stream(max_file, stream_name,
+                 representations=DEFAULT_REPRESENTATIONS, writer=None):
+    """Write the stream as JSON while it is walked, to stdout by default.
+
+    The output is the same as `stream_result' gives.
+    """
+    if writer is None:
+        writer = JsonWriter(sys.stdout)
+    if stream_name in ("DllDirectory", "ClassDirectory3"):
+        writer.write_items(
+            stream_result(max_file, stream_name, representations)
+        )
+        return
+    writer.write_chunks(max_file.iter_stream(stream_name), representations,
+                        class_names(max_file, stream_name))
+
+
+def class_names(max_file, stream_name):
+    """Return the class names added to the objects of the stream by hex
+    index, see `JsonWriter.write_chunks'.
+    """
+    if stream_name != "Scene":
+        return None
+    return {hex(idx): name for idx, (name, _)
+            in enumerate(get_class_list(max_file))}
+
+
+def stream_result(max_file, stream_name,
+                  representations=DEFAULT_REPRESENTATIONS):
+    """Return the stream as printed by --parse-stream.
+    """
+    if stream_name in ("DllDirectory", "ClassDirectory3"):
+        representations = TERSE_REPRESENTATIONS
+    c = max_file.storage_parse(stream_name, representations=representations)
     if stream_name == "DllDirectory":
         c = terse_dll(c)
     elif stream_name == "ClassDirectory3":
         c = terse_class(c)
     elif stream_name == "Scene":
-        class_data = storage_parse(max_fname, "ClassDirectory3")
+        class_data = max_file.storage_parse(
+            "ClassDirectory3", representations=TERSE_REPRESENTATIONS
+        )
         c = link_scene_and_class(c, class_data, tersed=False)
-    print(dumps(c))
+    return c
+
 
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ['batch']:
+        # Imported here, the batch module imports this one.
+        from max_dump import batch
+        sys.exit(batch.main(argv[1:]))
 
-def main():
     parser = argparse.ArgumentParser(
             description='List cameras in the max file'
     )
@@ -54,22 +107,116 @@ def main():
     parser.add_argument('--parse-stream', choices=STREAM_NAMES,
                         metavar='STREAM_NAME', help=help)
 
+    help = ("Print chunks matching the query, "
+            "like DllDirectory/0x2038/0x2037 or Scene/*/*[class=Node]/0x962")
+    parser.add_argument('--query', help=help)
+
+    help = ("Representations of the values printed by --parse-stream "
+            "and --query, "
+            "default: {}".format(' '.join(DEFAULT_REPRESENTATIONS)))
+    parser.add_argument('--repr', nargs='+', dest='representations',
+                        choices=PRINTABLE_REPRESENTATIONS,
+                        default=DEFAULT_REPRESENTATIONS, help=help)
+
+    help = ("Run the extractors in one pass and print their results, "
+            "default: all of them")
+    parser.add_argument('--extract', nargs='*', choices=list(EXTRACTORS),
+                        metavar='EXTRACTOR', help=help)
+
+    help = ("Write the binary snapshot of the --parse-stream stream to "
+            "the file instead of printing the stream")
+    parser.add_argument('--snapshot', metavar='FILE', help=help)
+
+    help = ("Write every stream of the file parsed to a file of its name "
+            "in the directory")
+    parser.add_argument('--dump-all', metavar='DIR', help=help)
+
+    help = ("Number of worker processes of --dump-all, "
+            "default: number of CPUs")
+    parser.add_argument('-j', '--jobs', type=int,
+                        default=os.cpu_count() or 1, help=help)
+
     help = "Print contents of the stream as hex string"
     parser.add_argument('--dump-stream', choices=STREAM_NAMES,
                         metavar='STREAM_NAME', help=help)
-    args = parser.parse_args()
-
-    if args.parse_stream:
-        parse_stream(args.max_fname, args.parse_stream)
-    elif args.dump_stream:
-        dump_stream(args.max_fname, args.dump_stream)
-    elif args.props:
-        props = extract_file_props(args.max_fname)
-        out = json.dumps(props, indent=4)
-        print(out)
+
+    help = "Write parser counters and decoder timings as JSON to the file"
+    parser.add_argument('--stats', metavar='FILE', help=help)
+
+    help = ("Format of the JSON output, ndjson prints a line per item, "
+            "a line per chunk for --parse-stream, default: {}".format(PRETTY))
+    parser.add_argument('--format', choices=FORMATS, default=PRETTY,
+                        help=help)
+
+    help = "Write the output to the file instead of stdout"
+    parser.add_argument('--output', '-o', metavar='FILE', help=help)
+    args = parser.parse_args(argv)
+    if args.snapshot and not args.parse_stream:
+        parser.error("--snapshot requires --parse-stream")
+    if args.query:
+        try:
+            args.query = compile_query(args.query)
+        except QueryError as e:
+            parser.error(str(e))
+
+    if args.stats:
+        with ParseStats() as stats:
+            run(args)
+        with open(args.stats, 'w') as fout:
+            json.dump(stats.asdict(), fout, indent=4)
     else:
-        cams = dump_cameras(args.max_fname)
-        print(dumps(cams))
+        run(args)
+
+
+def run(args):
+    if args.snapshot:
+        export_stream(args.max_fname, args.parse_stream, args.snapshot)
+        return
+    if args.dump_all:
+        # Imported here, the parallel module imports this one.
+        from max_dump.parallel import dump_streams
+        os.makedirs(args.dump_all, exist_ok=True)
+        errors = dump_streams(args.max_fname, args.dump_all,
+                              representations=args.representations,
+                              fmt=args.format, jobs=max(args.jobs, 1))
+        for name, error in errors.items():
+            print("{}: {}: {}".format(name, type(error).__name__, error),
+                  file=sys.stderr)
+        if errors:
+            sys.exit(1)
+        return
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as out:
+            write_output(args, out)
+        return
+    try:
+        write_output(args, sys.stdout)
+    except BrokenPipeError:
+        # The reader of the pipe is gone, like `head' is.  Python would
+        # complain again flushing stdout on exit.
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
+
+
+def write_output(args, out):
+    writer = JsonWriter(out, args.format)
+    with MaxFile(args.max_fname) as max_file:
+        if args.parse_stream:
+            parse_stream(max_file, args.parse_stream, args.representations,
+                         writer)
+        elif args.query:
+            chunks = args.query.run(max_file)
+            writer.write_items(chunk.asdict(args.representations)
+                               for chunk in chunks)
+        elif args.extract is not None:
+            writer.write_value(extract(max_file, args.extract or None))
+        elif args.dump_stream:
+            dump_stream(max_file, args.dump_stream, out)
+        elif args.props:
+            writer.write_value(extract_file_props(max_file))
+        else:
+            writer.write_items(dump_cameras(max_file))
 
 
 if __name__ == "__main__":
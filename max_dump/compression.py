@@ -0,0 +1,95 @@
+"""Compressed streams.
+
+A max file saved with compression keeps its streams deflated, each one
+with a gzip or a zlib header.  A stream is inflated incrementally, either
+piece by piece for a streaming parser or into a single growing buffer.
+"""
+import zlib
+
+
+GZIP_MAGIC = b'\x1f\x8b'
+# wbits of zlib.decompressobj
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+ZLIB_WBITS = zlib.MAX_WBITS
+# Compressed bytes fed to the decompressor at a time
+FEED_SIZE = 64 * 1024
+# Largest piece of inflated data produced at a time
+PIECE_SIZE = 64 * 1024
+# Compressed bytes inflated to tell a zlib header from a raw stream that
+# happens to start like one, like a chunk of the idn 0x2078 does
+PROBE_SIZE = 1024
+
+
+class CompressionError(Exception):
+    pass
+
+
+def detect(buf):
+    """Return wbits to inflate the stream with, None if it is not compressed.
+
+    A zlib header is only two bytes, and 67 of the chunk idns make one, so
+    the start of the stream has to inflate too.  Chunk streams are told
+    apart by `storage_parser.stream_wbits'.
+    """
+    head = bytes(buf[:2])
+    if len(head) < 2:
+        return None
+    if head == GZIP_MAGIC:
+        return GZIP_WBITS
+    cmf, flg = head
+    # deflate with a window of at most 32K, and the header check bits
+    if (cmf & 0x0f == 8 and cmf >> 4 <= 7 and (cmf << 8 | flg) % 31 == 0
+            and _inflates(buf, ZLIB_WBITS)):
+        return ZLIB_WBITS
+    return None
+
+
+def _inflates(buf, wbits):
+    decompressor = zlib.decompressobj(wbits)
+    try:
+        decompressor.decompress(bytes(buf[:PROBE_SIZE]), PIECE_SIZE)
+    except zlib.error:
+        return False
+    return True
+
+
+def iter_inflate(buf, wbits=None, piece_size=PIECE_SIZE):
+    """Yield the inflated stream held by `buf' in pieces.
+
+    At most `piece_size' bytes are inflated ahead of the consumer.
+    """
+    if wbits is None:
+        wbits = detect(buf)
+        if wbits is None:
+            raise CompressionError("The stream is not compressed")
+    buf = memoryview(buf)
+    decompressor = zlib.decompressobj(wbits)
+    try:
+        for start in range(0, len(buf), FEED_SIZE):
+            data = buf[start:start + FEED_SIZE]
+            while data:
+                piece = decompressor.decompress(data, piece_size)
+                if piece:
+                    yield piece
+                if decompressor.eof:
+                    return
+                data = decompressor.unconsumed_tail
+        piece = decompressor.flush()
+        if piece:
+            yield piece
+    except zlib.error as e:
+        raise CompressionError("Invalid compressed stream: {}".format(e))
+    if not decompressor.eof:
+        raise CompressionError("Truncated compressed stream")
+
+
+def inflate(buf, wbits=None):
+    """Return the inflated stream as a memoryview of a single buffer.
+
+    The pieces are appended to the buffer as they are inflated, so the
+    inflated data is not held twice.
+    """
+    inflated = bytearray()
+    for piece in iter_inflate(buf, wbits):
+        inflated += piece
+    return memoryview(inflated)
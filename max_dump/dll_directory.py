@@ -18,6 +18,8 @@ class DllEntry(
         utils.DecodeBaseMixin,
         utils.SimpleEqualityMixin,
 ):
+    STORAGE_TYPE = sp.StorageType.DLL_ENTRY
+
     def __init__(
             self,
             name: str,
@@ -53,6 +55,8 @@ class DllName(
 ):
     """Name of the dll.
     """
+    STORAGE_TYPE = sp.StorageType.DLL_NAME
+
     @classmethod
     def _decode(cls, st_value: sp.StorageValue) -> 'DllName':
         return super()._decode(st_base=st_value)
@@ -67,6 +71,8 @@ class DllDescription(
 ):
     """Description of the dll.
     """
+    STORAGE_TYPE = sp.StorageType.DLL_DESCRIPTION
+
     @classmethod
     def _decode(cls, st_value: sp.StorageValue) -> 'DllDescription':
         return super()._decode(st_base=st_value)
@@ -79,6 +85,7 @@ class DllHeader(
 ):
     """Header of the DllDirectory stream.
     """
+    STORAGE_TYPE = sp.StorageType.DLL_HEADER
 
     def __init__(self, value: bytes) -> None:
         self.value = value
@@ -104,14 +111,7 @@ class DllHeader(
 
 
 class DllDecoder(AbstractDecoder):
-    idn2class_map = {
-        0x2037: DllName,
-        0x2038: DllEntry,
-        0x2039: DllDescription,
-        0x21c0: DllHeader,
-    }
-    #  CONTAINERS = {0x2038}
-    NODES = {0x2037, 0x2039, 0x21c0}
+    DECODED_CLASSES = (DllName, DllEntry, DllDescription, DllHeader)
 
     @staticmethod
     def _raise_unknown_id_exc(idn):
@@ -0,0 +1,214 @@
+"""Run several extractions over a max file in one pass.
+
+An extractor declares what it is interested in and receives callbacks
+while the engine walks ClassDirectory3 and Scene once for all of them:
+
+    super_class_ids  `visit_object(index, idx)' is called for every scene
+                     object of a class with one of these super class ids
+    idns             `visit_chunk(event)' is called for every ChunkEvent of
+                     the Scene stream with one of these idns
+
+`finish(context)' returns the result of the extractor.  Extractors are
+registered by name:
+
+>>> @register
+... class Helpers(Extractor):
+...     name = 'helpers'
+...     super_class_ids = {HELPER_SUPER_CLASS_ID}
+...     def start(self, context):
+...         self.count = 0
+...     def visit_object(self, index, idx):
+...         self.count += 1
+...     def finish(self, context):
+...         return self.count
+>>> extract(max_fname, ['cameras', 'helpers'])
+{'cameras': [...], 'helpers': 3}
+"""
+import abc
+from collections import OrderedDict
+
+import attr
+
+from . import storage_parser as sp
+from .dump_cameras import CAMERA_SUPER_CLASS_ID
+from .file_props_parser import extract_file_props
+from .max_file import session
+from .scene_index import SceneIndex, get_class_list, selector
+
+
+# Super class ids of the scene objects, see SClass_ID of the 3ds Max SDK
+GEOMETRY_SUPER_CLASS_ID = 0x10
+LIGHT_SUPER_CLASS_ID = 0x30
+SHAPE_SUPER_CLASS_ID = 0x40
+HELPER_SUPER_CLASS_ID = 0x50
+
+EXTRACTORS = OrderedDict()
+
+
+def register(cls):
+    """Register the extractor class under its name.
+    """
+    EXTRACTORS[cls.name] = cls
+    return cls
+
+
+@attr.s(slots=True)
+class Context:
+    max_file = attr.ib()
+    # None unless an extractor needs the Scene stream
+    class_list = attr.ib(default=None)
+    # SceneIndex, None until the Scene stream is walked
+    index = attr.ib(default=None)
+
+
+class Extractor(abc.ABC):
+    name = None
+    super_class_ids = frozenset()
+    idns = frozenset()
+    # Whether ClassDirectory3 and the Scene stream have to be walked for
+    # the extractor
+    needs_scene = True
+
+    def start(self, context):
+        pass
+
+    def visit_object(self, index, idx):
+        pass
+
+    def visit_chunk(self, event):
+        pass
+
+    @abc.abstractmethod
+    def finish(self, context):
+        pass
+
+
+class _NodesReferringExtractor(Extractor):
+    """Names of the Nodes referring to objects of the super classes.
+    """
+
+    def start(self, context):
+        self.objects = set()
+
+    def visit_object(self, index, idx):
+        self.objects.add(idx)
+
+    def finish(self, context):
+        index = context.index
+        names = []
+        for node in index.objects_of_class_name("Node"):
+            for ref in index.refs(node):
+                if ref in self.objects:
+                    names.append(index.name(node))
+        return names
+
+
+@register
+class CamerasExtractor(_NodesReferringExtractor):
+    """The same as `dump_cameras'.
+    """
+    name = 'cameras'
+    super_class_ids = frozenset({CAMERA_SUPER_CLASS_ID})
+
+
+@register
+class LightsExtractor(_NodesReferringExtractor):
+    name = 'lights'
+    super_class_ids = frozenset({LIGHT_SUPER_CLASS_ID})
+
+
+@register
+class GeometryCountsExtractor(Extractor):
+    """Number of geometry objects by class name.
+    """
+    name = 'geometry_counts'
+    super_class_ids = frozenset({GEOMETRY_SUPER_CLASS_ID})
+
+    def start(self, context):
+        self.counts = OrderedDict()
+
+    def visit_object(self, index, idx):
+        class_name = index.class_name(idx)
+        self.counts[class_name] = self.counts.get(class_name, 0) + 1
+
+    def finish(self, context):
+        return dict(self.counts)
+
+
+@register
+class NodeNamesExtractor(Extractor):
+    name = 'node_names'
+
+    def finish(self, context):
+        names = context.index.names
+        return [names[idx] for idx in sorted(names)]
+
+
+@register
+class PropsExtractor(Extractor):
+    """The same as `extract_file_props'.
+    """
+    name = 'props'
+    needs_scene = False
+
+    def finish(self, context):
+        return extract_file_props(context.max_file)
+
+
+def _dispatch_chunks(events, by_idn):
+    for event in events:
+        if event.kind != sp.EXIT:
+            for extractor in by_idn.get(event.idn, ()):
+                extractor.visit_chunk(event)
+        yield event
+
+
+def extract(max_file, extractors=None):
+    """Run the extractors over the file and return their results by name.
+
+    `extractors' are names of registered extractors or Extractor
+    instances, all the registered ones by default.  The file is opened,
+    and ClassDirectory3 and Scene are parsed, once, and only if an
+    extractor needs them.
+    """
+    if extractors is None:
+        extractors = list(EXTRACTORS)
+    extractors = [EXTRACTORS[x]() if isinstance(x, str) else x
+                  for x in extractors]
+    with session(max_file) as max_file:
+        context = Context(max_file)
+        needs_scene = any(extractor.needs_scene for extractor in extractors)
+        if needs_scene:
+            context.class_list = get_class_list(max_file)
+        for extractor in extractors:
+            extractor.start(context)
+        if needs_scene:
+            context.index = _walk_scene(context, extractors)
+        return {extractor.name: extractor.finish(context)
+                for extractor in extractors}
+
+
+def _walk_scene(context, extractors):
+    class_list = context.class_list
+    by_idn = {}
+    for extractor in extractors:
+        for idn in extractor.idns:
+            by_idn.setdefault(idn, []).append(extractor)
+    max_file = context.max_file
+    if by_idn:
+        # The chunks may be anywhere, the whole stream is walked.
+        events = _dispatch_chunks(max_file.iter_stream("Scene"), by_idn)
+    else:
+        events = max_file.iter_stream("Scene", selector(class_list))
+    index = SceneIndex.from_events(events, class_list)
+
+    by_class = {}
+    for class_idx, (_, header) in enumerate(class_list):
+        interested = [extractor for extractor in extractors
+                      if header.super_class_id in extractor.super_class_ids]
+        if interested:
+            by_class[class_idx] = interested
+    for idx, class_idx in enumerate(index.classes):
+        for extractor in by_class.get(class_idx, ()):
+            extractor.visit_object(index, idx)
+    return index
@@ -1,89 +1,70 @@
 """Extract file properties from 3ds max file.
 """
-import io
 import json
 import sys
 from collections import OrderedDict
-from struct import unpack
+from struct import Struct
 
-import olefile
+from .max_file import session
+from .utils import INT_S
 
-from .utils import read_int, INT_S
+PROPS_STREAM = '\x05DocumentSummaryInformation'
+HEADER_MARKER = b'\x1e\x00\x00\x00'
+HEADER_DELIMITER = b'\x03\x00\x00\x00'
+PROPS_MARKER = b'\x1e\x10\x00\x00'
+# marker or string length followed by an integer
+PAIR_STRUCT = Struct('<4si')
+INT_STRUCT = Struct('<i')
 
 
-def read_int(bio):
-    return unpack('i', bio.read(INT_S))[0]
-
-
-def read_str(bio):
-    # first read length
-    str_len = read_int(bio)
-    # then string
-    res_str = bio.read(str_len).partition(b'\0')[0]
-    return res_str.decode()
-
-
-def unread(bio, chunk):
-    bio.seek(-len(chunk), 1)
-
-
-def get_headers(bio, marker):
-    """An array of headers from contents page.
+def parse_props(buf):
+    """Return headers and their properties out of the stream contents.
 
     Somewhat like MaxScript's
         fileproperties.getPropertyValue #contents 1
+    gives the headers.  `count' is the number of the properties of a
+    header, listed in `items'.
     """
-    delim = b'\x03\x00\x00\x00'
+    data = bytes(buf)
+    pos = data.index(HEADER_MARKER)
+    unpack_int = INT_STRUCT.unpack_from
+    unpack_pair = PAIR_STRUCT.unpack_from
     headers = OrderedDict()
-    while True:
-        buf = bio.read(INT_S)
-        if not buf == marker:
-            unread(bio, buf)
-            break
-        head = read_str(bio)
-        assert delim == bio.read(INT_S)
-        count = read_int(bio)
-        # `count` is a number of properties that belong to the header.
+    while data.startswith(HEADER_MARKER, pos):
+        str_len, = unpack_int(data, pos + INT_S)
+        pos += 2 * INT_S
+        head = data[pos:pos + str_len].partition(b'\0')[0].decode()
+        pos += str_len
+        delim, count = unpack_pair(data, pos)
+        assert delim == HEADER_DELIMITER
+        pos += PAIR_STRUCT.size
         headers[head] = {"count": count}
-    return headers
-
-
-def read_props(bio, headers):
-    """Read properties for each header.
 
-    Order of headers and `count` are important.
-    """
-    prop_start = b'\x1e\x10\x00\x00'
-    assert prop_start == bio.read(INT_S)
-    prop_count = read_int(bio)
-    for head in headers:
-        items = headers[head]['items'] = []
-        count = headers[head]['count']
-        i = 0
-        while i < count:
-            item = read_str(bio)
-            items.append(item)
-            i += 1
-        prop_count -= i
+    prop_start, prop_count = unpack_pair(data, pos)
+    assert prop_start == PROPS_MARKER
+    pos += PAIR_STRUCT.size
+    for header in headers.values():
+        items = header['items'] = []
+        for _ in range(header['count']):
+            str_len, = unpack_int(data, pos)
+            pos += INT_S
+            items.append(data[pos:pos + str_len].partition(b'\0')[0]
+                         .decode())
+            pos += str_len
+        prop_count -= header['count']
     assert prop_count == 0, ("The actual number of properties does not match "
                              "the one declared")
     return headers
 
 
-def extract_file_props(max_fname):
-    marker = b'\x1e\x00\x00\x00'
-    ole = olefile.OleFileIO(max_fname)
-    # NOTE: Хранение всего файла в оперативной памяти можно избежать
-    # но 3д макс будет крашиться если открыть этот же файл в нем.
-    bytes_ = ole.openstream('\x05DocumentSummaryInformation').read()
-    ole.close()
-    idx = bytes_.index(marker)
-    bytes_ = bytes_[idx:]
-    bio = io.BytesIO(bytes_)
+def extract_file_props(max_file):
+    """Return file properties, `max_file' is a file name or a MaxFile.
 
-    headers = get_headers(bio, marker)
-    props = read_props(bio, headers)
-    return props
+    Only the OLE header, the directory entries on the way to the stream
+    and the sectors of the stream are read.
+    """
+    with session(max_file) as max_file:
+        return parse_props(max_file.read_stream(PROPS_STREAM))
 
 
 def main():
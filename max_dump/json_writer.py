@@ -0,0 +1,254 @@
+"""Write JSON output while it is produced.
+
+A parsed chunk stream is written out event by event, so nothing of the
+stream is kept but the open containers:
+
+>>> writer = JsonWriter(sys.stdout, NDJSON)
+>>> with MaxFile(max_fname) as max_file:
+...     writer.write_chunks(max_file.iter_stream('Scene'))
+
+Formats:
+
+    pretty   the same text as `json.dumps(..., indent=4)'
+    compact  no whitespace at all
+    ndjson   a line per item, a chunk is written with the idns of its
+             parents and without its children
+"""
+import json
+from collections import namedtuple
+
+from . import storage_parser as sp
+
+
+PRETTY = 'pretty'
+COMPACT = 'compact'
+NDJSON = 'ndjson'
+FORMATS = (PRETTY, COMPACT, NDJSON)
+INDENT = ' ' * 4
+# Pending text is written and flushed once there is that much of it.
+FLUSH_SIZE = 64 * 1024
+# Kind of Rendered
+RENDERED = 'rendered'
+
+# Chunks written by `write_chunk_items' apart, to be passed among the
+# ChunkEvent to `write_chunks'.
+Rendered = namedtuple('Rendered', ('kind', 'text'))
+
+
+def rendered(text):
+    return Rendered(RENDERED, text)
+
+
+class JsonWriter:
+    """Write JSON documents to a text file, a document per call.
+
+    The text is written in parts of about `flush_size' characters and the
+    file is flushed after each one, so a reader of a pipe sees the output
+    at once, and a slow reader blocks the writer instead of letting the
+    pending text grow.
+    """
+
+    def __init__(self, out, fmt=PRETTY, flush_size=FLUSH_SIZE):
+        if fmt not in FORMATS:
+            raise ValueError("Unknown format: {}".format(fmt))
+        self.out = out
+        self.fmt = fmt
+        self.flush_size = flush_size
+        self._pending = []
+        self._pending_size = 0
+        if fmt == PRETTY:
+            self._encoder = json.JSONEncoder(indent=4, ensure_ascii=False)
+            self._colon = ': '
+        else:
+            self._encoder = json.JSONEncoder(separators=(',', ':'),
+                                             ensure_ascii=False)
+            self._colon = ':'
+
+    def write_value(self, obj):
+        """Write `obj' as a single document.
+        """
+        self._write(self._encoder.encode(obj))
+        self._end_document()
+
+    def write_items(self, items):
+        """Write an array of the items as they are produced.
+
+        NDJSON gets a line per item.
+        """
+        if self.fmt == NDJSON:
+            for item in items:
+                self._write(self._encoder.encode(item))
+                self._write('\n')
+            self.flush()
+            return
+        self._write('[')
+        empty = True
+        for item in items:
+            self._write(('' if empty else ',') + self._newline(1) +
+                        self._encode(item, 1))
+            empty = False
+        self._write(']' if empty else self._newline(0) + ']')
+        self._end_document()
+
+    def write_chunks(self, events, representations=sp.DEFAULT_REPRESENTATIONS,
+                     class_names=None):
+        """Write the chunks of ChunkEvent the way `storage_parse' renders
+        them.
+
+        `class_names' maps the hex idns of the objects in the first top
+        level container to the names added to their headers, like
+        `scene_frontend.link_scene_and_class' does.  Rendered items may
+        take the place of some of the events.
+        """
+        if self.fmt == NDJSON:
+            self._write_chunk_lines(events, representations, class_names)
+            self.flush()
+            return
+        self._write('[')
+        if self._write_chunk_tree(events, representations, class_names):
+            self._write(self._newline(0))
+        self._write(']')
+        self._end_document()
+
+    def write_chunk_items(self, events,
+                          representations=sp.DEFAULT_REPRESENTATIONS,
+                          class_names=None, depth=0, path=(),
+                          first_top_level=True):
+        """Write the chunks of a part of a stream for `write_chunks' to
+        pass on as Rendered.
+
+        The chunks are written as items of the array nested at `depth',
+        with no brackets around and no separator before them, or as lines
+        of the chunks under the idns of `path'.  `first_top_level' tells
+        whether the part is in the first top level chunk of the stream.
+        """
+        if self.fmt == NDJSON:
+            self._write_chunk_lines(events, representations, class_names,
+                                    depth, path, first_top_level)
+        else:
+            self._write_chunk_tree(events, representations, class_names,
+                                   depth, first_top_level)
+        self.flush()
+
+    def _write_chunk_tree(self, events, representations, class_names,
+                          depth=0, first_top_level=True):
+        """Write the chunks as items, return whether there are any.
+        """
+        colon = self._colon
+        # whether the array of the top level and of every open container
+        # has items yet
+        has_items = [False]
+        for event in events:
+            if event.kind == RENDERED:
+                if event.text:
+                    if has_items[-1]:
+                        self._write(',')
+                    self._write(event.text)
+                    has_items[-1] = True
+                continue
+            event_depth = depth + event.depth
+            # the chunk is an item of an array at `level'
+            level = 2 * event_depth + 1
+            if event.kind == sp.EXIT:
+                if has_items.pop():
+                    self._write(self._newline(level + 1) + ']')
+                else:
+                    self._write(']')
+                self._write(self._newline(level) + '}')
+                if event_depth == 0:
+                    first_top_level = False
+                continue
+            separator = ',' if has_items[-1] else ''
+            has_items[-1] = True
+            if event.kind == sp.VALUE:
+                chunk = sp.StorageValue(event.header, event.value,
+                                        depth=event_depth)
+                rendered = chunk.asdict(representations)
+                _add_class_name(rendered["header"], event_depth, class_names,
+                                first_top_level)
+                self._write(separator + self._newline(level) +
+                            self._encode(rendered, level))
+                continue
+            header = sp.StorageContainer(event.header, [],
+                                         depth=event_depth).header_asdict()
+            _add_class_name(header, event_depth, class_names,
+                            first_top_level)
+            self._write(
+                separator + self._newline(level) + '{' +
+                self._newline(level + 1) + '"header"' + colon +
+                self._encode(header, level + 1) + ',' +
+                self._newline(level + 1) + '"childs"' + colon + '['
+            )
+            has_items.append(False)
+        return has_items[0]
+
+    def _write_chunk_lines(self, events, representations, class_names,
+                           depth=0, path=(), first_top_level=True):
+        path = list(path)
+        for event in events:
+            if event.kind == RENDERED:
+                self._write(event.text)
+                continue
+            event_depth = depth + event.depth
+            if event.kind == sp.EXIT:
+                path.pop()
+                if event_depth == 0:
+                    first_top_level = False
+                continue
+            if event.kind == sp.VALUE:
+                chunk = sp.StorageValue(event.header, event.value,
+                                        depth=event_depth)
+                rendered = chunk.asdict(representations)
+            else:
+                chunk = sp.StorageContainer(event.header, [],
+                                            depth=event_depth)
+                rendered = {"header": chunk.header_asdict()}
+            _add_class_name(rendered["header"], event_depth, class_names,
+                            first_top_level)
+            line = {"path": list(path)}
+            line.update(rendered)
+            self._write(self._encoder.encode(line))
+            self._write('\n')
+            if event.kind == sp.ENTER:
+                path.append(hex(event.idn))
+
+    def flush(self):
+        if self._pending:
+            self.out.write(''.join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+        self.out.flush()
+
+    def _write(self, text):
+        self._pending.append(text)
+        self._pending_size += len(text)
+        if self._pending_size >= self.flush_size:
+            self.flush()
+
+    def _end_document(self):
+        self._write('\n')
+        self.flush()
+
+    def _newline(self, level):
+        if self.fmt == PRETTY:
+            return '\n' + INDENT * level
+        return ''
+
+    def _encode(self, obj, level):
+        """Encode `obj' to be written at the indentation `level'.
+        """
+        text = self._encoder.encode(obj)
+        if self.fmt == PRETTY and level:
+            # Strings are encoded with escaped newlines, every newline
+            # starts a line of the document.
+            text = text.replace('\n', self._newline(level))
+        return text
+
+
+def _add_class_name(header, depth, class_names, first_top_level):
+    if class_names is not None and first_top_level and depth == 1:
+        # Objects whose idn is not a class index get no name, like in
+        # `link_scene_and_class'.
+        name = class_names.get(header["idn"])
+        if name is not None:
+            header["class_name"] = name
@@ -0,0 +1,130 @@
+"""Lazy chunk tree.
+
+Headers of a container's children are scanned only when the children are
+accessed for the first time.  Scanned child lists are kept in a bounded
+LRU cache, so walking a huge stream does not keep every level resident.
+"""
+from collections import OrderedDict
+
+from . import storage_parser as sp
+
+
+DEFAULT_CACHE_SIZE = 256
+
+
+class LazyChunk(sp.RepresentationMixin):
+    """A chunk of the stream that parses its children on demand.
+    """
+    __slots__ = ('tree', 'header', 'depth', 'offset', 'data_offset',
+                 '_reprs')
+
+    def __init__(self, tree, header, depth, offset, data_offset):
+        self.tree = tree
+        self.header = header
+        self.depth = depth
+        # offset of the chunk header in the stream
+        self.offset = offset
+        # offset of the payload in the stream
+        self.data_offset = data_offset
+        self._reprs = None
+
+    @property
+    def idn(self):
+        return self.header.idn
+
+    @property
+    def storage_type(self):
+        return self.header.storage_type
+
+    @property
+    def end(self):
+        return self.data_offset + self.header.length
+
+    def is_container(self):
+        return self.header.storage_type.is_container()
+
+    @property
+    def value(self):
+        """Payload of a value chunk as a view into the stream.
+        """
+        return self.tree.buf[self.data_offset:self.end]
+
+    @property
+    def value_bytes(self):
+        return bytes(self.value)
+
+    @property
+    def childs(self):
+        if not self.is_container():
+            return []
+        return self.tree.scan(self.data_offset, self.header.length,
+                              self.depth + 1)
+
+    @property
+    def count(self):
+        return len(self.childs)
+
+    def __repr__(self):
+        return "<{} {} {} at {}>".format(
+            self.__class__.__name__, self.idn_hex,
+            self.header.storage_type_name, self.offset
+        )
+
+
+class LazyChunkTree:
+    """Chunk stream whose containers are decoded when they are accessed.
+
+    Only the headers of the top level chunks are read on construction.
+    """
+
+    def __init__(self, buf, cache_size=DEFAULT_CACHE_SIZE):
+        self.buf = memoryview(buf)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self.childs = self._scan(0, len(self.buf), 0)
+
+    def scan(self, offset, length, depth):
+        """Return the chunks found in `length' bytes from `offset'.
+
+        Results are cached by `offset', the least recently used entries are
+        dropped once there are more than `cache_size' of them.
+        """
+        cache = self._cache
+        if offset in cache:
+            cache.move_to_end(offset)
+            return cache[offset]
+        childs = self._scan(offset, length, depth)
+        cache[offset] = childs
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return childs
+
+    def _scan(self, offset, length, depth):
+        childs = []
+        pos = offset
+        end = offset + length
+        while pos < end:
+            header, data_offset = sp.read_header_at(self.buf, pos)
+            childs.append(LazyChunk(self, header, depth, pos, data_offset))
+            # Skip the payload, containers included.
+            pos = data_offset + header.length
+        return childs
+
+    def __iter__(self):
+        return iter(self.childs)
+
+    def __len__(self):
+        return len(self.childs)
+
+    def __getitem__(self, idx):
+        return self.childs[idx]
+
+    def asdict(self, representations=sp.DEFAULT_REPRESENTATIONS):
+        return [child.asdict(representations) for child in self.childs]
+
+
+def lazy_parse(max_fname, stream_name, cache_size=DEFAULT_CACHE_SIZE):
+    """Return a LazyChunkTree of the stream.
+    """
+    ba = sp.read_stream(max_fname, stream_name)
+    return LazyChunkTree(ba, cache_size=cache_size)
@@ -0,0 +1,117 @@
+"""Max file opened once for several extractions.
+"""
+from contextlib import contextmanager
+
+from . import storage_parser as sp
+from .ole_reader import OleReader
+
+CLASS_DIRECTORY = 'ClassDirectory3'
+DLL_DIRECTORY = 'DllDirectory'
+SCENE = 'Scene'
+DOCUMENT_SUMMARY_INFORMATION = '\x05DocumentSummaryInformation'
+
+
+class MaxFile:
+    """OLE container of the max file, opened once.
+
+    Raw streams and parsed chunk streams are memoized, so asking for the
+    same stream twice costs nothing:
+
+    >>> with MaxFile(max_fname) as max_file:
+    ...     classes = max_file.class_directory
+    ...     scene = max_file.scene
+    """
+
+    def __init__(self, max_fname):
+        self.max_fname = max_fname
+        self.ole = OleReader(max_fname)
+        self._streams = {}
+        self._chunks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._streams.clear()
+        self._chunks.clear()
+        self.ole.close()
+
+    def listdir(self):
+        return self.ole.listdir()
+
+    def read_stream(self, stream_name):
+        """Return contents of the stream as a memoryview.
+
+        A compressed stream is inflated.
+        """
+        if stream_name not in self._streams:
+            self._streams[stream_name] = sp.maybe_inflate(
+                self.ole.open_stream(stream_name)
+            )
+        return self._streams[stream_name]
+
+    def iter_stream(self, stream_name, select=None):
+        """Return ChunkEvent of the chunk stream, see `iter_chunks'.
+
+        A compressed stream is inflated while it is walked, unless it is
+        already inflated by `read_stream'.
+        """
+        if stream_name in self._streams:
+            return sp.iter_chunks(self._streams[stream_name], stream_name,
+                                  select)
+        return sp.stream_events(self.ole.open_stream(stream_name),
+                                stream_name, select)
+
+    def parse_stream(self, stream_name, select=None):
+        """Return the chunk stream parsed into a list of Chunk.
+
+        A stream parsed with `select', see `storage_parser.selector', is not
+        memoized.
+        """
+        if select is not None:
+            return sp.parse_chunks(self.read_stream(stream_name), stream_name,
+                                   select)
+        if stream_name not in self._chunks:
+            self._chunks[stream_name] = sp.parse_chunks(
+                self.read_stream(stream_name), stream_name
+            )
+        return self._chunks[stream_name]
+
+    def storage_parse(self, stream_name,
+                      representations=sp.DEFAULT_REPRESENTATIONS):
+        """Return the chunk stream rendered like `storage_parse' does.
+        """
+        return [chunk.asdict(representations)
+                for chunk in self.parse_stream(stream_name)]
+
+    @property
+    def class_directory(self):
+        return self.parse_stream(CLASS_DIRECTORY)
+
+    @property
+    def dll_directory(self):
+        return self.parse_stream(DLL_DIRECTORY)
+
+    @property
+    def scene(self):
+        return self.parse_stream(SCENE)
+
+    @property
+    def document_summary_information(self):
+        return self.read_stream(DOCUMENT_SUMMARY_INFORMATION)
+
+
+@contextmanager
+def session(max_file):
+    """Yield a MaxFile for the file name, or the MaxFile that is given.
+
+    A MaxFile opened here is closed on exit, a given one is left open.
+    """
+    if isinstance(max_file, MaxFile):
+        yield max_file
+    else:
+        with MaxFile(max_file) as opened:
+            yield opened
@@ -0,0 +1,400 @@
+"""Read streams of an OLE compound file through a memory map.
+
+A max file is an OLE structured storage.  OleReader maps the file
+read-only, follows FAT and MiniFAT sector chains in place and returns
+every stream as a memoryview of the map when its sectors are contiguous.
+Otherwise the sectors are gathered into a single new buffer.
+
+Only the header is read on opening.  A stream is found by a search of
+the directory trees that decodes just the entries on its path, the whole
+directory is decoded when it is listed.
+"""
+import mmap
+from struct import Struct
+
+MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+# Special sector numbers
+MAXREGSECT = 0xfffffffa
+DIFSECT = 0xfffffffc
+FATSECT = 0xfffffffd
+ENDOFCHAIN = 0xfffffffe
+FREESECT = 0xffffffff
+NOSTREAM = 0xffffffff
+
+# Object types of directory entries
+STGTY_STORAGE = 1
+STGTY_STREAM = 2
+STGTY_ROOT = 5
+
+# Fields of the header used by the reader, see [MS-CFB] 2.2
+HEADER_STRUCT = Struct('<8s16sHHHHH6sIIIIIIIII')
+HEADER_SIZE = 512
+# The first 109 DIFAT entries are stored in the header
+HEADER_DIFAT_STRUCT = Struct('<109I')
+HEADER_DIFAT_OFFSET = 76
+DIRECTORY_ENTRY_STRUCT = Struct('<64sHBBIII16sIQQIQ')
+SECTOR_NUMBER_STRUCT = Struct('<I')
+
+
+class OleException(Exception):
+    pass
+
+
+class DirectoryEntry:
+    __slots__ = ('name', 'object_type', 'left', 'right', 'child',
+                 'start_sector', 'size')
+
+    def __init__(self, name, object_type, left, right, child, start_sector,
+                 size):
+        self.name = name
+        self.object_type = object_type
+        self.left = left
+        self.right = right
+        self.child = child
+        self.start_sector = start_sector
+        self.size = size
+
+    def __repr__(self):
+        return "<{} {!r} {} bytes>".format(
+            self.__class__.__name__, self.name, self.size
+        )
+
+
+class OleReader:
+    """OLE compound file mapped into memory.
+
+    >>> with OleReader(max_fname) as ole:
+    ...     scene = ole.open_stream('Scene')
+
+    Streams are returned as memoryviews.  The map is closed with the reader
+    once no view of it is alive, it stays open until then.
+    """
+
+    def __init__(self, fname):
+        with open(fname, 'rb') as fin:
+            try:
+                self._mmap = mmap.mmap(fin.fileno(), 0,
+                                       access=mmap.ACCESS_READ)
+            except ValueError:
+                # An empty file can not be mapped.
+                raise OleException("Not an OLE file: {}".format(fname))
+        self.buf = memoryview(self._mmap)
+        self._directory = None
+        self._entries = None
+        self._root = None
+        self._paths = None
+        self._mini_stream = None
+        self._mini_fat_sectors = None
+        self._root_chain = None
+        try:
+            self._read_header()
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._mmap is None:
+            return
+        self.buf.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Streams returned as views are still in use, the map is
+            # unmapped when they are garbage collected.
+            pass
+        self._mmap = None
+
+    def _read_header(self):
+        if len(self.buf) < HEADER_SIZE:
+            raise OleException("The file is too short to be an OLE file")
+        (magic, _, _, self.major_version, _, sector_shift,
+         mini_sector_shift, _, _, self.num_fat_sectors, first_dir_sector, _,
+         self.mini_stream_cutoff, first_mini_fat_sector, _,
+         first_difat_sector, num_difat_sectors) = \
+            HEADER_STRUCT.unpack_from(self.buf)
+        if magic != MAGIC:
+            raise OleException("Not an OLE file")
+        self.sector_size = 1 << sector_shift
+        self.mini_sector_size = 1 << mini_sector_shift
+        self.first_dir_sector = first_dir_sector
+        self.first_mini_fat_sector = first_mini_fat_sector
+        self._fat_sectors = self._read_difat(first_difat_sector,
+                                             num_difat_sectors)
+        self._fat_entries_per_sector = self.sector_size // 4
+
+    def _read_difat(self, first_difat_sector, num_difat_sectors):
+        """Return the list of sectors holding the FAT.
+        """
+        difat = list(HEADER_DIFAT_STRUCT.unpack_from(self.buf,
+                                                     HEADER_DIFAT_OFFSET))
+        per_sector = self.sector_size // 4 - 1
+        sector = first_difat_sector
+        for _ in range(num_difat_sectors):
+            if sector > MAXREGSECT:
+                break
+            entries = Struct('<{}I'.format(per_sector + 1)).unpack_from(
+                self.buf, self.sector_offset(sector)
+            )
+            difat.extend(entries[:per_sector])
+            sector = entries[per_sector]
+        return [x for x in difat[:self.num_fat_sectors] if x <= MAXREGSECT]
+
+    def sector_offset(self, sector):
+        return (sector + 1) * self.sector_size
+
+    def next_sector(self, sector):
+        """Look up the FAT entry of the sector.
+        """
+        fat_sector, idx = divmod(sector, self._fat_entries_per_sector)
+        try:
+            offset = self.sector_offset(self._fat_sectors[fat_sector])
+        except IndexError:
+            raise OleException("Sector {} is out of FAT".format(sector))
+        sector, = SECTOR_NUMBER_STRUCT.unpack_from(self.buf, offset + idx * 4)
+        return sector
+
+    def chain(self, start_sector):
+        """Return the list of sectors of the FAT chain.
+        """
+        sectors = []
+        sector = start_sector
+        seen = set()
+        while sector != ENDOFCHAIN:
+            if sector > MAXREGSECT or sector in seen:
+                raise OleException(
+                    "Broken sector chain starting at {}".format(start_sector)
+                )
+            seen.add(sector)
+            sectors.append(sector)
+            sector = self.next_sector(sector)
+        return sectors
+
+    def _gather(self, buf, offsets, sector_size, size):
+        """Return `size' bytes of the sectors at `offsets' of `buf'.
+
+        A view is returned when the sectors follow each other.
+        """
+        if size == 0:
+            return memoryview(b'')
+        if len(offsets) * sector_size < size:
+            raise OleException("The stream is longer than its sectors")
+        start = offsets[0]
+        contiguous = all(offset == start + i * sector_size
+                         for i, offset in enumerate(offsets))
+        if contiguous:
+            if start + size > len(buf):
+                raise OleException("Stream runs past the end of the file")
+            return buf[start:start + size]
+        gathered = bytearray(size)
+        pos = 0
+        for offset in offsets:
+            piece = buf[offset:offset + min(sector_size, size - pos)]
+            gathered[pos:pos + len(piece)] = piece
+            pos += len(piece)
+            if pos >= size:
+                break
+        return memoryview(gathered)
+
+    def _read_sectors(self, sectors, size):
+        offsets = [self.sector_offset(x) for x in sectors]
+        return self._gather(self.buf, offsets, self.sector_size, size)
+
+    @property
+    def directory(self):
+        """The directory stream, an array of entries.
+        """
+        if self._directory is None:
+            sectors = self.chain(self.first_dir_sector)
+            self._directory = self._read_sectors(
+                sectors, len(sectors) * self.sector_size
+            )
+        return self._directory
+
+    def _read_entry(self, entry_id):
+        offset = entry_id * DIRECTORY_ENTRY_STRUCT.size
+        if entry_id < 0 or offset >= len(self.directory):
+            raise OleException("Invalid directory entry id")
+        (name, name_length, object_type, _, left, right, child, _, _,
+         _, _, start_sector, size) = \
+            DIRECTORY_ENTRY_STRUCT.unpack_from(self.directory, offset)
+        name = name[:max(name_length - 2, 0)].decode('utf-16-le', 'replace')
+        if self.major_version == 3:
+            # The high part of the size may be garbage in version 3
+            size &= 0xffffffff
+        return DirectoryEntry(name, object_type, left, right, child,
+                              start_sector, size)
+
+    @property
+    def root(self):
+        if self._root is None:
+            root = self._read_entry(0)
+            if root.object_type != STGTY_ROOT:
+                raise OleException("The root entry is missing")
+            self._root = root
+        return self._root
+
+    @property
+    def entries(self):
+        """All the entries of the directory.
+        """
+        if self._entries is None:
+            count = len(self.directory) // DIRECTORY_ENTRY_STRUCT.size
+            self._entries = [self.root] + [self._read_entry(x)
+                                           for x in range(1, count)]
+        return self._entries
+
+    @property
+    def paths(self):
+        if self._paths is None:
+            self._paths = self._walk_directory()
+        return self._paths
+
+    def _search(self, stream_name):
+        """Return the entry of the path, searching the directory trees.
+
+        Siblings are kept in a red-black tree ordered by the length and
+        then the upper case of the names, see [MS-CFB] 2.6.4.
+        """
+        entry = self.root
+        seen = set()
+        for name in stream_name.split('/'):
+            key = (len(name), name.upper())
+            entry_id = entry.child
+            while True:
+                if entry_id == NOSTREAM or entry_id in seen:
+                    return None
+                seen.add(entry_id)
+                entry = self._read_entry(entry_id)
+                entry_key = (len(entry.name), entry.name.upper())
+                if key == entry_key:
+                    break
+                entry_id = entry.left if key < entry_key else entry.right
+        return entry
+
+    def _walk_directory(self):
+        """Return entries by their path, like 'Storage/Stream'.
+        """
+        paths = {}
+        entries = self.entries
+        # (entry id, parent path) of the trees to visit
+        stack = [(self.root.child, '')]
+        seen = set()
+        while stack:
+            entry_id, parent = stack.pop()
+            if entry_id == NOSTREAM or entry_id in seen:
+                continue
+            if entry_id >= len(entries):
+                raise OleException("Invalid directory entry id")
+            seen.add(entry_id)
+            entry = entries[entry_id]
+            path = parent + entry.name
+            paths[path] = entry
+            stack.append((entry.left, parent))
+            stack.append((entry.right, parent))
+            if entry.object_type == STGTY_STORAGE:
+                stack.append((entry.child, path + '/'))
+        return paths
+
+    def listdir(self):
+        """Return paths of all streams.
+        """
+        return sorted(path for path, entry in self.paths.items()
+                      if entry.object_type == STGTY_STREAM)
+
+    def exists(self, stream_name):
+        return stream_name in self.paths
+
+    def get_entry(self, stream_name):
+        entry = None
+        if self._paths is None:
+            entry = self._search(stream_name)
+        if entry is None:
+            # Not found, or the tree is not ordered as it should be.
+            entry = self.paths.get(stream_name)
+        if entry is None:
+            raise OleException("Stream not found: {!r}".format(stream_name))
+        if entry.object_type != STGTY_STREAM:
+            raise OleException("Not a stream: {!r}".format(stream_name))
+        return entry
+
+    def get_size(self, stream_name):
+        return self.get_entry(stream_name).size
+
+    @property
+    def mini_stream(self):
+        """The stream holding all the streams shorter than the cutoff.
+        """
+        if self._mini_stream is None:
+            sectors = self.chain(self.root.start_sector)
+            self._mini_stream = self._read_sectors(sectors, self.root.size)
+        return self._mini_stream
+
+    def _mini_chain(self, start_sector):
+        # MiniFAT is a regular stream of sector numbers
+        sectors = []
+        sector = start_sector
+        seen = set()
+        entries_per_sector = self._fat_entries_per_sector
+        if self._mini_fat_sectors is None:
+            self._mini_fat_sectors = self.chain(self.first_mini_fat_sector)
+        mini_fat = self._mini_fat_sectors
+        while sector != ENDOFCHAIN:
+            if sector > MAXREGSECT or sector in seen:
+                raise OleException(
+                    "Broken mini sector chain starting at {}"
+                    .format(start_sector)
+                )
+            seen.add(sector)
+            sectors.append(sector)
+            fat_sector, idx = divmod(sector, entries_per_sector)
+            try:
+                offset = self.sector_offset(mini_fat[fat_sector])
+            except IndexError:
+                raise OleException(
+                    "Mini sector {} is out of MiniFAT".format(sector)
+                )
+            sector, = SECTOR_NUMBER_STRUCT.unpack_from(self.buf,
+                                                       offset + idx * 4)
+        return sectors
+
+    def _mini_offsets(self, mini_sectors):
+        """Return offsets in the file of the mini sectors.
+        """
+        if self._root_chain is None:
+            self._root_chain = self.chain(self.root.start_sector)
+        root_chain = self._root_chain
+        sector_size = self.sector_size
+        mini_size = self.mini_sector_size
+        offsets = []
+        for mini_sector in mini_sectors:
+            sector, pos = divmod(mini_sector * mini_size, sector_size)
+            try:
+                offsets.append(self.sector_offset(root_chain[sector]) + pos)
+            except IndexError:
+                raise OleException(
+                    "Mini sector {} is out of the mini stream"
+                    .format(mini_sector)
+                )
+        return offsets
+
+    def open_stream(self, stream_name):
+        """Return the contents of the stream as a memoryview.
+
+        The sectors of a short stream are read in place too, the rest of
+        the mini stream is not touched.
+        """
+        entry = self.get_entry(stream_name)
+        if entry.size == 0:
+            return memoryview(b'')
+        if entry.size < self.mini_stream_cutoff:
+            offsets = self._mini_offsets(self._mini_chain(entry.start_sector))
+            return self._gather(self.buf, offsets, self.mini_sector_size,
+                                entry.size)
+        return self._read_sectors(self.chain(entry.start_sector), entry.size)
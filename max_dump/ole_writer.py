@@ -0,0 +1,238 @@
+"""Write OLE compound files of streams, see [MS-CFB].
+
+Only what a max file needs is written: streams in the root storage of
+a version 3 file.  Streams shorter than the mini stream cutoff are kept in
+the mini stream, the rest in sectors of their own, and the FAT spills
+into DIFAT sectors when the header can not hold it:
+
+>>> write_ole('out.max', [('Scene', scene), ('DllDirectory', dlls)])
+
+The result is read back by OleReader and olefile alike.
+"""
+import sys
+from array import array
+from struct import Struct
+
+from .ole_reader import (DIFSECT, DIRECTORY_ENTRY_STRUCT, ENDOFCHAIN,
+                         FATSECT, FREESECT, HEADER_DIFAT_STRUCT, HEADER_SIZE,
+                         MAGIC, NOSTREAM, STGTY_ROOT, STGTY_STREAM)
+
+SECTOR_SHIFT = 9
+SECTOR_SIZE = 1 << SECTOR_SHIFT
+MINI_SECTOR_SHIFT = 6
+MINI_SECTOR_SIZE = 1 << MINI_SECTOR_SHIFT
+MINI_STREAM_CUTOFF = 4096
+# Header fields up to the DIFAT array
+HEADER_STRUCT = Struct('<8s16sHHHHH6sIIIIIIIII')
+MINOR_VERSION = 0x3e
+MAJOR_VERSION = 3
+BYTE_ORDER = 0xfffe
+ENTRIES_PER_SECTOR = SECTOR_SIZE // 4
+DIFAT_ENTRIES_PER_SECTOR = ENTRIES_PER_SECTOR - 1
+HEADER_DIFAT_ENTRIES = 109
+# Colors of the directory entries
+RED = 0
+BLACK = 1
+MAX_NAME_LENGTH = 31
+
+
+class OleWriterException(Exception):
+    pass
+
+
+def _sectors(size, sector_size=SECTOR_SIZE):
+    return -(-size // sector_size)
+
+
+def _pad(data, sector_size=SECTOR_SIZE):
+    return b'\0' * (-len(data) % sector_size)
+
+
+def _uint32_bytes(values):
+    table = array('I', values)
+    if sys.byteorder == 'big':
+        table.byteswap()
+    return table.tobytes()
+
+
+def _chain(table, start, count):
+    """Link `count' sectors from `start' in the allocation table.
+    """
+    for sector in range(start, start + count - 1):
+        table[sector] = sector + 1
+    if count:
+        table[start + count - 1] = ENDOFCHAIN
+
+
+def _tree(entries):
+    """Link the entries into a balanced red-black tree, return its root.
+
+    `entries' are lists of [key, left, right, color, ...] sorted by key.
+    The nodes of the deepest level are red, the rest black, so every path
+    down holds the same number of black nodes.
+    """
+    depths = {}
+
+    def build(lo, hi, depth):
+        if lo >= hi:
+            return NOSTREAM
+        mid = (lo + hi) // 2
+        depths[mid] = depth
+        entries[mid][1] = build(lo, mid, depth + 1)
+        entries[mid][2] = build(mid + 1, hi, depth + 1)
+        return mid
+
+    root = build(0, len(entries), 0)
+    deepest = max(depths.values(), default=0)
+    for idx, depth in depths.items():
+        entries[idx][3] = RED if depth == deepest and depth else BLACK
+    return root
+
+
+def _directory_entry(name, object_type, color, left, right, child,
+                     start_sector, size):
+    encoded = name.encode('utf-16-le') + b'\0\0'
+    return DIRECTORY_ENTRY_STRUCT.pack(
+        encoded, len(encoded), object_type, color, left, right, child,
+        b'\0' * 16, 0, 0, 0, start_sector, size
+    )
+
+
+def write_ole(fname, streams):
+    """Write the (name, data) streams to the OLE file `fname'.
+    """
+    streams = [(name, memoryview(data)) for name, data in streams]
+    names = set()
+    for name, _ in streams:
+        if len(name) > MAX_NAME_LENGTH or '/' in name or not name:
+            raise OleWriterException("Invalid stream name {!r}".format(name))
+        if name.upper() in names:
+            raise OleWriterException("Duplicate stream {!r}".format(name))
+        names.add(name.upper())
+
+    # The mini stream and its allocation table
+    mini_starts = {}
+    mini_fat = []
+    mini_size = 0
+    for name, data in streams:
+        if len(data) < MINI_STREAM_CUTOFF:
+            start = mini_size // MINI_SECTOR_SIZE
+            count = _sectors(len(data), MINI_SECTOR_SIZE)
+            mini_fat.extend([FREESECT] * count)
+            _chain(mini_fat, start, count)
+            mini_starts[name] = start if count else ENDOFCHAIN
+            mini_size += count * MINI_SECTOR_SIZE
+
+    # Sectors in the order of the file: big streams, the mini stream, the
+    # MiniFAT, the directory, the FAT and the DIFAT.
+    starts = {}
+    next_sector = 0
+    for name, data in streams:
+        if name not in mini_starts:
+            starts[name] = next_sector
+            next_sector += _sectors(len(data))
+    mini_stream_start = next_sector
+    mini_stream_sectors = _sectors(mini_size)
+    next_sector += mini_stream_sectors
+    mini_fat_start = next_sector
+    mini_fat_sectors = _sectors(4 * len(mini_fat))
+    next_sector += mini_fat_sectors
+    dir_start = next_sector
+    dir_sectors = _sectors((len(streams) + 1) * DIRECTORY_ENTRY_STRUCT.size)
+    next_sector += dir_sectors
+    # The FAT covers itself and the DIFAT.
+    fat_sectors = difat_sectors = 0
+    while True:
+        total = next_sector + fat_sectors + difat_sectors
+        needed_fat = _sectors(total, ENTRIES_PER_SECTOR)
+        needed_difat = _sectors(max(needed_fat - HEADER_DIFAT_ENTRIES, 0),
+                                DIFAT_ENTRIES_PER_SECTOR)
+        if (needed_fat, needed_difat) == (fat_sectors, difat_sectors):
+            break
+        fat_sectors, difat_sectors = needed_fat, needed_difat
+    fat_start = next_sector
+    difat_start = fat_start + fat_sectors
+    total = difat_start + difat_sectors
+
+    fat = [FREESECT] * (fat_sectors * ENTRIES_PER_SECTOR)
+    for name, data in streams:
+        if name in starts:
+            _chain(fat, starts[name], _sectors(len(data)))
+    _chain(fat, mini_stream_start, mini_stream_sectors)
+    _chain(fat, mini_fat_start, mini_fat_sectors)
+    _chain(fat, dir_start, dir_sectors)
+    for sector in range(fat_start, difat_start):
+        fat[sector] = FATSECT
+    for sector in range(difat_start, total):
+        fat[sector] = DIFSECT
+
+    fat_list = list(range(fat_start, difat_start))
+    difat = fat_list[:HEADER_DIFAT_ENTRIES]
+    difat += [FREESECT] * (HEADER_DIFAT_ENTRIES - len(difat))
+    difat_data = bytearray()
+    rest = fat_list[HEADER_DIFAT_ENTRIES:]
+    for i in range(difat_sectors):
+        entries = rest[i * DIFAT_ENTRIES_PER_SECTOR:
+                       (i + 1) * DIFAT_ENTRIES_PER_SECTOR]
+        entries += [FREESECT] * (DIFAT_ENTRIES_PER_SECTOR - len(entries))
+        following = difat_start + i + 1 if i + 1 < difat_sectors \
+            else ENDOFCHAIN
+        difat_data += _uint32_bytes(entries + [following])
+
+    # Directory: the root, then the streams linked into a tree
+    nodes = sorted(
+        ([(len(name), name.upper()), NOSTREAM, NOSTREAM, BLACK, name, data]
+         for name, data in streams),
+        key=lambda node: node[0]
+    )
+    child = _tree(nodes)
+    directory = bytearray(_directory_entry(
+        'Root Entry', STGTY_ROOT, BLACK, NOSTREAM, NOSTREAM,
+        NOSTREAM if child == NOSTREAM else child + 1,
+        mini_stream_start if mini_size else ENDOFCHAIN, mini_size
+    ))
+    for _, left, right, color, name, data in nodes:
+        start = mini_starts[name] if name in mini_starts else starts[name]
+        if not len(data):
+            start = ENDOFCHAIN
+        directory += _directory_entry(
+            name, STGTY_STREAM, color,
+            NOSTREAM if left == NOSTREAM else left + 1,
+            NOSTREAM if right == NOSTREAM else right + 1,
+            NOSTREAM, start, len(data)
+        )
+    empty_entry = DIRECTORY_ENTRY_STRUCT.pack(
+        b'', 0, 0, RED, NOSTREAM, NOSTREAM, NOSTREAM, b'\0' * 16, 0, 0, 0,
+        0, 0
+    )
+    while len(directory) % SECTOR_SIZE:
+        directory += empty_entry
+
+    header = HEADER_STRUCT.pack(
+        MAGIC, b'\0' * 16, MINOR_VERSION, MAJOR_VERSION, BYTE_ORDER,
+        SECTOR_SHIFT, MINI_SECTOR_SHIFT, b'\0' * 6, 0, fat_sectors,
+        dir_start, 0, MINI_STREAM_CUTOFF,
+        mini_fat_start if mini_fat_sectors else ENDOFCHAIN, mini_fat_sectors,
+        difat_start if difat_sectors else ENDOFCHAIN, difat_sectors
+    ) + HEADER_DIFAT_STRUCT.pack(*difat)
+    assert len(header) == HEADER_SIZE
+
+    with open(fname, 'wb') as fout:
+        fout.write(header)
+        for name, data in streams:
+            if name in starts:
+                fout.write(data)
+                fout.write(_pad(data))
+        mini_stream = bytearray()
+        for name, data in streams:
+            if name in mini_starts:
+                mini_stream += data
+                mini_stream += _pad(data, MINI_SECTOR_SIZE)
+        fout.write(mini_stream)
+        fout.write(_pad(mini_stream))
+        mini_fat_data = _uint32_bytes(mini_fat)
+        fout.write(mini_fat_data)
+        fout.write(_pad(mini_fat_data))
+        fout.write(directory)
+        fout.write(_uint32_bytes(fat))
+        fout.write(difat_data)
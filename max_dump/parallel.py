@@ -0,0 +1,375 @@
+"""Parse the streams of one max file with a pool of processes.
+
+    $ max_dump big.max --dump-all out/ --jobs 8
+
+Every worker maps the file itself, so the pages of the file are shared by
+the processes.  A big chunk stream is split into parts of whole top level
+chunks, or of whole objects when the stream is a single container like the
+Scene, so one big stream keeps all the workers busy.
+
+`dump_streams' writes the text of each stream, the same as --parse-stream
+writes, to a file.  A stream that is not split is written by a worker, the
+text of the parts of a split stream is written by the parent in order as
+they are done, with only a few parts rendered ahead.  `chunk_tables' gives
+the chunk tables of the streams instead, see `sp.chunk_table'.
+"""
+import io
+import itertools
+import os
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from max_dump import storage_parser as sp
+from max_dump.cli import STREAM_NAMES, class_names, parse_stream
+from max_dump.json_writer import NDJSON, PRETTY, JsonWriter, rendered
+from max_dump.max_file import MaxFile
+
+
+# Smaller streams are rendered whole.
+MIN_SPLIT_SIZE = 256 * 1024
+# Smaller parts are not worth a task.
+MIN_PART_SIZE = 64 * 1024
+# Parts of a split stream per worker, more of them even out the load.
+PARTS_PER_JOB = 4
+# Parts of a split stream rendered ahead of the one written, per worker.
+AHEAD_PER_JOB = 2
+# Streams rendered by their frontends, never split
+FRONTEND_STREAMS = ('ClassDirectory3', 'DllDirectory')
+
+# Chunks of the stream from `start' to `end', top level chunks of the part
+# are at `depth' in the stream, under the parents of the hex idns `path'.
+# `first_top_level' tells whether the part is in the first top level chunk
+# of the stream.
+Part = namedtuple('Part', ('start', 'end', 'depth', 'path',
+                           'first_top_level'))
+
+# `root' is the ChunkEvent of the container the parts are split from, None
+# for parts of top level chunks.  `size' is the size of the stream.
+# `class_names' are those of the objects of the stream, see `class_names'.
+Plan = namedtuple('Plan', ('stream_name', 'parts', 'root', 'size',
+                           'class_names'))
+
+
+class PartOverrun(Exception):
+    """A chunk of a part runs past its end.
+    """
+
+
+def _spans(buf, start, end):
+    """Return (offset, end) of the chunks from `start' filling the buffer
+    exactly up to `end', None if they do not.
+    """
+    spans = []
+    pos = start
+    try:
+        while pos < end:
+            _, length, _, header_length = sp.read_raw_header_at(buf, pos)
+            chunk_end = pos + header_length + length
+            if chunk_end > end:
+                return None
+            spans.append((pos, chunk_end))
+            pos = chunk_end
+    except sp.StorageException:
+        return None
+    return spans
+
+
+def split_stream(buf, parts):
+    """Return about `parts' Part of the chunk stream held by `buf', None if
+    it can not be split.
+
+    A stream of a single container is split into its children.  Chunks are
+    never cut, so a stream whose chunks run past their parents, which
+    `iter_chunks' walks on, is not split.
+    """
+    spans = _spans(buf, 0, len(buf))
+    depth = 0
+    path = ()
+    if spans is not None and len(spans) == 1:
+        idn, _, is_container, header_length = sp.read_raw_header_at(buf, 0)
+        if not is_container:
+            return None
+        spans = _spans(buf, header_length, spans[0][1])
+        depth = 1
+        path = (hex(idn), )
+    if not spans or len(spans) < 2:
+        return None
+
+    total = spans[-1][1] - spans[0][0]
+    size = max(total // parts, 1)
+    result = []
+    start = spans[0][0]
+    for _, end in spans:
+        if end - start >= size:
+            result.append(Part(start, end, depth, path,
+                               depth == 1 or start == 0))
+            start = end
+    if start < spans[-1][1]:
+        result.append(Part(start, spans[-1][1], depth, path,
+                           depth == 1 or start == 0))
+    return result
+
+
+def plan_stream(max_file, stream_name, jobs):
+    """Return the Plan of the stream, a single part None for the whole
+    stream.
+    """
+    buf = max_file.ole.open_stream(stream_name)
+    whole = Plan(stream_name, [None], None, len(buf), None)
+    if jobs < 2 or stream_name in FRONTEND_STREAMS:
+        return whole
+    # A compressed stream is inflated from its start, it is not split.
+    if len(buf) < MIN_SPLIT_SIZE or sp.stream_wbits(buf) is not None:
+        return whole
+    parts = split_stream(buf, max(min(jobs * PARTS_PER_JOB,
+                                      len(buf) // MIN_PART_SIZE), 1))
+    if parts is None or len(parts) < 2:
+        return whole
+    root = None
+    if parts[0].depth:
+        root = next(sp.iter_chunks(buf))
+    return Plan(stream_name, parts, root, len(buf),
+                class_names(max_file, stream_name))
+
+
+def _checked(events, size):
+    for event in events:
+        if event.kind != sp.EXIT and (event.offset +
+                                      event.header.header_length +
+                                      event.length > size):
+            raise PartOverrun(
+                "Chunk {} at offset {} runs past the part"
+                .format(hex(event.idn), event.offset)
+            )
+        yield event
+
+
+def _part_buffer(max_file, stream_name, part):
+    return max_file.read_stream(stream_name)[part.start:part.end]
+
+
+def render_part(max_fname, stream_name, part, class_names=None,
+                representations=sp.DEFAULT_REPRESENTATIONS, fmt=PRETTY):
+    """Return the text of the part of the stream, `class_names' are those
+    of its Plan.
+
+    The texts of the parts are put together by `write_stream'.
+    """
+    out = io.StringIO()
+    with MaxFile(max_fname) as max_file:
+        buf = _part_buffer(max_file, stream_name, part)
+        JsonWriter(out, fmt).write_chunk_items(
+            _checked(sp.iter_chunks(buf, stream_name), len(buf)),
+            representations, class_names, part.depth, part.path,
+            part.first_top_level
+        )
+    return out.getvalue()
+
+
+def write_stream(plan, texts, out,
+                 representations=sp.DEFAULT_REPRESENTATIONS, fmt=PRETTY):
+    """Write the text of the split stream to the text file `out', given
+    the texts of its parts in order.
+
+    Every text is written as soon as it is given, `texts' may be an
+    iterator of the parts as they are done.
+    """
+    events = (rendered(text) for text in texts)
+    if plan.root is not None:
+        events = itertools.chain([plan.root], events,
+                                 [plan.root._replace(kind=sp.EXIT)])
+    JsonWriter(out, fmt).write_chunks(events, representations)
+
+
+def dump_stream(max_fname, stream_name, fname,
+                representations=sp.DEFAULT_REPRESENTATIONS, fmt=PRETTY):
+    """Write the text of the stream to the file `fname' like
+    --parse-stream does, the file is removed if the stream fails.
+    """
+    try:
+        with MaxFile(max_fname) as max_file, \
+                open(fname, 'w', encoding='utf-8') as fout:
+            parse_stream(max_file, stream_name, representations,
+                         JsonWriter(fout, fmt))
+    except Exception:
+        if os.path.exists(fname):
+            os.remove(fname)
+        raise
+
+
+def _ordered(executor, func, args, ahead):
+    """Yield the results of `func' called by the executor with each of the
+    `args' in order, with at most `ahead' of them pending.
+
+    A result is dropped once it is yielded.  The calls not yet done are
+    cancelled when the iteration stops.
+    """
+    args = iter(args)
+    futures = deque(executor.submit(func, *arg)
+                    for arg in itertools.islice(args, ahead))
+    try:
+        while futures:
+            future = futures.popleft()
+            for arg in itertools.islice(args, 1):
+                futures.append(executor.submit(func, *arg))
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def _plans(max_fname, stream_names, jobs):
+    with MaxFile(max_fname) as max_file:
+        if stream_names is None:
+            present = set(max_file.listdir())
+            stream_names = [name for name in STREAM_NAMES if name in present]
+        return [plan_stream(max_file, name, jobs) for name in stream_names]
+
+
+def dump_streams(max_fname, out_dir, stream_names=None,
+                 representations=sp.DEFAULT_REPRESENTATIONS, fmt=PRETTY,
+                 jobs=1):
+    """Write every stream to a file of its name in `out_dir', parsed with
+    `jobs' processes.
+
+    The streams default to those of STREAM_NAMES in the file.  Return the
+    errors of the streams that fail by stream name, their files are not
+    written.  A split stream whose part fails is written again whole, so
+    it fails the way --parse-stream does.
+    """
+    extension = '.ndjson' if fmt == NDJSON else '.json'
+    plans = _plans(max_fname, stream_names, jobs)
+    fnames = {plan.stream_name: os.path.join(out_dir,
+                                             plan.stream_name + extension)
+              for plan in plans}
+    errors = {}
+    if jobs < 2:
+        for plan in plans:
+            try:
+                dump_stream(max_fname, plan.stream_name,
+                            fnames[plan.stream_name], representations, fmt)
+            except Exception as e:
+                errors[plan.stream_name] = e
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            _dump_plans(executor, max_fname, plans, fnames, errors,
+                        representations, fmt, jobs)
+    return OrderedDict((plan.stream_name, errors[plan.stream_name])
+                       for plan in plans if plan.stream_name in errors)
+
+
+def _dump_plans(executor, max_fname, plans, fnames, errors,
+                representations, fmt, jobs):
+    # The largest streams first, so a big one does not start last and keep
+    # the pool waiting for it.
+    whole = sorted((plan for plan in plans if plan.parts == [None]),
+                   key=lambda plan: -plan.size)
+    futures = [(plan.stream_name,
+                executor.submit(dump_stream, max_fname, plan.stream_name,
+                                fnames[plan.stream_name], representations,
+                                fmt))
+               for plan in whole]
+    for plan in plans:
+        if plan.parts == [None]:
+            continue
+        name = plan.stream_name
+        texts = _ordered(
+            executor, render_part,
+            [(max_fname, name, part, plan.class_names, representations, fmt)
+             for part in plan.parts],
+            jobs * AHEAD_PER_JOB
+        )
+        try:
+            with open(fnames[name], 'w', encoding='utf-8') as fout:
+                write_stream(plan, texts, fout, representations, fmt)
+        except Exception:
+            texts.close()
+            try:
+                dump_stream(max_fname, name, fnames[name], representations,
+                            fmt)
+            except Exception as e:
+                errors[name] = e
+    for name, future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            errors[name] = e
+
+
+def part_table(max_fname, stream_name, part=None):
+    """Return the chunk table of the part of the stream, of the whole
+    stream if `part' is None, see `sp.chunk_table'.
+
+    The offsets and depths of the rows are those in the stream, the
+    parents of the top level chunks of the part are -1.
+    """
+    if part is None:
+        table, _ = sp.storage_chunk_table(max_fname, stream_name)
+        return table
+    with MaxFile(max_fname) as max_file:
+        table, _ = sp.chunk_table(_part_buffer(max_file, stream_name, part))
+    overrun = (table['offset'] + table['header_length'] + table['length'] >
+               part.end - part.start)
+    if overrun.any():
+        row = table[overrun][0]
+        raise PartOverrun(
+            "Chunk {} at offset {} runs past the part"
+            .format(hex(row['idn']), row['offset'])
+        )
+    table['offset'] += part.start
+    table['depth'] += part.depth
+    return table
+
+
+def _join_tables(plan, tables):
+    """Return the chunk table of the split stream given those of its
+    parts.
+    """
+    root = plan.root
+    rows = []
+    if root is not None:
+        rows.append(sp.np.array(
+            [(root.offset, root.idn, root.header.header_length, root.length,
+              True, 0, -1)],
+            dtype=list(sp.CHUNK_TABLE_FIELDS)
+        ))
+    base = len(rows)
+    for table in tables:
+        top_level = table['parent'] == -1
+        table['parent'] += base
+        table['parent'][top_level] = 0 if root is not None else -1
+        rows.append(table)
+        base += len(table)
+    return sp.np.concatenate(rows)
+
+
+def chunk_tables(max_fname, stream_names=None, jobs=1):
+    """Return the chunk tables of the streams by stream name, parsed with
+    `jobs' processes, see `sp.chunk_table'.
+
+    The streams default to those of STREAM_NAMES in the file.  Only the
+    tables come back from the workers.  A split stream whose part fails is
+    parsed again whole, the error of a stream that fails is raised.
+    """
+    plans = _plans(max_fname, stream_names, jobs)
+    if jobs < 2:
+        return OrderedDict((plan.stream_name,
+                            part_table(max_fname, plan.stream_name))
+                           for plan in plans)
+    tables = OrderedDict()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [[executor.submit(part_table, max_fname, plan.stream_name,
+                                    part)
+                    for part in plan.parts] for plan in plans]
+        for plan, parts in zip(plans, futures):
+            name = plan.stream_name
+            try:
+                if plan.parts == [None]:
+                    tables[name] = parts[0].result()
+                else:
+                    tables[name] = _join_tables(
+                        plan, [future.result() for future in parts]
+                    )
+            except PartOverrun:
+                tables[name] = part_table(max_fname, name)
+    return tables
@@ -0,0 +1,177 @@
+"""Chunk path queries.
+
+A query names a stream and a step per level of the chunk tree, starting
+with the top level chunks of the stream:
+
+    DllDirectory/0x2038/0x2037      names of all dlls
+    Scene/*/*[class=Node]/0x962     names of all Nodes
+    Scene/*/*[super_class=0x20]     all camera objects
+
+A step is an idn or `*', optionally followed by conditions in brackets:
+`class' is the name of the class and `super_class' the super class id of
+a scene object, the idn of which is the index of its class in
+ClassDirectory3.
+
+The query is compiled once and evaluated in a single pass over the stream,
+chunks that can not lead to a match are skipped unparsed, see
+`storage_parser.selector':
+
+>>> q = compile_query('Scene/*/*[class=Node]/0x962')
+>>> for chunk in q.run(max_fname):
+...     print(chunk.parsed)
+"""
+import re
+
+import attr
+
+from . import storage_parser as sp
+from .max_file import session
+from .scene_index import get_class_list
+
+
+STEP_RE = re.compile(r'^(\*|0[xX][0-9a-fA-F]+|\d+)(?:\[([^\]]*)\])?$')
+CONDITION_KEYS = ('class', 'super_class')
+
+
+class QueryError(Exception):
+    pass
+
+
+@attr.s(slots=True, frozen=True)
+class Step:
+    # idn of the chunk, None matches any
+    idn = attr.ib(default=None)
+    # name of the class of a scene object
+    class_name = attr.ib(default=None)
+    super_class_id = attr.ib(default=None)
+
+    def needs_classes(self):
+        return self.class_name is not None or self.super_class_id is not None
+
+    def matching_idns(self, class_list):
+        """Return the set of idns the step matches, None for any idn.
+        """
+        idns = None if self.idn is None else {self.idn}
+        if self.needs_classes():
+            classes = {
+                idx for idx, (name, header) in enumerate(class_list)
+                if (self.class_name is None or name == self.class_name)
+                and (self.super_class_id is None
+                     or header.super_class_id == self.super_class_id)
+            }
+            idns = classes if idns is None else idns & classes
+        return None if idns is None else frozenset(idns)
+
+
+def _parse_int(text):
+    try:
+        return int(text, 0)
+    except ValueError:
+        raise QueryError("Invalid number: {!r}".format(text))
+
+
+def _parse_step(text):
+    match = STEP_RE.match(text.strip())
+    if match is None:
+        raise QueryError("Invalid step: {!r}".format(text))
+    idn, conditions = match.groups()
+    kwargs = {}
+    if idn != '*':
+        kwargs['idn'] = _parse_int(idn)
+    for condition in (conditions or '').split(','):
+        if not condition.strip():
+            continue
+        key, sep, value = condition.partition('=')
+        key, value = key.strip(), value.strip()
+        if not sep or key not in CONDITION_KEYS or not value:
+            raise QueryError("Invalid condition: {!r}".format(condition))
+        if key == 'class':
+            kwargs['class_name'] = value
+        else:
+            kwargs['super_class_id'] = _parse_int(value)
+    return Step(**kwargs)
+
+
+@attr.s(slots=True, frozen=True)
+class Query:
+    """Compiled query, see `compile_query'.
+    """
+    stream_name = attr.ib()
+    steps = attr.ib()
+
+    @classmethod
+    def compile(cls, text):
+        stream_name, *steps = text.strip().strip('/').split('/')
+        if not stream_name or not steps:
+            raise QueryError(
+                "A query needs a stream name and a step: {!r}".format(text)
+            )
+        return cls(stream_name, tuple(_parse_step(x) for x in steps))
+
+    def selector(self, class_list=()):
+        """Return a predicate for `storage_parser.iter_chunks'.
+
+        The subtree of a matching chunk is kept whole.
+        """
+        matchers = [step.matching_idns(class_list) for step in self.steps]
+        last = len(matchers) - 1
+
+        def select(path, idn, depth):
+            if depth > last:
+                return True
+            idns = matchers[depth]
+            return idns is None or idn in idns
+        return select
+
+    def needs_classes(self):
+        return any(step.needs_classes() for step in self.steps)
+
+    def run(self, max_file):
+        """Yield the matching chunks of the file as Chunk, in stream order.
+
+        `max_file' is a file name or a MaxFile.
+        """
+        with session(max_file) as max_file:
+            class_list = ()
+            if self.needs_classes():
+                class_list = get_class_list(max_file)
+            buf = max_file.read_stream(self.stream_name)
+            yield from self.evaluate(buf, class_list)
+
+    def evaluate(self, buf, class_list=()):
+        """Yield the matching chunks of the stream held by `buf'.
+        """
+        buf = memoryview(buf)
+        last = len(self.steps) - 1
+        events = sp.iter_chunks(buf, self.stream_name,
+                                self.selector(class_list))
+        for event in events:
+            if event.depth != last or event.kind == sp.EXIT:
+                continue
+            if event.kind == sp.VALUE:
+                chunk, = sp.build_chunks((event, ), buf)
+            else:
+                chunk, = sp.build_chunks(_subtree(event, events), buf)
+            yield chunk
+
+
+def _subtree(enter, events):
+    """Yield `enter' and the events up to its EXIT.
+    """
+    yield enter
+    for event in events:
+        yield event
+        if event.kind == sp.EXIT and event.depth == enter.depth:
+            return
+
+
+def compile_query(text):
+    """Return the Query compiled from `text'.
+    """
+    return Query.compile(text)
+
+
+def query(max_file, text):
+    """Yield the chunks of the file matching the query.
+    """
+    return compile_query(text).run(max_file)
@@ -11,9 +11,11 @@ def link_scene_and_class(scene_data, class_data, tersed=True):
         class_data = terse_class(class_data)
     idx_to_class = {x["idx"]: x for x in class_data}
     for scene_entry in scene_data[0]["childs"]:
-        # An identifier `idn' is a index of the class in ClassDirectory3.
+        # An identifier `idn' is a index of the class in ClassDirectory3,
+        # entries whose `idn' is not one are left without a name.
         idx = scene_entry["header"]["idn"]
-        scene_entry["header"]["class_name"] = idx_to_class[idx]["name"]
+        if idx in idx_to_class:
+            scene_entry["header"]["class_name"] = idx_to_class[idx]["name"]
     return scene_data
 
 
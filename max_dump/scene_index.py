@@ -0,0 +1,199 @@
+"""Index of the Scene objects, their classes and the Node references.
+
+The idn of a scene object is the index of its class in ClassDirectory3,
+a Node refers to other objects by their index in the Scene.  SceneIndex
+is built in a single pass over the Scene stream and keeps the references
+as CSR arrays: the references of object `i' are
+`ref_targets[ref_offsets[i]:ref_offsets[i + 1]]', the objects referring
+to `i' are kept the same way in `referrer_offsets' and `referrers'.
+
+>>> index = SceneIndex.from_max_file(max_fname)
+>>> for node in index.objects_of_class_name('Node'):
+...     print(index.names[node], index.refs(node))
+"""
+from array import array
+from struct import iter_unpack
+
+from . import storage_parser as sp
+from .max_file import session
+
+
+# name of a scene object
+OBJECT_NAME_IDN = 0x962
+# indexes of the objects a Node refers to
+NODE_REFS_IDN = 0x2035
+NODE_CLASS_NAME = "Node"
+
+
+def get_class_list(max_file):
+    """Return (name, ClassHeader) of the classes in ClassDirectory3.
+
+    The position of a class in the list is its index, the identifier of
+    a scene object is the index of its class.
+    """
+    with session(max_file) as max_file:
+        entries = max_file.class_directory
+    return [(entry.childs[1].parsed, entry.childs[0].parsed)
+            for entry in entries]
+
+
+class SceneIndex:
+    """Classes, Node names and the reference graph of the Scene objects.
+    """
+
+    def __init__(self, class_list, classes, names, ref_offsets,
+                 ref_targets):
+        self.class_list = class_list
+        # class index of every object
+        self.classes = classes
+        # names of the Nodes by their index
+        self.names = names
+        self.ref_offsets = ref_offsets
+        self.ref_targets = ref_targets
+        self._node_classes = _node_classes(class_list)
+        self._by_class = {}
+        for idx, class_idx in enumerate(classes):
+            self._by_class.setdefault(class_idx, array('i')).append(idx)
+        self.referrer_offsets, self.referrers = _transpose(
+            ref_offsets, ref_targets, len(classes)
+        )
+
+    @classmethod
+    def from_max_file(cls, max_file):
+        """Return the index of the file name or the MaxFile.
+        """
+        with session(max_file) as max_file:
+            class_list = get_class_list(max_file)
+            events = max_file.iter_stream("Scene", selector(class_list))
+            return cls.from_events(events, class_list)
+
+    @classmethod
+    def from_buffer(cls, buf, class_list):
+        """Return the index of the Scene stream held by `buf'.
+        """
+        events = sp.iter_chunks(buf, "Scene", selector(class_list))
+        return cls.from_events(events, class_list)
+
+    @classmethod
+    def from_events(cls, events, class_list):
+        """Return the index built out of ChunkEvent of the Scene stream.
+
+        The events must include the objects and the names and references
+        of the Nodes, see `selector'.  Other events are ignored.
+        """
+        node_classes = _node_classes(class_list)
+        classes = array('i')
+        names = {}
+        ref_offsets = array('q')
+        ref_targets = array('i')
+        for event in events:
+            if event.depth == 1:
+                if event.kind != sp.EXIT:
+                    classes.append(event.idn)
+                    ref_offsets.append(len(ref_targets))
+            elif (event.depth == 2 and event.kind == sp.VALUE
+                  and classes[-1] in node_classes):
+                if event.idn == OBJECT_NAME_IDN:
+                    names[len(classes) - 1] = sp.utf_16_decode(event.value)
+                elif event.idn == NODE_REFS_IDN:
+                    # The last list of references of a Node is the one
+                    # that counts.
+                    del ref_targets[ref_offsets[-1]:]
+                    ref_targets.extend(i for i, in
+                                       iter_unpack('<i', event.value))
+        ref_offsets.append(len(ref_targets))
+        return cls(class_list, classes, names, ref_offsets, ref_targets)
+
+    def __len__(self):
+        return len(self.classes)
+
+    def class_name(self, idx):
+        return self.class_list[self.classes[idx]][0]
+
+    def name(self, node):
+        """Return the name of the Node, it must have one.
+        """
+        assert node in self.names, ("The node does not have "
+                                    "a child with needed identifier")
+        return self.names[node]
+
+    def objects_of_class(self, class_idx):
+        """Return indexes of the objects of the class index.
+        """
+        return self._by_class.get(class_idx, array('i'))
+
+    def objects_of_class_name(self, name):
+        return self._objects_of_classes(
+            idx for idx, (class_name, _) in enumerate(self.class_list)
+            if class_name == name
+        )
+
+    def objects_of_super_class(self, super_class_id):
+        return self._objects_of_classes(
+            idx for idx, (_, header) in enumerate(self.class_list)
+            if header.super_class_id == super_class_id
+        )
+
+    def _objects_of_classes(self, class_indexes):
+        objects = array('i')
+        for class_idx in class_indexes:
+            objects.extend(self.objects_of_class(class_idx))
+        return sorted(objects)
+
+    def refs(self, idx):
+        """Return indexes of the objects the object refers to.
+        """
+        return self.ref_targets[self.ref_offsets[idx]:
+                                self.ref_offsets[idx + 1]]
+
+    def referrers_of(self, idx):
+        """Return indexes of the objects referring to the object.
+        """
+        return self.referrers[self.referrer_offsets[idx]:
+                              self.referrer_offsets[idx + 1]]
+
+    def nodes_referencing(self, idx):
+        return [node for node in self.referrers_of(idx)
+                if self.classes[node] in self._node_classes]
+
+
+def _node_classes(class_list):
+    return frozenset(idx for idx, (name, _) in enumerate(class_list)
+                     if name == NODE_CLASS_NAME)
+
+
+def selector(class_list):
+    """Return the predicate selecting the Scene chunks SceneIndex needs.
+
+    Those are the Scene container, every object, and names and references
+    of the Nodes.
+    """
+    node_classes = _node_classes(class_list)
+
+    def select(path, idn, depth):
+        return depth < 2 or (
+            depth == 2 and path[1] in node_classes
+            and idn in (OBJECT_NAME_IDN, NODE_REFS_IDN)
+        )
+    return select
+
+
+def _transpose(offsets, targets, size):
+    """Return the CSR arrays of the reversed graph.
+
+    References out of the range of objects are left out.
+    """
+    counts = array('q', bytes(8 * (size + 1)))
+    for target in targets:
+        if 0 <= target < size:
+            counts[target + 1] += 1
+    for i in range(size):
+        counts[i + 1] += counts[i]
+    sources = array('i', bytes(4 * counts[size]))
+    fill = array('q', counts)
+    for source in range(size):
+        for target in targets[offsets[source]:offsets[source + 1]]:
+            if 0 <= target < size:
+                sources[fill[target]] = source
+                fill[target] += 1
+    return counts, sources
@@ -0,0 +1,255 @@
+"""Binary snapshots of parsed chunk streams.
+
+A snapshot keeps the chunk tree of a stream as a table of fixed size node
+records next to the stream contents, so the tree is read back, or queried
+straight from a memory map, without parsing the stream again:
+
+>>> export_stream(max_fname, 'Scene', 'scene.snap')
+>>> with Snapshot('scene.snap') as snapshot:
+...     names = [snapshot.value(node) for node in snapshot.find(0x962)]
+...     chunks = snapshot.chunks()
+
+Layout, all integers are little endian:
+
+    header    HEADER_STRUCT: magic, version, length of the stream name,
+              number of nodes, offsets of the node table and of the payload
+              and length of the payload
+    name      stream name in UTF-8, padded to 8 bytes
+    nodes     NODE_STRUCT per chunk in the order of the stream: idn, flags,
+              offset of the chunk header in the payload, length of the
+              chunk data, indexes of the parent, the first child and the
+              next sibling, -1 if there is none
+    payload   the (inflated) stream contents
+"""
+import mmap
+from collections import namedtuple
+from struct import Struct
+
+from . import storage_parser as sp
+from .max_file import session
+
+
+MAGIC = b'MXSN'
+VERSION = 1
+HEADER_STRUCT = Struct('<4sHHIQQQ')
+NODE_STRUCT = Struct('<HHQQiii')
+ALIGNMENT = 8
+# node flags
+CONTAINER_FLAG = 0x1
+# the chunk has a 64 bit length
+EXTENDED_FLAG = 0x2
+NO_NODE = -1
+
+NodeRecord = namedtuple(
+    'NodeRecord', ('idn', 'flags', 'offset', 'length', 'parent',
+                   'first_child', 'next_sibling')
+)
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def snapshot_bytes(buf, stream_name='', select=None):
+    """Return the snapshot of the chunk stream held by `buf'.
+
+    `select' keeps only some of the chunks, see `storage_parser.selector',
+    the payload is the whole stream anyway.
+    """
+    buf = memoryview(buf)
+    nodes = []
+    # index of the last child of the top level and of every open container
+    last_child = [NO_NODE]
+    parents = [NO_NODE]
+    for event in sp.iter_chunks(buf, stream_name, select):
+        if event.kind == sp.EXIT:
+            parents.pop()
+            last_child.pop()
+            continue
+        idx = len(nodes)
+        previous = last_child[-1]
+        if previous != NO_NODE:
+            nodes[previous][6] = idx
+        elif parents[-1] != NO_NODE:
+            nodes[parents[-1]][5] = idx
+        last_child[-1] = idx
+        flags = 0
+        if event.kind == sp.ENTER:
+            flags |= CONTAINER_FLAG
+        if event.header.header_length != sp.HEADER_LENGTH:
+            flags |= EXTENDED_FLAG
+        nodes.append([event.idn, flags, event.offset, event.length,
+                      parents[-1], NO_NODE, NO_NODE])
+        if event.kind == sp.ENTER:
+            parents.append(idx)
+            last_child.append(NO_NODE)
+
+    name = stream_name.encode('utf-8')
+    nodes_offset = _align(HEADER_STRUCT.size + len(name))
+    payload_offset = nodes_offset + NODE_STRUCT.size * len(nodes)
+    out = bytearray(payload_offset)
+    HEADER_STRUCT.pack_into(out, 0, MAGIC, VERSION, len(name), len(nodes),
+                            nodes_offset, payload_offset, len(buf))
+    out[HEADER_STRUCT.size:HEADER_STRUCT.size + len(name)] = name
+    for i, node in enumerate(nodes):
+        NODE_STRUCT.pack_into(out, nodes_offset + i * NODE_STRUCT.size,
+                              *node)
+    out += buf
+    return bytes(out)
+
+
+def export_stream(max_file, stream_name, fname, select=None):
+    """Write the snapshot of the stream of the max file to `fname'.
+    """
+    with session(max_file) as max_file:
+        data = snapshot_bytes(max_file.read_stream(stream_name), stream_name,
+                              select)
+    with open(fname, 'wb') as fout:
+        fout.write(data)
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class Snapshot:
+    """Snapshot read from a file, memory mapped, or from a buffer.
+
+    Nodes are referred to by their index in the node table, the top level
+    nodes are `roots()'.
+    """
+
+    def __init__(self, source):
+        self._mmap = None
+        if isinstance(source, str):
+            with open(source, 'rb') as fin:
+                try:
+                    self._mmap = mmap.mmap(fin.fileno(), 0,
+                                           access=mmap.ACCESS_READ)
+                except ValueError:
+                    raise SnapshotError(
+                        "Not a snapshot: {}".format(source)
+                    )
+            source = self._mmap
+        self.buf = memoryview(source)
+        if len(self.buf) < HEADER_STRUCT.size:
+            raise SnapshotError("Truncated snapshot header")
+        (magic, self.version, name_length, self.count, self._nodes_offset,
+         payload_offset, payload_length) = HEADER_STRUCT.unpack_from(self.buf)
+        if magic != MAGIC:
+            raise SnapshotError("Not a snapshot")
+        if self.version != VERSION:
+            raise SnapshotError(
+                "Unsupported snapshot version {}".format(self.version)
+            )
+        if (payload_offset + payload_length > len(self.buf)
+                or self._nodes_offset + NODE_STRUCT.size * self.count
+                > payload_offset):
+            raise SnapshotError("Truncated snapshot")
+        name_start = HEADER_STRUCT.size
+        self.stream_name = str(self.buf[name_start:name_start + name_length],
+                               'utf-8')
+        # the stream contents
+        self.payload = self.buf[payload_offset:
+                                payload_offset + payload_length]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._mmap is None:
+            return
+        self.payload.release()
+        self.buf.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Values returned as views are still in use, the map is
+            # unmapped when they are garbage collected.
+            pass
+        self._mmap = None
+
+    def __len__(self):
+        return self.count
+
+    def node(self, idx):
+        """Return NodeRecord of the node.
+        """
+        if not 0 <= idx < self.count:
+            raise IndexError(idx)
+        return NodeRecord._make(NODE_STRUCT.unpack_from(
+            self.buf, self._nodes_offset + idx * NODE_STRUCT.size
+        ))
+
+    def nodes(self):
+        """Yield NodeRecord of all the nodes in the order of the stream.
+        """
+        end = self._nodes_offset + self.count * NODE_STRUCT.size
+        for fields in NODE_STRUCT.iter_unpack(self.buf[self._nodes_offset:
+                                                       end]):
+            yield NodeRecord._make(fields)
+
+    def roots(self):
+        return [idx for idx, node in enumerate(self.nodes())
+                if node.parent == NO_NODE]
+
+    def children(self, idx):
+        """Return indexes of the children of the node.
+        """
+        childs = []
+        child = self.node(idx).first_child
+        while child != NO_NODE:
+            childs.append(child)
+            child = self.node(child).next_sibling
+        return childs
+
+    def find(self, idn):
+        """Return indexes of the nodes with the identifier.
+        """
+        return [idx for idx, node in enumerate(self.nodes())
+                if node.idn == idn]
+
+    def value(self, idx):
+        """Return the data of the value node as a view of the payload.
+        """
+        node = self.node(idx)
+        if node.flags & CONTAINER_FLAG:
+            raise SnapshotError("Node {} is a container".format(idx))
+        start = node.offset + _header_length(node.flags)
+        return self.payload[start:start + node.length]
+
+    def chunks(self):
+        """Return the tree as a list of Chunk viewing the payload.
+
+        The same as `storage_parser.parse_chunks' gives for the stream.
+        """
+        # A view of their own, the chunks outlive `close'.
+        payload = self.payload[:]
+        top_level = []
+        # children lists of the containers by index
+        childs_of = {NO_NODE: top_level}
+        depths = []
+        for idx, node in enumerate(self.nodes()):
+            is_container = bool(node.flags & CONTAINER_FLAG)
+            siblings = childs_of[node.parent]
+            depth = 0 if node.parent == NO_NODE else depths[node.parent] + 1
+            depths.append(depth)
+            chunk = sp.Chunk(
+                payload, node.idn,
+                sp.storage_type_of(node.idn, is_container), node.offset,
+                _header_length(node.flags), node.length, depth,
+                len(siblings)
+            )
+            siblings.append(chunk)
+            if is_container:
+                chunk.childs = childs_of[idx] = []
+        return top_level
+
+
+def _header_length(flags):
+    if flags & EXTENDED_FLAG:
+        return sp.HEADER_LENGTH + sp.EXTENDED_LENGTH_STRUCT.size
+    return sp.HEADER_LENGTH
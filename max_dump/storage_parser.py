@@ -1,31 +1,36 @@
 """Extract file properties from 3ds max file.
 """
 
-import io
 import json
-import string
 import sys
+import time
+from collections import OrderedDict, defaultdict, namedtuple
 from enum import IntEnum, unique
-from struct import unpack
-from pprint import pprint
+from struct import Struct, error
 
 import attr
 import hexdump
-import olefile
 
-from .utils import INT_S, SHORT_S, read_int
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .compression import detect, inflate, iter_inflate
+from .ole_reader import OleReader
+from .utils import INT_S, SHORT_S, bin2ascii
 
 
 # id + length
 HEADER_LENGTH = INT_S + SHORT_S
+# id + 32 bit length, as it is laid out in the stream
+HEADER_STRUCT = Struct('<HI')
+# 64 bit length that follows a zero 32 bit length
+EXTENDED_LENGTH_STRUCT = Struct('<Q')
 
 
 DEBUG = False
 #  DEBUG = True
-nest = 0
-def pad():
-    global nest
-    return " " * nest * 2
 
 
 def print(*args, **kwargs):
@@ -33,6 +38,10 @@ def print(*args, **kwargs):
         __builtins__['print'](*args, **kwargs)
 
 
+# ParseStats collecting counters at the moment, see ParseStats.__enter__
+_stats = None
+
+
 @unique
 class StorageType(IntEnum):
     # Container types 100-199
@@ -41,6 +50,7 @@ class StorageType(IntEnum):
 
     CONFIG_SCRIPT = 102
     CONFIG_SCRIPT_ENTRY = 103
+    CLASS_ENTRY = 104
     # Value types 200-299
     VALUE = 200
     DLL_DESCRIPTION = 201
@@ -55,6 +65,7 @@ class StorageType(IntEnum):
     CONFIG_FLOAT = 208
 
     SCENE_OBJECT_NAME = 209
+    DLL_HEADER = 210
 
 
     def is_value(self):
@@ -68,51 +79,60 @@ class StorageType(IntEnum):
 
 
 def utf_16_decode(val):
-    return bytes.decode(val, 'utf-16')
+    return str(val, 'utf-16')
 
 
 @attr.s
 class ClassHeader:
-    """
-
+    """Header of a ClassDirectory3 entry.
     """
     dll_index = attr.ib()
+    # two integers in the order they are stored
     class_id = attr.ib()
     super_class_id = attr.ib()
 
+    LAYOUT = Struct('<4i')
+
     @classmethod
     def decode(cls, val):
-        assert len(val) == 16, "Length of a class header string must be 16"
-        dll_index, *class_id, super_class_id = unpack('4i', val)
-        class_id_hex = tuple(reversed(list(map(hex, class_id))))
-        return cls(dll_index, class_id_hex, hex(super_class_id))
+        assert len(val) == cls.LAYOUT.size, \
+            "Length of a class header string must be 16"
+        dll_index, *class_id, super_class_id = cls.LAYOUT.unpack(val)
+        return cls(dll_index, tuple(class_id), super_class_id)
+
+    def asdict(self):
+        return {
+            "dll_index": self.dll_index,
+            "class_id": [hex(x) for x in reversed(self.class_id)],
+            "super_class_id": hex(self.super_class_id),
+        }
+
+
+@attr.s(slots=True, frozen=True)
+class KnownType:
+    """Chunk type known by its identifier.
+    """
+    storage_type = attr.ib()
+    # callable that decodes the payload of a value
+    decoder = attr.ib()
+    # precompiled Struct of the payload, None if the length varies
+    layout = attr.ib(default=None)
+
+
+def _no_value(_):
+    return None
 
 
 KNOWN_TYPES = {
-    "0x2037": {
-        "storage_type": StorageType.DLL_NAME,
-        "decoder": utf_16_decode,
-    },
-    "0x2038": {
-        "storage_type": StorageType.DLL_ENTRY,
-        "decoder": lambda _: None,
-    },
-    "0x2039": {
-        "storage_type": StorageType.DLL_DESCRIPTION,
-        "decoder": utf_16_decode,
-    },
-    "0x2042": {
-        "storage_type": StorageType.CLASS_DESCRIPTION,
-        "decoder": utf_16_decode,
-    },
-    "0x2060": {
-        "storage_type": StorageType.CLASS_HEADER,
-        "decoder": ClassHeader.decode
-    },
-    "0x962": {
-        "storage_type": StorageType.SCENE_OBJECT_NAME,
-        "decoder": utf_16_decode,
-    },
+    0x2037: KnownType(StorageType.DLL_NAME, utf_16_decode),
+    0x2038: KnownType(StorageType.DLL_ENTRY, _no_value),
+    0x2039: KnownType(StorageType.DLL_DESCRIPTION, utf_16_decode),
+    0x21c0: KnownType(StorageType.DLL_HEADER, _no_value),
+    0x2040: KnownType(StorageType.CLASS_ENTRY, _no_value),
+    0x2042: KnownType(StorageType.CLASS_DESCRIPTION, utf_16_decode),
+    0x2060: KnownType(StorageType.CLASS_HEADER, ClassHeader.decode,
+                      ClassHeader.LAYOUT),
+    0x962: KnownType(StorageType.SCENE_OBJECT_NAME, utf_16_decode),
 }
 
 
@@ -125,48 +145,146 @@ class Header:
     length = attr.ib()
     storage_type = attr.ib()
     storage_type_name = attr.ib()
+    # size of the header itself, 6 or 14 for the extended header
+    header_length = attr.ib(default=HEADER_LENGTH)
+
+
+def _value_repr(node):
+    return node.value
+
+
+def _hex_spaced_repr(node):
+    return hexdump.dump(node.value_bytes)
+
+
+def _utf_16_repr(node):
+    return node.value_bytes.decode('utf-16', 'replace')
+
+
+def _ascii_repr(node):
+    return bin2ascii(node.value_bytes)
+
+
+def _parsed_repr(node):
+    known_type = KNOWN_TYPES.get(node.idn)
+    if known_type is None:
+        return None
+    if _stats is not None:
+        return _stats.decode(node.idn, known_type.decoder, node.value)
+    return known_type.decoder(node.value)
+
+
+# Derived representations of a value chunk by name.  `value' is the raw
+# payload view and is not serializable, the rest are.
+REPRESENTATIONS = OrderedDict([
+    ('value', _value_repr),
+    ('hex_spaced', _hex_spaced_repr),
+    ('utf_16', _utf_16_repr),
+    ('ascii', _ascii_repr),
+    ('parsed', _parsed_repr),
+])
+# What `storage_parse' outputs for a value unless told otherwise
+DEFAULT_REPRESENTATIONS = ('hex_spaced', 'ascii', 'parsed')
+
+
+class RepresentationMixin:
+    """Derived representations of a chunk, computed on first access.
+
+    A class using the mixin provides `idn', `storage_type', `childs',
+    `value', `value_bytes', `is_container()' and a `_reprs' slot where
+    the computed representations are cached.
+    """
+    __slots__ = ()
+
+    def representation(self, name):
+        reprs = self._reprs
+        if reprs is None:
+            reprs = self._reprs = {}
+        if name not in reprs:
+            reprs[name] = REPRESENTATIONS[name](self)
+        return reprs[name]
+
+    @property
+    def idn_hex(self):
+        return hex(self.idn)
+
+    @property
+    def hex_spaced(self):
+        return self.representation('hex_spaced')
+
+    @property
+    def utf_16(self):
+        return self.representation('utf_16')
+
+    @property
+    def ascii(self):
+        return self.representation('ascii')
+
+    @property
+    def parsed(self):
+        return self.representation('parsed')
+
+    def header_asdict(self):
+        return {
+            "idn": self.idn_hex,
+            "storage_type_name": self.storage_type.name,
+        }
+
+    def asdict(self, representations=DEFAULT_REPRESENTATIONS):
+        """Render the chunk the way `storage_parse' outputs it.
+
+        Only the given `representations' of the values are computed.
+        """
+        header = self.header_asdict()
+        if self.is_container():
+            return {
+                "header": header,
+                "childs": [child.asdict(representations)
+                           for child in self.childs],
+            }
+        rendered = {"header": header}
+        for name in representations:
+            value = self.representation(name)
+            if hasattr(value, 'asdict'):
+                value = value.asdict()
+            elif attr.has(value.__class__):
+                value = attr.asdict(value)
+            rendered[name] = value
+        return rendered
 
 
 @attr.s(slots=True)
-class StorageValue:
+class StorageValue(RepresentationMixin):
     """Storage value.
     """
     header = attr.ib()
     value = attr.ib()
-    hex_spaced = attr.ib()
-    utf_16 = attr.ib()
-    ascii = attr.ib()
-    parsed = attr.ib()
+    # nesting level, top level chunks have depth 0
+    depth = attr.ib(default=0)
+    _reprs = attr.ib(default=None, init=False, repr=False, eq=False)
 
     @property
-    def value_bytes(self):
-        return bytes.fromhex(self.value)
+    def idn(self):
+        return self.header.idn
 
-    @hex_spaced.default
-    def hex_spaced_default(self):
-        return hexdump.dump(self.value_bytes)
+    @property
+    def storage_type(self):
+        return self.header.storage_type
 
-    @ascii.default
-    def ascii_default(self):
-        s = self.value_bytes.decode('ascii', 'replace')
-        return ''.join(map(lambda x: x if x in string.printable else '.', s))
+    @property
+    def childs(self):
+        return []
 
-    @utf_16.default
-    def utf_16_default(self):
-        s = self.value_bytes.decode('utf-16', 'replace')
-        return s
+    def is_container(self):
+        return False
 
-    @parsed.default
-    def parsed_default(self):
-        if self.header.idn not in KNOWN_TYPES:
-            return None
-        idn = self.header.idn
-        decoder = KNOWN_TYPES[idn]["decoder"]
-        return decoder(self.value_bytes)
+    @property
+    def value_bytes(self):
+        return bytes(self.value)
 
 
 @attr.s(slots=True)
-class StorageContainer:
+class StorageContainer(RepresentationMixin):
     """Storage container.
 
     Stores other containers.
@@ -174,119 +292,634 @@ class StorageContainer:
     header = attr.ib()
     childs = attr.ib()
     count = attr.ib()
+    depth = attr.ib(default=0)
+    _reprs = attr.ib(default=None, init=False, repr=False, eq=False)
 
     @count.default
     def count_default(self):
         return len(self.childs)
 
+    @property
+    def idn(self):
+        return self.header.idn
+
+    @property
+    def storage_type(self):
+        return self.header.storage_type
+
+    def is_container(self):
+        return True
+
+
+class Chunk(RepresentationMixin):
+    """Compact parsed chunk.
+
+    Keeps the integer identifier and the position of the chunk in the
+    stream buffer shared by all chunks.  Nothing is decoded until asked.
+    """
+    __slots__ = ('buf', 'idn', 'storage_type', 'offset', 'header_length',
+                 'length', 'depth', 'index', 'childs', '_reprs')
+
+    def __init__(self, buf, idn, storage_type, offset, header_length,
+                 length, depth, index=0, childs=()):
+        self.buf = buf
+        self.idn = idn
+        self.storage_type = storage_type
+        # offset of the chunk header in `buf'
+        self.offset = offset
+        self.header_length = header_length
+        # length of the payload
+        self.length = length
+        self.depth = depth
+        # position among the children of the parent, skipped chunks included
+        self.index = index
+        self.childs = childs
+        self._reprs = None
+
+    @property
+    def data_offset(self):
+        return self.offset + self.header_length
+
+    def is_container(self):
+        return self.storage_type.is_container()
+
+    @property
+    def value(self):
+        start = self.data_offset
+        return self.buf[start:start + self.length]
+
+    @property
+    def value_bytes(self):
+        return bytes(self.value)
+
+    @property
+    def count(self):
+        return len(self.childs)
+
+    def __repr__(self):
+        return "<{} {} {} at {}>".format(
+            self.__class__.__name__, hex(self.idn), self.storage_type.name,
+            self.offset
+        )
+
 
 class StorageException(Exception):
     pass
 
 
-def read_idn(stream) -> hex:
-    """Read an identifier of a chunk.
+def _new_idn_counters():
+    return {"count": 0, "payload_bytes": 0, "containers": 0, "values": 0}
+
+
+def _new_stream_counters():
+    counters = _new_idn_counters()
+    counters["max_depth"] = 0
+    counters["idns"] = defaultdict(_new_idn_counters)
+    return counters
+
+
+class ParseStats:
+    """Counters of the parsed chunks.
 
-    An identifier is an unsigned short integer.
+    Nothing is counted unless the instance is active:
+
+    >>> with ParseStats() as stats:
+    ...     scene = storage_parse(max_fname, 'Scene')
+    >>> scene_counters = stats.asdict()['streams']['Scene']
+
+    Per stream it counts chunks, containers, values, payload bytes of the
+    values and the maximum depth, the same counters are kept per idn.  The
+    time spent in each decoder of KNOWN_TYPES is accumulated by idn.
     """
-    b = stream.read(SHORT_S)
-    print(pad(), hexdump.dump(b))
-    return hex(unpack('H', b)[0])
 
+    def __init__(self):
+        self.streams = defaultdict(_new_stream_counters)
+        self.decoders = defaultdict(
+            lambda: {"decoder": None, "calls": 0, "seconds": 0.0}
+        )
+        self._previous = []
+
+    def __enter__(self):
+        global _stats
+        self._previous.append(_stats)
+        _stats = self
+        return self
+
+    def __exit__(self, *exc_info):
+        global _stats
+        _stats = self._previous.pop()
+
+    def count(self, stream_name, events):
+        """Pass the events through, counting them.
+        """
+        stream = self.streams[stream_name]
+        idns = stream["idns"]
+        for event in events:
+            if event.kind != EXIT:
+                is_container = event.kind == ENTER
+                for counters in (stream, idns[event.idn]):
+                    counters["count"] += 1
+                    if is_container:
+                        counters["containers"] += 1
+                    else:
+                        counters["values"] += 1
+                        counters["payload_bytes"] += event.length
+                if event.depth > stream["max_depth"]:
+                    stream["max_depth"] = event.depth
+            yield event
+
+    def decode(self, idn, decoder, value):
+        """Decode the value, timing the decoder.
+        """
+        start = time.perf_counter()
+        try:
+            return decoder(value)
+        finally:
+            counters = self.decoders[idn]
+            counters["decoder"] = decoder.__qualname__
+            counters["calls"] += 1
+            counters["seconds"] += time.perf_counter() - start
+
+    def asdict(self):
+        streams = {}
+        for stream_name, counters in self.streams.items():
+            counters = dict(counters)
+            counters["idns"] = {hex(idn): idn_counters for idn, idn_counters
+                                in counters["idns"].items()}
+            streams[stream_name] = counters
+        decoders = {hex(idn): counters
+                    for idn, counters in self.decoders.items()}
+        return {"streams": streams, "decoders": decoders}
+
+
+def read_container(stream, length):
+    """Parse the storage stream in the max container file.
+    """
+    nodes = parse_buffer(stream.read(length))
+    return [asdict(node) for node in nodes]
 
-def read_int(stream):
-    b = stream.read(INT_S)
-    print(pad(), hexdump.dump(b))
-    return unpack('i', b)[0]
-    #  return unpack('i', stream.read(INT_S))[0]
 
+def read_header_at(buf, offset):
+    """Return the header of the chunk at `offset' and the offset of its data.
 
-def read_header(stream):
-    """Return id, length, type of the chunk.
+    `buf' is anything that supports the buffer protocol, usually
+    a memoryview of the whole stream.
     """
-    idn = read_idn(stream)
-    length = read_int(stream)
-    if length == 0:
+    idn, length, is_container, header_length = read_raw_header_at(buf,
+                                                                  offset)
+    return _make_header(idn, length, is_container, header_length), \
+        offset + header_length
+
+
+def _make_header(idn, length, is_container, header_length):
+    storage_type = storage_type_of(idn, is_container)
+    return Header(idn, length, storage_type, storage_type.name,
+                  header_length)
+
+
+def storage_type_of(idn, is_container):
+    """Return StorageType of a chunk.
+    """
+    # Specify type if `idn' is known.
+    known_type = KNOWN_TYPES.get(idn)
+    if known_type is not None:
+        return known_type.storage_type
+    if is_container:
+        return StorageType.CONTAINER
+    return StorageType.VALUE
+
+
+def read_raw_header_at(buf, offset):
+    """Return (idn, length, is_container, header_length) of the chunk at
+    `offset', where `length' is the length of the payload.
+
+    Nothing but the tuple is created, see `read_header_at'.
+    """
+    try:
+        idn, length = HEADER_STRUCT.unpack_from(buf, offset)
+        header_length = HEADER_STRUCT.size
+        length_size_bits = 32
+        if length == 0:
+            # Extended header: the real length is 64 bit long
+            length, = EXTENDED_LENGTH_STRUCT.unpack_from(
+                buf, offset + header_length
+            )
+            header_length += EXTENDED_LENGTH_STRUCT.size
+            length_size_bits = 64
+    except error:
         raise StorageException(
-                "Extended header length is not yet supported: {}".format(idn)
+            "Truncated chunk header at offset {}".format(offset)
         )
-    length -= HEADER_LENGTH
     # the msb is a flag that helpfully lets us know if the chunk itself
     # contains more chunks, i.e. is a container
-    sign_bit = 1 << 31
-    if length & sign_bit:
-        storage_type = StorageType.CONTAINER
-        byte_mask = (1 << 32) - 1
-        # unset sign bit and keep length under int size
-        length &= ~sign_bit & byte_mask
-    else:
-        storage_type = StorageType.VALUE
-    # Specify type if `idn' is known.
-    if idn in KNOWN_TYPES:
-        storage_type = KNOWN_TYPES[idn]["storage_type"]
-    return Header(idn, length, storage_type, storage_type.name)
+    sign_bit = 1 << (length_size_bits - 1)
+    is_container = bool(length & sign_bit)
+    length &= ~sign_bit
+    if length < header_length:
+        raise StorageException(
+            "Invalid length {} of the chunk {} at offset {}"
+            .format(length, hex(idn), offset)
+        )
+    return idn, length - header_length, is_container, header_length
 
 
-def read_value(stream, length):
-    val = stream.read(length)
-    s = val.hex()
-    print(pad(), s)
-    return s
+# Kinds of events produced by `iter_chunks'
+ENTER = 'enter'
+VALUE = 'value'
+EXIT = 'exit'
 
 
-def read_container(stream, length):
-    """Parse the storage stream in the max container file.
+# `offset' is the offset of the chunk header, `length' is the length of the
+# payload.  `value' is a view of the payload for VALUE events.  `index' is
+# the position of the chunk among the children of its parent.
+ChunkEvent = namedtuple(
+    'ChunkEvent', ('kind', 'idn', 'depth', 'offset', 'length', 'header',
+                   'value', 'index')
+)
+
+
+def iter_chunks(buf, stream_name=None, select=None):
+    """Walk the chunk stream held by `buf' and yield ChunkEvent.
+
+    A container produces an ENTER event, the events of its children and
+    an EXIT event.  A value produces a single VALUE event whose value is
+    a memoryview into `buf'.  Nothing is kept between events.
+
+    The walk does not recurse: open containers are kept on an explicit
+    stack, so the nesting depth is not limited by the interpreter.
+
+    `select' limits the walk to some of the chunks, see `selector'.
+
+    `stream_name' only labels the counters of an active ParseStats.
     """
-    global nest
-    nest += 1
-    childs = []
-    start = stream.tell()
-    consumed = 0
-    while consumed < length:
-        header = read_header(stream)
-        child = None
-        print(pad(), header.storage_type_name)
+    events = _iter_chunks(memoryview(buf),
+                          None if select is None else selector(select))
+    if _stats is not None:
+        return _stats.count(stream_name, events)
+    return events
+
+
+def selector(select):
+    """Return the predicate of chunks to keep.
+
+    `select' is either a predicate `select(path, idn, depth)', where `path'
+    is the tuple of idns of the parents, or a collection of idns to keep.
+    A chunk that is not kept is skipped by its length, the children of
+    a skipped container are not looked at.
+    """
+    if callable(select):
+        return select
+    idns = frozenset(select)
+    return lambda path, idn, depth: idn in idns
+
+
+def _iter_chunks(buf, select=None):
+    # (end of the parent, offset, header, index, path) of every open
+    # container
+    frames = []
+    path = ()
+    pos = 0
+    end = len(buf)
+    index = 0
+    while True:
+        while pos >= end:
+            if not frames:
+                return
+            # Like the stream based parser, a chunk that claims to be longer
+            # than its parent moves the parent's end along with it.
+            end, start, header, index, path = frames.pop()
+            yield ChunkEvent(EXIT, header.idn, len(frames), start,
+                             header.length, header, None, index)
+            index += 1
+        start = pos
+        idn, length, is_container, header_length = read_raw_header_at(buf,
+                                                                      pos)
+        pos += header_length
+        depth = len(frames)
+        if select is not None and not select(path, idn, depth):
+            pos += length
+            index += 1
+            continue
+        header = _make_header(idn, length, is_container, header_length)
         if header.storage_type.is_container():
-        #  if header.storage_type == StorageType.CONTAINER:
-            print(pad(), "container")
-            nodes = read_container(stream, header.length)
-            child = StorageContainer(header, nodes)
-        #  elif header.storage_type == StorageType.VALUE:
+            yield ChunkEvent(ENTER, idn, depth, start, length, header, None,
+                             index)
+            frames.append((end, start, header, index, path))
+            end = pos + length
+            path += (idn, )
+            index = 0
         elif header.storage_type.is_value():
-            print(pad(), "value")
-            val = read_value(stream, header.length)
-            child = StorageValue(header, val)
+            yield ChunkEvent(VALUE, idn, depth, start, length, header,
+                             buf[pos:pos + length], index)
+            pos += length
+            index += 1
         else:
             raise Exception(
                 "Unknown header type: {}".format(header.storage_type)
             )
-        childs.append(attr.asdict(
-            child,
-            #  filter=lambda a, _: print(a)
-            filter=lambda a, _: a.name in (
-                'idn', 'storage_type_name', 'hex_spaced', 'ascii', 'header',
-                'childs', 'parsed', 'dll_index', 'super_class_id', 'class_id'
+
+
+# Consumed bytes are dropped from the window of `iter_chunks_incremental'
+# once there are that many of them.
+WINDOW_TRIM_SIZE = 64 * 1024
+MAX_HEADER_LENGTH = HEADER_STRUCT.size + EXTENDED_LENGTH_STRUCT.size
+
+
+def iter_chunks_incremental(pieces, stream_name=None, select=None):
+    """Walk the chunk stream arriving as an iterable of byte pieces.
+
+    Yield the same ChunkEvent as `iter_chunks' does, but the values are
+    bytes copied out of the pieces.  Only the bytes of the chunk being
+    read are kept, so memory does not grow with the stream, e.g. for an
+    inflated stream, see `compression.iter_inflate'.
+    """
+    events = _iter_incremental(iter(pieces),
+                               None if select is None else selector(select))
+    if _stats is not None:
+        return _stats.count(stream_name, events)
+    return events
+
+
+def _iter_incremental(pieces, select):
+    window = bytearray()
+    # stream offset of the first byte of the window
+    base = 0
+
+    def fill(upto, keep_from):
+        """Read pieces until the window reaches `upto', return whether
+        it does.  Bytes before `keep_from' are dropped on the way.
+        """
+        nonlocal base, window
+        while True:
+            consumed = min(keep_from - base, len(window))
+            if consumed >= WINDOW_TRIM_SIZE:
+                # A new buffer, deleting the head would keep the memory.
+                window = window[consumed:]
+                base += consumed
+            if base + len(window) >= upto:
+                return True
+            piece = next(pieces, None)
+            if piece is None:
+                return False
+            window += piece
+
+    # (end of the parent, offset, header, index, path) of every open
+    # container, the end of the stream is not known up front
+    frames = []
+    path = ()
+    pos = 0
+    end = None
+    index = 0
+    while True:
+        while end is not None and pos >= end:
+            end, start, header, index, path = frames.pop()
+            yield ChunkEvent(EXIT, header.idn, len(frames), start,
+                             header.length, header, None, index)
+            index += 1
+        if pos + MAX_HEADER_LENGTH > base + len(window):
+            if not fill(pos + 1, pos) and not frames:
+                return
+            if not fill(pos + HEADER_STRUCT.size, pos):
+                raise StorageException(
+                    "Truncated chunk header at offset {}".format(pos)
+                )
+            fill(pos + MAX_HEADER_LENGTH, pos)
+        start = pos
+        idn, length, is_container, header_length = read_raw_header_at(
+            window, pos - base
+        )
+        pos += header_length
+        depth = len(frames)
+        if select is not None and not select(path, idn, depth):
+            pos += length
+            index += 1
+            continue
+        header = _make_header(idn, length, is_container, header_length)
+        if header.storage_type.is_container():
+            yield ChunkEvent(ENTER, idn, depth, start, length, header, None,
+                             index)
+            frames.append((end, start, header, index, path))
+            end = pos + length
+            path += (idn, )
+            index = 0
+        else:
+            if pos + length > base + len(window):
+                fill(pos + length, pos)
+            value = bytes(window[pos - base:pos - base + length])
+            yield ChunkEvent(VALUE, idn, depth, start, length, header,
+                             memoryview(value), index)
+            pos += length
+            index += 1
+
+
+def build_tree(events):
+    """Build StorageValue and StorageContainer lists out of ChunkEvent.
+    """
+    childs = []
+    parents = []
+    for event in events:
+        if event.kind == VALUE:
+            childs.append(
+                StorageValue(event.header, event.value, depth=event.depth)
             )
+        elif event.kind == ENTER:
+            parents.append(childs)
+            childs = []
+        else:
+            container = StorageContainer(event.header, childs,
+                                         depth=event.depth)
+            childs = parents.pop()
+            childs.append(container)
+    return childs
+
+
+def build_chunks(events, buf):
+    """Build a list of Chunk out of ChunkEvent of `buf'.
+    """
+    childs = []
+    parents = []
+    for event in events:
+        if event.kind == EXIT:
+            container = childs
+            childs = parents.pop()
+            childs[-1].childs = container
+            continue
+        header = event.header
+        childs.append(Chunk(
+            buf, event.idn, header.storage_type, event.offset,
+            header.header_length, event.length, event.depth, event.index
         ))
-        consumed = stream.tell() - start
-    nest -= 1
+        if event.kind == ENTER:
+            parents.append(childs)
+            childs = []
     return childs
 
 
+def parse_chunks(buf, stream_name=None, select=None):
+    """Parse the chunk stream held by `buf' into a list of Chunk.
+
+    Only the chunks kept by `select' are parsed, see `selector'.
+    """
+    buf = memoryview(buf)
+    return build_chunks(iter_chunks(buf, stream_name, select), buf)
+
+
+def parse_buffer(buf):
+    """Parse the whole chunk stream held by `buf'.
+
+    Return a list of StorageValue and StorageContainer.  The values are
+    memoryviews into `buf'.
+    """
+    return build_tree(iter_chunks(buf))
+
+
+# Columns of the table returned by `chunk_table'
+CHUNK_TABLE_FIELDS = (
+    # offset of the chunk header in the stream
+    ('offset', 'i8'),
+    ('idn', 'u2'),
+    ('header_length', 'u1'),
+    # length of the payload
+    ('length', 'i8'),
+    ('is_container', '?'),
+    ('depth', 'i4'),
+    # row of the parent container, -1 for the top level chunks
+    ('parent', 'i4'),
+)
+
+
+def chunk_table(buf):
+    """Return the chunk structure of the stream as a flat table.
+
+    The table is a NumPy structured array with a row per chunk, in stream
+    order, see CHUNK_TABLE_FIELDS.  It is returned along with the buffer
+    the offsets point into:
+
+    >>> table, buf = chunk_table(ba)
+    >>> names = table[table['idn'] == 0x962]
+    >>> node_names = names[table['idn'][names['parent']] == node_idn]
+    """
+    if np is None:
+        raise ImportError("chunk_table requires numpy")
+    buf = memoryview(buf)
+    rows = []
+    parents = [-1]
+    for event in iter_chunks(buf):
+        if event.kind == EXIT:
+            parents.pop()
+            continue
+        is_container = event.kind == ENTER
+        rows.append((
+            event.offset,
+            event.idn,
+            event.header.header_length,
+            event.length,
+            is_container,
+            event.depth,
+            parents[-1],
+        ))
+        if is_container:
+            parents.append(len(rows) - 1)
+    table = np.array(rows, dtype=list(CHUNK_TABLE_FIELDS))
+    return table, buf
+
+
+def asdict(node, representations=DEFAULT_REPRESENTATIONS):
+    """Render a parsed chunk as a dictionary.
+    """
+    return node.asdict(representations)
+
+
 def read_stream(max_fname, stream_name):
-    """Read the stream and return its contents as bytes.
+    """Return contents of the stream as a memoryview.
+
+    The view maps the file itself unless the sectors of the stream are
+    scattered, see OleReader, or the stream is compressed.  A compressed
+    stream is inflated.
+    """
+    with OleReader(max_fname) as ole:
+        return maybe_inflate(ole.open_stream(stream_name))
+
+
+def stream_events(buf, stream_name=None, select=None):
+    """Return ChunkEvent of the raw stream contents, see `iter_chunks'.
+
+    A compressed stream, see `stream_wbits', is inflated on the fly and
+    never held whole.
+    """
+    wbits = stream_wbits(buf)
+    if wbits is None:
+        return iter_chunks(buf, stream_name, select)
+    return iter_chunks_incremental(iter_inflate(buf, wbits), stream_name,
+                                   select)
+
+
+def stream_wbits(buf):
+    """Return wbits to inflate the raw stream contents with, None if the
+    stream is not compressed, see `compression.detect'.
+
+    A stream whose top level chunks fill it exactly is not compressed,
+    whatever it starts with.
+    """
+    wbits = detect(buf)
+    if wbits is None or _is_chunk_stream(buf):
+        return None
+    return wbits
+
+
+def maybe_inflate(buf):
+    """Return the stream inflated if it is compressed, see `stream_wbits',
+    `buf' otherwise.
+
+    CompressionError is raised if a compressed stream does not inflate.
+    """
+    wbits = stream_wbits(buf)
+    if wbits is None:
+        return buf
+    return inflate(buf, wbits)
+
+
+def _is_chunk_stream(buf):
+    pos = 0
+    try:
+        while pos < len(buf):
+            _, length, _, header_length = read_raw_header_at(buf, pos)
+            pos += header_length + length
+    except StorageException:
+        return False
+    return pos == len(buf)
+
+
+def storage_iter(max_fname, stream_name, select=None):
+    """Yield ChunkEvent of the stream, see `stream_events'.
+    """
+    with OleReader(max_fname) as ole:
+        ba = ole.open_stream(stream_name)
+    yield from stream_events(ba, stream_name, select)
+
+
+def storage_chunk_table(max_fname, stream_name):
+    """Return `chunk_table' of the stream.
     """
-    ole = olefile.OleFileIO(max_fname)
-    ba = ole.openstream(stream_name).read()
-    ole.close()
-    return ba
+    return chunk_table(read_stream(max_fname, stream_name))
+
 
+def storage_parse(max_fname, stream_name, compact=False,
+                  representations=DEFAULT_REPRESENTATIONS, select=None):
+    """Parse the chunk stream of the max file.
 
-def storage_parse(max_fname, stream_name):
+    Return a list of dictionaries holding the given `representations' of
+    the values, see REPRESENTATIONS.  Return a list of Chunk if `compact'
+    is set.  `select' keeps only some of the chunks, see `selector':
+
+    >>> names = storage_parse(max_fname, 'DllDirectory',
+    ...                       select={0x2038, 0x2039})
+    """
     ba = read_stream(max_fname, stream_name)
-    stream = io.BytesIO(ba)
-    nodes = read_container(stream, len(ba))
-    return nodes
+    chunks = parse_chunks(ba, stream_name, select)
+    if compact:
+        return chunks
+    return [chunk.asdict(representations) for chunk in chunks]
 
 
 def extract_vpq(max_fname):
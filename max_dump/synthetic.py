@@ -0,0 +1,330 @@
+"""Generate synthetic max files for stress tests and benchmarks.
+
+The files hold ClassDirectory3, DllDirectory and Scene streams shaped like
+the ones 3ds Max writes, at any size:
+
+>>> manifest = generate('big.max', Spec(objects=50000, seed=1))
+>>> dump_cameras('big.max') == manifest.cameras
+True
+
+A scene object is a Node, the object a Node refers to, a camera or
+a geometry object, or a filler object of some other class.  Every object
+holds random values and containers nested `depth' levels deep.  The same
+Spec, seed included, gives the same file byte for byte.
+
+    $ python -m max_dump.synthetic big.max --objects 50000 --seed 1
+"""
+import argparse
+import json
+import random
+import sys
+from collections import OrderedDict
+from struct import Struct
+
+import attr
+
+from . import storage_parser as sp
+from .dump_cameras import CAMERA_SUPER_CLASS_ID
+from .extractors import GEOMETRY_SUPER_CLASS_ID
+from .max_file import CLASS_DIRECTORY, DLL_DIRECTORY, SCENE
+from .ole_writer import write_ole
+from .scene_index import NODE_CLASS_NAME, NODE_REFS_IDN, OBJECT_NAME_IDN
+
+
+NODE_SUPER_CLASS_ID = 0x1
+# Super class ids of the filler classes, none of them is a camera
+FILLER_SUPER_CLASS_IDS = (0x8, 0x82, 0x100, 0x1080, 0x1160, 0x9003)
+CAMERA_CLASS_NAMES = ('Free Camera', 'Target Camera', 'Physical')
+GEOMETRY_CLASS_NAMES = ('Box', 'Sphere', 'Teapot', 'Editable Poly')
+SCENE_IDN = 0x2021
+DLL_HEADER_IDN = 0x21c0
+DLL_ENTRY_IDN = 0x2038
+DLL_DESCRIPTION_IDN = 0x2039
+DLL_NAME_IDN = 0x2037
+CLASS_ENTRY_IDN = 0x2040
+CLASS_HEADER_IDN = 0x2060
+CLASS_NAME_IDN = 0x2042
+# Identifiers of the random chunks, the known ones are left out
+FILLER_IDNS = tuple(idn for idn in range(0x100, 0x2000)
+                    if idn not in sp.KNOWN_TYPES and idn != NODE_REFS_IDN)
+# A Node refers to its object and to some filler objects.
+MAX_EXTRA_REFS = 3
+MAX_LENGTH = (1 << 31) - 1
+EXTENDED_HEADER_LENGTH = (sp.HEADER_STRUCT.size +
+                          sp.EXTENDED_LENGTH_STRUCT.size)
+REF_STRUCT = Struct('<i')
+
+
+@attr.s
+class Spec:
+    """What to generate.
+    """
+    # number of scene objects
+    objects = attr.ib(default=1000)
+    # share of the objects that are Nodes, every Node refers to an object
+    # of its own, so it is at most 0.5
+    node_ratio = attr.ib(default=0.25)
+    # share of the Nodes referring to a camera, the rest refer to geometry
+    camera_ratio = attr.ib(default=0.1)
+    # levels of containers nested in an object
+    depth = attr.ib(default=2)
+    # inclusive ranges of the number of values in a container and of the
+    # length of a value
+    values = attr.ib(default=(1, 6))
+    payload_size = attr.ib(default=(0, 64))
+    # share of the chunks with a 64 bit extended header
+    extended_ratio = attr.ib(default=0.0)
+    filler_classes = attr.ib(default=16)
+    dlls = attr.ib(default=8)
+    seed = attr.ib(default=0)
+
+    def __attrs_post_init__(self):
+        if not 0 <= self.node_ratio <= 0.5:
+            raise ValueError("node_ratio must be within [0, 0.5]")
+        if not 0 <= self.camera_ratio <= 1:
+            raise ValueError("camera_ratio must be within [0, 1]")
+        if self.depth < 0 or self.objects < 0:
+            raise ValueError("depth and objects must not be negative")
+        if self.filler_classes < 1:
+            raise ValueError("There must be a filler class")
+
+
+@attr.s
+class Manifest:
+    """What was generated, to check a parser against.
+    """
+    spec = attr.ib()
+    # names of the classes in ClassDirectory3
+    classes = attr.ib()
+    # class index of every scene object
+    object_classes = attr.ib()
+    # names of the Nodes by their index in the scene
+    node_names = attr.ib()
+    # what `dump_cameras' returns
+    cameras = attr.ib()
+    # stream sizes by name
+    stream_sizes = attr.ib(default=attr.Factory(dict))
+
+
+class _Generator:
+    def __init__(self, spec):
+        self.spec = spec
+        self.rng = random.Random(spec.seed)
+
+    def chunk(self, idn, payload):
+        return self._header(idn, len(payload), False) + payload
+
+    def container(self, idn, childs):
+        length = sum(len(child) for child in childs)
+        return b''.join([self._header(idn, length, True)] + childs)
+
+    def _header(self, idn, length, is_container):
+        extended = self.rng.random() < self.spec.extended_ratio
+        if extended or length + sp.HEADER_STRUCT.size > MAX_LENGTH:
+            length += EXTENDED_HEADER_LENGTH
+            return sp.HEADER_STRUCT.pack(idn, 0) + \
+                sp.EXTENDED_LENGTH_STRUCT.pack(length | is_container << 63)
+        length += sp.HEADER_STRUCT.size
+        return sp.HEADER_STRUCT.pack(idn, length | is_container << 31)
+
+    def payload(self):
+        size = self.rng.randint(*self.spec.payload_size)
+        if not size:
+            return b''
+        return self.rng.getrandbits(8 * size).to_bytes(size, 'little')
+
+    def filler(self, depth):
+        """Return random values and containers nested `depth' levels.
+        """
+        rng = self.rng
+        childs = [self.chunk(rng.choice(FILLER_IDNS), self.payload())
+                  for _ in range(rng.randint(*self.spec.values))]
+        if depth > 0:
+            childs.insert(rng.randrange(len(childs) + 1), self.container(
+                rng.choice(FILLER_IDNS), self.filler(depth - 1)
+            ))
+        return childs
+
+    def dll_directory(self):
+        childs = [self.chunk(DLL_HEADER_IDN, REF_STRUCT.pack(0x46500369))]
+        for i in range(self.spec.dlls):
+            childs.append(self.container(DLL_ENTRY_IDN, [
+                self.chunk(DLL_DESCRIPTION_IDN,
+                           _utf_16('Synthetic plugin {}'.format(i))),
+                self.chunk(DLL_NAME_IDN,
+                           _utf_16('synthetic{}.dlo'.format(i))),
+            ]))
+        return b''.join(childs)
+
+    def classes(self):
+        """Return (name, super class id) of the classes in their order.
+        """
+        classes = [(NODE_CLASS_NAME, NODE_SUPER_CLASS_ID)]
+        classes += [(name, CAMERA_SUPER_CLASS_ID)
+                    for name in CAMERA_CLASS_NAMES]
+        classes += [(name, GEOMETRY_SUPER_CLASS_ID)
+                    for name in GEOMETRY_CLASS_NAMES]
+        classes += [('Synthetic{}'.format(i),
+                     self.rng.choice(FILLER_SUPER_CLASS_IDS))
+                    for i in range(self.spec.filler_classes)]
+        self.rng.shuffle(classes)
+        return classes
+
+    def class_directory(self, classes):
+        rng = self.rng
+        entries = []
+        for name, super_class_id in classes:
+            dll_index = rng.randrange(-1, self.spec.dlls)
+            class_id = (rng.getrandbits(31), rng.getrandbits(31))
+            header = sp.ClassHeader.LAYOUT.pack(dll_index, *class_id,
+                                                super_class_id)
+            entries.append(self.container(CLASS_ENTRY_IDN, [
+                self.chunk(CLASS_HEADER_IDN, header),
+                self.chunk(CLASS_NAME_IDN, _utf_16(name)),
+            ]))
+        return b''.join(entries)
+
+    def scene(self, classes):
+        """Return the Scene stream and the Manifest of it.
+        """
+        spec = self.spec
+        rng = self.rng
+
+        def indexes_of(super_class_id):
+            return [idx for idx, (name, sc_id) in enumerate(classes)
+                    if sc_id == super_class_id and name != NODE_CLASS_NAME]
+
+        node_class = [name for name, _ in classes].index(NODE_CLASS_NAME)
+        camera_classes = indexes_of(CAMERA_SUPER_CLASS_ID)
+        geometry_classes = indexes_of(GEOMETRY_SUPER_CLASS_ID)
+        filler_classes = [idx for idx, (_, sc_id) in enumerate(classes)
+                          if sc_id in FILLER_SUPER_CLASS_IDS]
+
+        nodes = round(spec.objects * spec.node_ratio)
+        cameras = round(nodes * spec.camera_ratio)
+        kinds = (['node'] * nodes + ['camera'] * cameras +
+                 ['geometry'] * (nodes - cameras) +
+                 ['filler'] * (spec.objects - 2 * nodes))
+        rng.shuffle(kinds)
+        object_classes = []
+        for kind in kinds:
+            if kind == 'node':
+                object_classes.append(node_class)
+            elif kind == 'camera':
+                object_classes.append(rng.choice(camera_classes))
+            elif kind == 'geometry':
+                object_classes.append(rng.choice(geometry_classes))
+            else:
+                object_classes.append(rng.choice(filler_classes))
+
+        targets = [idx for idx, kind in enumerate(kinds)
+                   if kind in ('camera', 'geometry')]
+        rng.shuffle(targets)
+        fillers = [idx for idx, kind in enumerate(kinds) if kind == 'filler']
+        node_names = {}
+        camera_names = []
+        # The objects are appended to the stream as they are made, the
+        # header of the Scene takes the place reserved for it at the end.
+        scene = bytearray(sp.HEADER_STRUCT.size)
+        for idx, kind in enumerate(kinds):
+            childs = self.filler(spec.depth)
+            if kind == 'node':
+                target = targets.pop()
+                refs = [rng.choice(fillers) for _ in
+                        range(rng.randint(0, MAX_EXTRA_REFS) if fillers
+                              else 0)]
+                refs.insert(rng.randrange(len(refs) + 1), target)
+                if kinds[target] == 'camera':
+                    name = 'Camera{:06d}'.format(idx)
+                    camera_names.append(name)
+                else:
+                    name = 'Object{:06d}'.format(idx)
+                node_names[idx] = name
+                childs[:0] = [
+                    self.chunk(NODE_REFS_IDN,
+                               b''.join(REF_STRUCT.pack(x) for x in refs)),
+                    self.chunk(OBJECT_NAME_IDN, _utf_16(name)),
+                ]
+            scene += self.container(object_classes[idx], childs)
+        scene[:sp.HEADER_STRUCT.size] = self._header(
+            SCENE_IDN, len(scene) - sp.HEADER_STRUCT.size, True
+        )
+        manifest = Manifest(spec, [name for name, _ in classes],
+                            object_classes, node_names, camera_names)
+        return scene, manifest
+
+
+def _utf_16(text):
+    return text.encode('utf-16-le')
+
+
+def build_streams(spec=None):
+    """Return the streams by name and the Manifest of them.
+    """
+    if spec is None:
+        spec = Spec()
+    generator = _Generator(spec)
+    classes = generator.classes()
+    streams = OrderedDict()
+    streams[CLASS_DIRECTORY] = generator.class_directory(classes)
+    streams[DLL_DIRECTORY] = generator.dll_directory()
+    streams[SCENE], manifest = generator.scene(classes)
+    manifest.stream_sizes = {name: len(data)
+                             for name, data in streams.items()}
+    return streams, manifest
+
+
+def generate(fname, spec=None):
+    """Write a synthetic max file, return its Manifest.
+    """
+    streams, manifest = build_streams(spec)
+    write_ole(fname, streams.items())
+    return manifest
+
+
+def main(argv=None):
+    defaults = Spec()
+    parser = argparse.ArgumentParser(
+        prog='python -m max_dump.synthetic',
+        description='Generate a synthetic max file'
+    )
+    parser.add_argument('max_fname')
+    parser.add_argument('--objects', type=int, default=defaults.objects,
+                        help="Number of scene objects")
+    parser.add_argument('--node-ratio', type=float,
+                        default=defaults.node_ratio,
+                        help="Share of the objects that are Nodes, at most "
+                             "0.5")
+    parser.add_argument('--camera-ratio', type=float,
+                        default=defaults.camera_ratio,
+                        help="Share of the Nodes referring to a camera")
+    parser.add_argument('--depth', type=int, default=defaults.depth,
+                        help="Levels of containers in an object")
+    parser.add_argument('--values', type=int, nargs=2,
+                        default=defaults.values, metavar=('MIN', 'MAX'),
+                        help="Number of values in a container")
+    parser.add_argument('--payload-size', type=int, nargs=2,
+                        default=defaults.payload_size, metavar=('MIN', 'MAX'),
+                        help="Length of a value")
+    parser.add_argument('--extended-ratio', type=float,
+                        default=defaults.extended_ratio,
+                        help="Share of the chunks with a 64 bit length")
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+    args = parser.parse_args(argv)
+    try:
+        spec = Spec(args.objects, args.node_ratio, args.camera_ratio,
+                    args.depth, tuple(args.values), tuple(args.payload_size),
+                    args.extended_ratio, seed=args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+    manifest = generate(args.max_fname, spec)
+    print(json.dumps({
+        "stream_sizes": manifest.stream_sizes,
+        "objects": len(manifest.object_classes),
+        "nodes": len(manifest.node_names),
+        "cameras": len(manifest.cameras),
+    }, indent=4))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
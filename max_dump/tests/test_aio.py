@@ -0,0 +1,88 @@
+"""Unit tests for aio.
+"""
+import asyncio
+import threading
+import unittest
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
+
+from max_dump import aio
+from max_dump.dump_cameras import dump_cameras
+from max_dump.file_props_parser import extract_file_props
+from max_dump.storage_parser import storage_parse
+
+
+BASE_DIR = pathlib.Path(__file__).parent
+
+
+class AioTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.max_fname = str(
+            BASE_DIR / 'data/07-standard-17_physical_cameras.max'
+        )
+
+    async def test_counterparts(self):
+        with ThreadPoolExecutor(1) as executor:
+            cams = await aio.adump_cameras(self.max_fname, executor)
+        self.assertEqual(cams, dump_cameras(self.max_fname))
+        props = await aio.aextract_file_props(self.max_fname)
+        self.assertEqual(props, extract_file_props(self.max_fname))
+        parsed = await aio.astorage_parse(self.max_fname, 'DllDirectory',
+                                          ('parsed', ))
+        self.assertEqual(parsed, storage_parse(
+            self.max_fname, 'DllDirectory', representations=('parsed', )
+        ))
+
+    async def test_limit(self):
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def work(path):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            threading.Event().wait(0.01)
+            with lock:
+                running[0] -= 1
+            return path * 2
+
+        results = [item async for item in
+                   aio.aextract_many(range(10), work, limit=3)]
+        self.assertEqual(sorted(results), [(i, i * 2) for i in range(10)])
+        self.assertLessEqual(running[1], 3)
+
+    async def test_async_iterable_and_errors(self):
+        async def paths():
+            yield self.max_fname
+            yield str(BASE_DIR / 'data/missing.max')
+
+        results = dict([item async for item in aio.aextract_many(
+            paths(), return_exceptions=True
+        )])
+        self.assertEqual(results[self.max_fname],
+                         dump_cameras(self.max_fname))
+        self.assertIsInstance(results[str(BASE_DIR / 'data/missing.max')],
+                              OSError)
+        with self.assertRaises(OSError):
+            async for _ in aio.aextract_many(paths(), limit=1):
+                pass
+
+    async def test_cancellation(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def work(path):
+            started.set()
+            release.wait(5)
+            return path
+
+        async def consume():
+            async for _ in aio.aextract_many(range(100), work, limit=2):
+                pass
+
+        task = asyncio.ensure_future(consume())
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        task.cancel()
+        release.set()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
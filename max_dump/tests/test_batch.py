@@ -0,0 +1,102 @@
+"""Unit tests for batch.
+"""
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import pathlib
+from unittest import mock
+
+from max_dump import batch
+from max_dump.batch import collect_paths, largest_first, run_batch
+from max_dump.dump_cameras import dump_cameras
+
+
+BASE_DIR = pathlib.Path(__file__).parent
+DATA_DIR = str(BASE_DIR / 'data')
+
+
+_process_file = batch.process_file
+
+
+def _die_on_crash_files(max_fname, *args, **kwargs):
+    if os.path.basename(max_fname).startswith('crash'):
+        # Like a worker killed by the OOM killer
+        os._exit(1)
+    return _process_file(max_fname, *args, **kwargs)
+
+
+class BatchTests(unittest.TestCase):
+    def setUp(self):
+        self.cameras_fname = os.path.join(
+            DATA_DIR, '07-standard-17_physical_cameras.max'
+        )
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.broken_fname = os.path.join(self.tmp_dir, 'broken.max')
+        with open(self.broken_fname, 'wb') as fout:
+            fout.write(b'not an OLE file')
+
+    def test_collect_paths(self):
+        stdin = io.StringIO(self.cameras_fname + '\n\n')
+        paths = collect_paths([DATA_DIR, os.path.join(DATA_DIR, '0*.max'),
+                               '-'], stdin)
+        self.assertEqual(len(paths), 5)
+        self.assertTrue(all(path.endswith('.max') for path in paths))
+
+    def test_largest_first(self):
+        missing = os.path.join(self.tmp_dir, 'missing.max')
+        paths = largest_first([self.broken_fname, missing,
+                               self.cameras_fname])
+        self.assertEqual(paths, [self.cameras_fname, self.broken_fname,
+                                 missing])
+
+    def test_broken_file_is_an_error_record(self):
+        records = list(run_batch([self.broken_fname, self.cameras_fname],
+                                 'cameras'))
+        self.assertEqual(records[0], {
+            "path": self.cameras_fname, "ok": True,
+            "result": dump_cameras(self.cameras_fname),
+        })
+        self.assertFalse(records[1]["ok"])
+        self.assertEqual(records[1]["error"]["type"], 'OleException')
+
+    def test_process_pool(self):
+        paths = collect_paths([DATA_DIR])
+        records = list(run_batch(paths, 'props', jobs=2))
+        self.assertEqual(sorted(record["path"] for record in records),
+                         sorted(paths))
+
+    def test_parse_stream_with_cache(self):
+        cache_dir = os.path.join(self.tmp_dir, 'cache')
+        for _ in range(2):
+            record, = run_batch([self.cameras_fname], 'parse_stream',
+                                'DllDirectory', cache_dir=cache_dir)
+            self.assertTrue(record["ok"])
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+        # The cache is not left in the module.
+        self.assertIsNone(batch._cache)
+
+    def test_dead_worker_is_an_error_record(self):
+        good = collect_paths([DATA_DIR])
+        crash = []
+        for idx in range(2):
+            crash.append(os.path.join(self.tmp_dir,
+                                      'crash{}.max'.format(idx)))
+            shutil.copy(self.cameras_fname, crash[-1])
+        expected = {record["path"]: record
+                    for record in run_batch(good, 'props')}
+        for jobs in (2, 3):
+            with mock.patch.object(batch, 'process_file',
+                                   _die_on_crash_files):
+                records = list(run_batch(good + crash, 'props', jobs=jobs))
+            self.assertEqual(sorted(record["path"] for record in records),
+                             sorted(good + crash))
+            for record in records:
+                if record["path"] in crash:
+                    self.assertFalse(record["ok"])
+                    self.assertEqual(record["error"]["type"],
+                                     'BrokenProcessPool')
+                else:
+                    self.assertEqual(record, expected[record["path"]])
@@ -0,0 +1,69 @@
+"""Unit tests for the benchmarks.
+"""
+import unittest
+import pathlib
+
+from benchmarks import suite
+
+
+BASE_DIR = pathlib.Path(__file__).parent
+
+
+def _report(p50, peak_bytes):
+    return {"version": suite.FORMAT_VERSION, "results": [{
+        "case": "case", "file": "file", "wall": {"p50": p50},
+        "peak_bytes": peak_bytes,
+    }]}
+
+
+class SuiteTests(unittest.TestCase):
+    def test_percentile(self):
+        values = [1.0, 2.0, 3.0, 4.0, 5.0]
+        self.assertEqual(suite.percentile(values, 50), 3.0)
+        self.assertEqual(suite.percentile(values, 90), 4.6)
+        self.assertEqual(suite.percentile([7.0], 99), 7.0)
+
+    def test_measure(self):
+        fname = str(BASE_DIR / 'data/01-teapot_no_cams_vray.max')
+        cases = suite.file_cases(fname)
+        names = [case.name for case in cases]
+        self.assertIn('storage_parse:Scene', names)
+        self.assertIn('dump_cameras', names)
+        self.assertIn('extract_file_props', names)
+
+        scene = cases[names.index('storage_parse:Scene')]
+        result = suite.measure(scene, repeat=2)
+        self.assertEqual(result["repeat"], 2)
+        self.assertLessEqual(result["wall"]["min"], result["wall"]["p50"])
+        self.assertGreater(result["chunks_per_s"], 0)
+        self.assertGreater(result["peak_bytes"], 0)
+
+    def test_skipped_and_failed(self):
+        def skip(_):
+            raise suite.Skipped("no decoder")
+
+        def fail(_):
+            raise ValueError("broken")
+
+        for run, status in ((skip, "skipped"), (fail, "error")):
+            case = suite.Case('case', 'file', suite._no_setup, run, 1, 1)
+            result = suite.measure(case)
+            self.assertIn(status, result)
+            self.assertNotIn("wall", result)
+
+    def test_compare(self):
+        baseline = _report(0.1, 1000)
+        slower, = [change for change in
+                   suite.compare(baseline, _report(0.2, 1000))
+                   if change["metric"] == "p50"]
+        self.assertTrue(slower["regression"])
+        self.assertAlmostEqual(slower["ratio"], 2)
+        changes = suite.compare(baseline, _report(0.105, 1000))
+        self.assertFalse(any(change["regression"] for change in changes))
+        # Slower by less than MIN_SLOWDOWN
+        changes = suite.compare(_report(0.0001, 1000), _report(0.0005, 1000))
+        self.assertFalse(any(change["regression"] for change in changes))
+        bigger, = [change for change in
+                   suite.compare(baseline, _report(0.1, 2000))
+                   if change["regression"]]
+        self.assertEqual(bigger["metric"], "peak_bytes")
@@ -0,0 +1,116 @@
+"""Unit tests for cache.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import pathlib
+import pickle
+from unittest import mock
+
+from max_dump import storage_parser as sp
+from max_dump.cache import ParseCache, file_identity
+from max_dump.dump_cameras import dump_cameras
+
+
+BASE_DIR = pathlib.Path(__file__).parent
+
+
+class ParseCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        # A copy, so the tests may touch it.
+        self.max_fname = os.path.join(self.tmp_dir, 'cameras.max')
+        shutil.copy(
+            str(BASE_DIR / 'data/07-standard-17_physical_cameras.max'),
+            self.max_fname
+        )
+        self.cache_dir = os.path.join(self.tmp_dir, 'cache')
+
+    def test_memory_tier(self):
+        cache = ParseCache()
+        cams = cache.dump_cameras(self.max_fname)
+        self.assertEqual(cams, dump_cameras(self.max_fname))
+        self.assertIs(cache.dump_cameras(self.max_fname), cams)
+        self.assertEqual(cache.stats.hits, 1)
+        self.assertEqual(cache.stats.misses, 1)
+
+    def test_disk_tier_survives_the_process(self):
+        ParseCache(self.cache_dir).storage_parse(self.max_fname,
+                                                 'DllDirectory')
+        cache = ParseCache(self.cache_dir)
+        parsed = cache.storage_parse(self.max_fname, 'DllDirectory')
+        self.assertEqual(parsed,
+                         sp.storage_parse(self.max_fname, 'DllDirectory'))
+        self.assertEqual(cache.stats.disk_hits, 1)
+        self.assertEqual(cache.stats.misses, 0)
+
+    def test_changed_file_is_a_miss(self):
+        cache = ParseCache()
+        cache.extract_file_props(self.max_fname)
+        st = os.stat(self.max_fname)
+        os.utime(self.max_fname, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        cache.extract_file_props(self.max_fname)
+        self.assertEqual(cache.stats.misses, 2)
+
+    def test_content_hash(self):
+        identity = file_identity(self.max_fname, content_hash=True)
+        self.assertEqual(identity[:4], file_identity(self.max_fname))
+        self.assertEqual(len(identity), 5)
+
+    def test_rewrite_keeping_the_stat_is_a_miss(self):
+        cache = ParseCache(content_hash=True)
+        cache.storage_parse(self.max_fname, 'Config')
+        st = os.stat(self.max_fname)
+        # The last byte of the file is in no stream.
+        with open(self.max_fname, 'r+b') as fout:
+            fout.seek(-1, os.SEEK_END)
+            last = fout.read(1)
+            fout.seek(-1, os.SEEK_END)
+            fout.write(bytes([last[0] ^ 0xFF]))
+        os.utime(self.max_fname, ns=(st.st_atime_ns, st.st_mtime_ns))
+        self.assertEqual(file_identity(self.max_fname)[1:],
+                         (st.st_size, st.st_mtime_ns, st.st_ino))
+        cache.storage_parse(self.max_fname, 'Config')
+        self.assertEqual(cache.stats.misses, 2)
+        self.assertEqual(cache.stats.hits, 0)
+
+    def test_lru_eviction(self):
+        cache = ParseCache(max_entries=1)
+        cache.storage_parse(self.max_fname, 'DllDirectory')
+        cache.storage_parse(self.max_fname, 'ClassDirectory3')
+        cache.storage_parse(self.max_fname, 'DllDirectory')
+        self.assertEqual(cache.stats.misses, 3)
+        self.assertEqual(cache.stats.evictions, 2)
+
+    def test_disk_size_cap(self):
+        cache = ParseCache(self.cache_dir, max_disk_bytes=1)
+        cache.storage_parse(self.max_fname, 'DllDirectory')
+        self.assertEqual(os.listdir(self.cache_dir), [])
+        self.assertEqual(cache.stats.disk_evictions, 1)
+
+    def test_disk_is_scanned_once(self):
+        cache = ParseCache(self.cache_dir)
+        with mock.patch.object(cache, '_scan_disk',
+                               wraps=cache._scan_disk) as spy:
+            for stream_name in ('DllDirectory', 'ClassDirectory3', 'Config'):
+                cache.storage_parse(self.max_fname, stream_name)
+        self.assertEqual(spy.call_count, 1)
+        self.assertEqual(cache._disk_bytes, sum(
+            os.path.getsize(os.path.join(self.cache_dir, name))
+            for name in os.listdir(self.cache_dir)
+        ))
+
+    def test_corrupt_file_is_dropped(self):
+        cache = ParseCache(self.cache_dir)
+        cache.extract_file_props(self.max_fname)
+        path, = cache._disk_files()
+        # Unpickling fails looking up the class.
+        with open(path, 'wb') as fout:
+            fout.write(pickle.dumps(ParseCache).replace(b'ParseCache',
+                                                        b'NoSuchCache'))
+        cache = ParseCache(self.cache_dir)
+        cache.extract_file_props(self.max_fname)
+        self.assertEqual(cache.stats.misses, 1)
+        self.assertEqual(cache.stats.disk_hits, 0)
@@ -0,0 +1,101 @@
+"""Unit tests for compression.
+"""
+import gzip
+import unittest
+import pathlib
+import zlib
+
+from max_dump import compression
+from max_dump import storage_parser as sp
+
+
+BASE_DIR = pathlib.Path(__file__).parent
+
+
+def _events(events):
+    return [(e.kind, e.idn, e.depth, e.offset, e.length, e.index,
+             None if e.value is None else bytes(e.value)) for e in events]
+
+
+class CompressionTests(unittest.TestCase):
+    def setUp(self):
+        self.raw = bytes(sp.read_stream(
+            str(BASE_DIR / 'data/2017_many_cams_and_other_stuff.max'),
+            'Scene'
+        ))
+
+    def test_detect(self):
+        self.assertIsNone(compression.detect(self.raw))
+        self.assertIsNone(compression.detect(b'x'))
+        self.assertEqual(compression.detect(zlib.compress(self.raw)),
+                         compression.ZLIB_WBITS)
+        self.assertEqual(compression.detect(gzip.compress(self.raw)),
+                         compression.GZIP_WBITS)
+
+    def test_inflate_in_bounded_pieces(self):
+        pieces = list(compression.iter_inflate(zlib.compress(self.raw),
+                                               piece_size=1000))
+        self.assertTrue(all(len(piece) <= 1000 for piece in pieces))
+        self.assertEqual(b''.join(pieces), self.raw)
+        self.assertEqual(sp.maybe_inflate(gzip.compress(self.raw)),
+                         self.raw)
+        self.assertIs(sp.maybe_inflate(self.raw), self.raw)
+
+    def test_raw_stream_with_a_zlib_header(self):
+        # The idn 0x2078 starts the stream with a valid zlib header.
+        raw = bytes.fromhex('78 20 0A 00 00 00 01 00 00 00')
+        self.assertIsNone(compression.detect(raw))
+        self.assertIs(sp.maybe_inflate(raw), raw)
+        self.assertEqual(_events(sp.stream_events(raw)),
+                         _events(sp.iter_chunks(raw)))
+        chunk, = sp.parse_buffer(raw)
+        self.assertEqual(chunk.idn, 0x2078)
+
+        # The value 0x178 starts the stream with a zlib header and a
+        # start that inflates.
+        raw = bytes.fromhex('78 01 0C 00 00 00 00 00 00 00 00 00')
+        self.assertEqual(compression.detect(raw), compression.ZLIB_WBITS)
+        self.assertIsNone(sp.stream_wbits(raw))
+        self.assertIs(sp.maybe_inflate(raw), raw)
+        self.assertEqual(_events(sp.stream_events(raw)),
+                         _events(sp.iter_chunks(raw)))
+
+        # The header and the start inflate, the rest does not.
+        compressed = zlib.compress(self.raw)
+        broken = compressed[:len(compressed) // 2] + bytes(100)
+        self.assertEqual(sp.stream_wbits(broken), compression.ZLIB_WBITS)
+        with self.assertRaises(compression.CompressionError):
+            sp.maybe_inflate(broken)
+        with self.assertRaises(compression.CompressionError):
+            list(sp.stream_events(broken))
+
+    def test_truncated(self):
+        with self.assertRaises(compression.CompressionError):
+            list(compression.iter_inflate(zlib.compress(self.raw)[:-100]))
+
+
+class IncrementalParserTests(unittest.TestCase):
+    def setUp(self):
+        self.raw = bytes(sp.read_stream(
+            str(BASE_DIR / 'data/2017_many_cams_and_other_stuff.max'),
+            'Scene'
+        ))
+
+    def test_same_events(self):
+        expected = _events(sp.iter_chunks(self.raw))
+        pieces = [self.raw[i:i + 5] for i in range(0, len(self.raw), 5)]
+        self.assertEqual(_events(sp.iter_chunks_incremental(pieces)),
+                         expected)
+        self.assertEqual(_events(sp.stream_events(gzip.compress(self.raw))),
+                         expected)
+
+    def test_select(self):
+        select = {0x2022, 0x962}
+        self.assertEqual(
+            _events(sp.stream_events(zlib.compress(self.raw), select=select)),
+            _events(sp.iter_chunks(self.raw, select=select))
+        )
+
+    def test_truncated_header(self):
+        with self.assertRaises(sp.StorageException):
+            list(sp.iter_chunks_incremental([b'\x50\x00\x0a']))
@@ -6,7 +6,9 @@ import unittest
 import pathlib
 
 import max_dump
-from max_dump.file_props_parser import extract_file_props
+from max_dump.file_props_parser import (PROPS_STREAM, extract_file_props,
+                                        parse_props)
+from max_dump.max_file import MaxFile
 
 
 BASE_DIR = pathlib.Path(__file__).parent
@@ -20,3 +22,18 @@ class SimpleTest(unittest.TestCase):
         with open(res_json) as fin:
             p2 = json.load(fin)
         self.assertEqual(p1, p2)
+
+    def test_parse_props(self):
+        max_fname = str(BASE_DIR / 'data/01-teapot_no_cams_vray.max')
+        res_json = str(BASE_DIR / 'data/01-teapot_no_cams_vray_props.json')
+        with MaxFile(max_fname) as max_file:
+            props = parse_props(max_file.read_stream(PROPS_STREAM))
+        with open(res_json) as fin:
+            self.assertEqual(props, json.load(fin))
+
+        buf = (b'\xff' * 8 + b'\x1e\x00\x00\x00\x04\x00\x00\x00ab\x00\x00'
+               b'\x03\x00\x00\x00\x01\x00\x00\x00'
+               b'\x1e\x10\x00\x00\x01\x00\x00\x00'
+               b'\x04\x00\x00\x00xyz\x00')
+        self.assertEqual(parse_props(memoryview(buf)),
+                         {"ab": {"count": 1, "items": ["xyz"]}})
@@ -0,0 +1,79 @@
+"""Unit tests for extractors.
+"""
+import unittest
+from unittest import mock
+import pathlib
+
+from max_dump import extractors as ex
+from max_dump import storage_parser as sp
+from max_dump.dump_cameras import dump_cameras
+from max_dump.file_props_parser import extract_file_props
+from max_dump.max_file import MaxFile
+
+
+BASE_DIR = pathlib.Path(__file__).parent
+
+
+class NameChunks(ex.Extractor):
+    name = 'name_chunks'
+    idns = frozenset({0x962})
+
+    def start(self, context):
+        self.count = 0
+
+    def visit_chunk(self, event):
+        self.count += 1
+
+    def finish(self, context):
+        return self.count
+
+
+class ExtractTests(unittest.TestCase):
+    def setUp(self):
+        self.max_fname = str(BASE_DIR / 'data/01-teapot_no_cams_vray.max')
+
+    def test_registered_extractors(self):
+        results = ex.extract(self.max_fname)
+        self.assertEqual(list(results), list(ex.EXTRACTORS))
+        self.assertEqual(results['cameras'], dump_cameras(self.max_fname))
+        self.assertEqual(results['props'],
+                         extract_file_props(self.max_fname))
+        self.assertEqual(results['lights'], ['VRayLight001'])
+        self.assertEqual(results['geometry_counts'],
+                         {'Teapot': 1, 'Plane': 1})
+        self.assertEqual(results['node_names'],
+                         ['Teapot001', 'Plane001', 'VRayLight001'])
+
+    def test_one_parse_of_each_stream(self):
+        with MaxFile(self.max_fname) as max_file, \
+                mock.patch.object(sp, 'iter_chunks',
+                                  wraps=sp.iter_chunks) as iter_chunks:
+            ex.extract(max_file, ['cameras', 'lights', NameChunks()])
+        streams = [call[0][1] for call in iter_chunks.call_args_list]
+        self.assertEqual(sorted(streams), ['ClassDirectory3', 'Scene'])
+
+    def test_chunk_callbacks(self):
+        results = ex.extract(self.max_fname, [NameChunks(), 'node_names'])
+        self.assertEqual(results['name_chunks'], 3)
+        self.assertEqual(len(results['node_names']), 3)
+
+    def test_props_do_not_walk_the_scene(self):
+        with MaxFile(self.max_fname) as max_file, \
+                mock.patch.object(sp, 'iter_chunks',
+                                  wraps=sp.iter_chunks) as iter_chunks, \
+                mock.patch.object(MaxFile, 'iter_stream',
+                                  autospec=True) as iter_stream:
+            results = ex.extract(max_file, ['props'])
+        self.assertEqual(results['props'],
+                         extract_file_props(self.max_fname))
+        iter_stream.assert_not_called()
+        streams = [call[0][1] for call in iter_chunks.call_args_list]
+        self.assertNotIn('Scene', streams)
+        self.assertNotIn('ClassDirectory3', streams)
+
+    def test_finish_is_abstract(self):
+        class NoFinish(ex.Extractor):
+            name = 'no_finish'
+
+        with self.assertRaises(TypeError):
+            NoFinish()
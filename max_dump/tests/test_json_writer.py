@@ -0,0 +1,93 @@
+"""Unit tests for json_writer.
+"""
+import io
+import json
+import unittest
+import pathlib
+
+from max_dump import cli
+from max_dump import storage_parser as sp
+from max_dump.json_writer import COMPACT, NDJSON, JsonWriter
+from max_dump.max_file import MaxFile
+
+
+BASE_DIR = pathlib.Path(__file__).parent
+
+
+class WriteChunksTests(unittest.TestCase):
+    def setUp(self):
+        self.ba = bytes.fromhex(
+            '60 00 1C 00 00 80 '
+            '   10 00 0A 00 00 00 07 00 00 00 '
+            '   70 00 0C 00 00 80 '
+            '       20 00 06 00 00 00 '
+            '60 00 06 00 00 80'
+        )
+        self.chunks = [chunk.asdict() for chunk in sp.parse_chunks(self.ba)]
+
+    def write(self, fmt, **kwargs):
+        out = io.StringIO()
+        writer = JsonWriter(out, fmt, **kwargs)
+        writer.write_chunks(sp.iter_chunks(self.ba))
+        return out.getvalue()
+
+    def test_pretty(self):
+        self.assertEqual(self.write('pretty'),
+                         json.dumps(self.chunks, indent=4) + '\n')
+
+    def test_compact(self):
+        self.assertEqual(
+            self.write(COMPACT),
+            json.dumps(self.chunks, separators=(',', ':')) + '\n'
+        )
+
+    def test_ndjson(self):
+        lines = [json.loads(line)
+                 for line in self.write(NDJSON).splitlines()]
+        self.assertEqual([line["path"] for line in lines],
+                         [[], ['0x60'], ['0x60'], ['0x60', '0x70'], []])
+        self.assertEqual(lines[1]["parsed"], None)
+        self.assertNotIn("childs", lines[0])
+
+    def test_flushes_while_writing(self):
+        out = io.StringIO()
+        writes = []
+        out.write = lambda text: writes.append(text)
+        JsonWriter(out, flush_size=1).write_chunks(sp.iter_chunks(self.ba))
+        self.assertGreater(len(writes), 5)
+        self.assertEqual(''.join(writes),
+                         json.dumps(self.chunks, indent=4) + '\n')
+
+    def test_empty(self):
+        out = io.StringIO()
+        JsonWriter(out).write_chunks(sp.iter_chunks(b''))
+        JsonWriter(out).write_items([])
+        self.assertEqual(out.getvalue(), '[]\n[]\n')
+
+
+class ParseStreamTests(unittest.TestCase):
+    def test_same_as_stream_result(self):
+        max_fname = str(BASE_DIR / 'data/01-teapot_no_cams_vray.max')
+        for stream_name in ('Scene', 'DllDirectory', 'VideoPostQueue'):
+            out = io.StringIO()
+            with MaxFile(max_fname) as max_file:
+                cli.parse_stream(max_file, stream_name,
+                                 writer=JsonWriter(out))
+                expected = cli.stream_result(max_file, stream_name)
+            self.assertEqual(out.getvalue(), cli.dumps(expected) + '\n')
+
+    def test_idns_that_are_not_class_indexes(self):
+        # Some objects of the Scene have idns like 0x2032.
+        max_fname = str(
+            BASE_DIR / 'data/08-extended_header_length_alysson_claret.max'
+        )
+        out = io.StringIO()
+        with MaxFile(max_fname) as max_file:
+            cli.parse_stream(max_file, 'Scene', writer=JsonWriter(out))
+            expected = cli.stream_result(max_file, 'Scene')
+        self.assertEqual(out.getvalue(), cli.dumps(expected) + '\n')
+        objects = expected[0]["childs"]
+        unnamed = [obj["header"]["idn"] for obj in objects
+                   if "class_name" not in obj["header"]]
+        self.assertIn('0x2032', unnamed)
+        self.assertLess(len(unnamed), len(objects))
@@ -0,0 +1,45 @@
+"""Unit tests for lazy_tree.
+"""
+import unittest
+import pathlib
+
+import max_dump.storage_parser as sp
+import max_dump.lazy_tree as lt
+
+
+BASE_DIR = pathlib.Path(__file__).parent
+
+
+class LazyChunkTreeTests(unittest.TestCase):
+    def setUp(self):
+        self.max_fname = str(BASE_DIR / 'data/01-teapot_no_cams_vray.max')
+        self.ba = bytes.fromhex(
+            '50 00 0A 00 00 00 01 00 00 00 '
+            '60 00 1C 00 00 80 '
+            '   10 00 0A 00 00 00 07 00 00 00 '
+            '   70 00 0C 00 00 80 '
+            '       20 00 06 00 00 00'
+        )
+
+    def test_children_are_scanned_on_access(self):
+        tree = lt.LazyChunkTree(self.ba)
+        self.assertEqual([c.idn for c in tree], [0x50, 0x60])
+        self.assertEqual(len(tree._cache), 0)
+        childs = tree[1].childs
+        self.assertEqual([c.idn for c in childs], [0x10, 0x70])
+        self.assertEqual(childs[0].value_bytes, b'\x07\x00\x00\x00')
+        self.assertEqual(len(tree._cache), 1)
+
+    def test_cache_is_bounded(self):
+        tree = lt.LazyChunkTree(self.ba, cache_size=1)
+        inner = tree[1].childs[1]
+        self.assertEqual(inner.childs[0].idn, 0x20)
+        self.assertEqual(inner.childs[0].depth, 2)
+        self.assertEqual(list(tree._cache), [inner.data_offset])
+        # Evicted entries are scanned again.
+        self.assertEqual(len(tree[1].childs), 2)
+
+    def test_same_as_storage_parse(self):
+        tree = lt.lazy_parse(self.max_fname, 'ClassDirectory3', cache_size=2)
+        self.assertEqual(tree.asdict(),
+                         sp.storage_parse(self.max_fname, 'ClassDirectory3'))
@@ -0,0 +1,56 @@
+"""Unit tests for max_file.
+"""
+import unittest
+import pathlib
+
+from max_dump import storage_parser as sp
+from max_dump.dump_cameras import dump_cameras
+from max_dump.file_props_parser import extract_file_props
+from max_dump.max_file import MaxFile, session
+
+
+BASE_DIR = pathlib.Path(__file__).parent
+
+
+class MaxFileTests(unittest.TestCase):
+    def setUp(self):
+        self.max_fname = str(
+            BASE_DIR / 'data/07-standard-17_physical_cameras.max'
+        )
+
+    def test_streams_are_memoized(self):
+        with MaxFile(self.max_fname) as max_file:
+            self.assertIs(max_file.read_stream('Scene'),
+                          max_file.read_stream('Scene'))
+            self.assertIs(max_file.scene, max_file.parse_stream('Scene'))
+            self.assertIs(max_file.class_directory,
+                          max_file.class_directory)
+
+    def test_storage_parse_matches_module_function(self):
+        with MaxFile(self.max_fname) as max_file:
+            self.assertEqual(max_file.storage_parse('DllDirectory'),
+                             sp.storage_parse(self.max_fname,
+                                              'DllDirectory'))
+
+    def test_session_keeps_given_file_open(self):
+        with MaxFile(self.max_fname) as max_file:
+            with session(max_file) as opened:
+                self.assertIs(opened, max_file)
+            self.assertIsNotNone(max_file.ole._mmap)
+
+    def test_extractions_share_the_file(self):
+        with MaxFile(self.max_fname) as max_file:
+            self.assertEqual(dump_cameras(max_file),
+                             dump_cameras(self.max_fname))
+            self.assertEqual(extract_file_props(max_file),
+                             extract_file_props(self.max_fname))
+            self.assertIn('ClassDirectory3', max_file._chunks)
+
+    def test_selected_stream_is_not_memoized(self):
+        with MaxFile(self.max_fname) as max_file:
+            scene = max_file.parse_stream(
+                'Scene', select=lambda path, idn, depth: depth == 0
+            )
+            self.assertEqual(len(scene), 1)
+            self.assertEqual(scene[0].childs, [])
+            self.assertNotIn('Scene', max_file._chunks)
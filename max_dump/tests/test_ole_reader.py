@@ -0,0 +1,62 @@
+"""Unit tests for ole_reader.
+"""
+import mmap
+import tempfile
+import unittest
+import pathlib
+
+import olefile
+
+from max_dump.ole_reader import OleReader, OleException
+
+
+BASE_DIR = pathlib.Path(__file__).parent
+
+
+class OleReaderTests(unittest.TestCase):
+    def setUp(self):
+        self.max_fname = str(BASE_DIR / 'data/01-teapot_no_cams_vray.max')
+
+    def test_same_as_olefile(self):
+        for max_fname in sorted((BASE_DIR / 'data').glob('*.max')):
+            ole = olefile.OleFileIO(str(max_fname))
+            stream_names = ['/'.join(x) for x in ole.listdir()]
+            with OleReader(str(max_fname)) as reader:
+                self.assertEqual(reader.listdir(), sorted(stream_names))
+                for stream_name in stream_names:
+                    expected = ole.openstream(stream_name).read()
+                    view = reader.open_stream(stream_name)
+                    self.assertEqual(bytes(view), expected,
+                                     (max_fname.name, stream_name))
+            ole.close()
+
+    def test_contiguous_stream_is_a_view_of_the_map(self):
+        with OleReader(self.max_fname) as reader:
+            scene = reader.open_stream('Scene')
+        self.assertIsInstance(scene.obj, mmap.mmap)
+        # The map outlives the reader while the view is in use.
+        self.assertEqual(len(scene), 260273)
+
+    def test_stream_is_found_without_decoding_the_directory(self):
+        with OleReader(self.max_fname) as reader:
+            props = reader.open_stream('\x05DocumentSummaryInformation')
+            self.assertIsNone(reader._entries)
+            self.assertIsNone(reader._paths)
+            self.assertIsNone(reader._mini_stream)
+            self.assertEqual(bytes(props), bytes(
+                reader.mini_stream[reader.get_entry(
+                    '\x05DocumentSummaryInformation'
+                ).start_sector * reader.mini_sector_size:][:len(props)]
+            ))
+
+    def test_unknown_stream(self):
+        with OleReader(self.max_fname) as reader:
+            with self.assertRaises(OleException):
+                reader.open_stream('NoSuchStream')
+
+    def test_not_an_ole_file(self):
+        with tempfile.NamedTemporaryFile() as fout:
+            fout.write(b'\0' * 1024)
+            fout.flush()
+            with self.assertRaises(OleException):
+                OleReader(fout.name)
@@ -0,0 +1,58 @@
+"""Unit tests for ole_writer.
+"""
+import os
+import tempfile
+import unittest
+
+import olefile
+
+from max_dump.ole_reader import OleReader
+from max_dump.ole_writer import (MINI_STREAM_CUTOFF, OleWriterException,
+                                 write_ole)
+
+
+class WriteOleTests(unittest.TestCase):
+    def setUp(self):
+        fd, self.fname = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, self.fname)
+
+    def assertStreams(self, streams):
+        write_ole(self.fname, streams)
+        with OleReader(self.fname) as ole:
+            self.assertEqual(ole.listdir(),
+                             sorted(name for name, _ in streams))
+            for name, data in streams:
+                self.assertEqual(bytes(ole.open_stream(name)), data)
+        ole = olefile.OleFileIO(self.fname)
+        try:
+            for name, data in streams:
+                self.assertEqual(ole.openstream(name).read(), data)
+        finally:
+            ole.close()
+
+    def test_streams(self):
+        self.assertStreams([
+            ('Scene', bytes(range(256)) * 40),
+            ('DllDirectory', b'\x01' * 100),
+            ('Empty', b''),
+            ('Cutoff', b'\x02' * MINI_STREAM_CUTOFF),
+            ('Mini', b'\x03' * (MINI_STREAM_CUTOFF - 1)),
+        ])
+
+    def test_many_streams(self):
+        self.assertStreams([('Stream{}'.format(i), bytes([i]) * i * 7)
+                            for i in range(40)])
+
+    def test_no_streams(self):
+        self.assertStreams([])
+
+    def test_difat(self):
+        # More FAT sectors than the header holds
+        self.assertStreams([('Big', b'\x04' * 8 * 1024 * 1024)])
+
+    def test_invalid_names(self):
+        for streams in ([('', b'')], [('a/b', b'')], [('x' * 32, b'')],
+                        [('Scene', b''), ('SCENE', b'')]):
+            with self.assertRaises(OleWriterException):
+                write_ole(self.fname, streams)
@@ -0,0 +1,158 @@
+"""Unit tests for parallel.
+"""
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from max_dump import parallel
+from max_dump import storage_parser as sp
+from max_dump.cli import class_names, parse_stream
+from max_dump.json_writer import FORMATS, NDJSON, JsonWriter
+from max_dump.max_file import MaxFile
+from max_dump.ole_writer import write_ole
+
+
+BASE_DIR = pathlib.Path(__file__).parent
+DATA_DIR = str(BASE_DIR / 'data')
+
+
+def _serial(max_fname, stream_name, fmt):
+    out = io.StringIO()
+    with MaxFile(max_fname) as max_file:
+        parse_stream(max_file, stream_name, writer=JsonWriter(out, fmt))
+    return out.getvalue()
+
+
+def _read(out_dir, stream_name, fmt):
+    extension = '.ndjson' if fmt == NDJSON else '.json'
+    with open(os.path.join(out_dir, stream_name + extension),
+              encoding='utf-8') as fin:
+        return fin.read()
+
+
+class ParallelTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        # The value 0x30 runs past its parent 0x20 over the value 0x40.
+        self.overrun = bytes.fromhex(
+            '10 00 2E 00 00 80 '
+            '   20 00 10 00 00 80 '
+            '       30 00 16 00 00 00 AA AA AA AA '
+            '   40 00 0C 00 00 00 01 02 03 04 05 06 '
+            '   50 00 0C 00 00 00 07 08 09 0A 0B 0C'
+        )
+        # Split everything there is.
+        patcher = mock.patch.multiple(parallel, MIN_SPLIT_SIZE=0,
+                                      MIN_PART_SIZE=1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_split_stream(self):
+        parts = parallel.split_stream(self.overrun, 4)
+        self.assertEqual(
+            parts,
+            [parallel.Part(6, 22, 1, ('0x10', ), True),
+             parallel.Part(22, 34, 1, ('0x10', ), True),
+             parallel.Part(34, 46, 1, ('0x10', ), True)]
+        )
+        top_level = self.overrun[6:]
+        parts = parallel.split_stream(top_level, 2)
+        self.assertEqual([(part.start, part.end, part.first_top_level)
+                          for part in parts],
+                         [(0, 28, True), (28, 40, False)])
+        # A single value, a truncated stream
+        self.assertIsNone(parallel.split_stream(self.overrun[34:], 2))
+        self.assertIsNone(parallel.split_stream(self.overrun[:-1], 2))
+
+    def test_overrun(self):
+        fname = os.path.join(self.tmp_dir, 'overrun.max')
+        write_ole(fname, [('Config', self.overrun)])
+        part = parallel.split_stream(self.overrun, 4)[0]
+        with self.assertRaises(parallel.PartOverrun):
+            parallel.render_part(fname, 'Config', part)
+
+        # The stream is rendered again whole.
+        errors = parallel.dump_streams(fname, self.tmp_dir, ['Config'],
+                                       jobs=2)
+        self.assertEqual(errors, {})
+        self.assertEqual(_read(self.tmp_dir, 'Config', 'pretty'),
+                         _serial(fname, 'Config', 'pretty'))
+
+    def test_dump_streams(self):
+        fname = os.path.join(DATA_DIR, '07-standard-17_physical_cameras.max')
+        with MaxFile(fname) as max_file:
+            plan = parallel.plan_stream(max_file, 'Scene', 2)
+        self.assertGreater(len(plan.parts), 1)
+        self.assertEqual(plan.root.idn, 0x2021)
+        with MaxFile(fname) as max_file:
+            self.assertEqual(plan.class_names,
+                             class_names(max_file, 'Scene'))
+
+        for fmt in FORMATS:
+            for jobs in (1, 2):
+                out_dir = os.path.join(self.tmp_dir, '{}-{}'.format(fmt,
+                                                                    jobs))
+                os.mkdir(out_dir)
+                errors = parallel.dump_streams(fname, out_dir, fmt=fmt,
+                                               jobs=jobs)
+                self.assertEqual(errors, {})
+                for stream_name in ('Scene', 'ClassDirectory3', 'Config'):
+                    self.assertEqual(_read(out_dir, stream_name, fmt),
+                                     _serial(fname, stream_name, fmt))
+
+    def test_errors(self):
+        fname = os.path.join(self.tmp_dir, 'broken.max')
+        write_ole(fname, [('Config', self.overrun + b'\x01'),
+                          ('VideoPostQueue', self.overrun)])
+        for jobs in (1, 2):
+            out_dir = os.path.join(self.tmp_dir, str(jobs))
+            os.mkdir(out_dir)
+            errors = parallel.dump_streams(fname, out_dir, jobs=jobs)
+            self.assertEqual(list(errors), ['Config'])
+            self.assertEqual(os.listdir(out_dir), ['VideoPostQueue.json'])
+
+    def test_ordered(self):
+        started = []
+        done = [threading.Event() for _ in range(10)]
+
+        def work(idx):
+            started.append(idx)
+            done[idx].wait()
+            return idx
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            results = parallel._ordered(executor, work,
+                                        [(idx, ) for idx in range(10)], 3)
+            for idx in range(10):
+                done[idx].set()
+                self.assertEqual(next(results), idx)
+                # At most 3 calls are pending after the result yielded.
+                self.assertLessEqual(len(started), idx + 4)
+            self.assertEqual(list(results), [])
+
+    @unittest.skipIf(sp.np is None, "numpy is not installed")
+    def test_chunk_tables(self):
+        fname = os.path.join(DATA_DIR, '07-standard-17_physical_cameras.max')
+        for jobs in (1, 2):
+            tables = parallel.chunk_tables(fname, ['Scene', 'Config'], jobs)
+            self.assertEqual(list(tables), ['Scene', 'Config'])
+            for stream_name, table in tables.items():
+                expected, _ = sp.storage_chunk_table(fname, stream_name)
+                self.assertTrue(sp.np.array_equal(table, expected))
+
+        fname = os.path.join(self.tmp_dir, 'overrun.max')
+        write_ole(fname, [('Config', self.overrun)])
+        part = parallel.split_stream(self.overrun, 4)[0]
+        with self.assertRaises(parallel.PartOverrun):
+            parallel.part_table(fname, 'Config', part)
+        # The stream is parsed again whole.
+        tables = parallel.chunk_tables(fname, ['Config'], 2)
+        expected, _ = sp.storage_chunk_table(fname, 'Config')
+        self.assertTrue(sp.np.array_equal(tables['Config'], expected))
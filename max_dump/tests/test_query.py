@@ -0,0 +1,65 @@
+"""Unit tests for query.
+"""
+import unittest
+import pathlib
+
+from max_dump import storage_parser as sp
+from max_dump.dump_cameras import dump_cameras
+from max_dump.query import Query, QueryError, Step, compile_query, query
+
+
+BASE_DIR = pathlib.Path(__file__).parent
+
+
+class CompileTests(unittest.TestCase):
+    def test_compile(self):
+        q = compile_query('Scene/*/*[class=Node, super_class=0x1]/2402')
+        self.assertEqual(q, Query('Scene', (
+            Step(), Step(class_name='Node', super_class_id=1), Step(0x962),
+        )))
+        self.assertTrue(q.needs_classes())
+        self.assertFalse(compile_query('DllDirectory/0x2038').needs_classes())
+
+    def test_invalid(self):
+        for text in ('Scene', 'Scene/', 'Scene/abc', 'Scene/*[name=x]',
+                     'Scene/*[class]', 'Scene/*[super_class=x]'):
+            with self.assertRaises(QueryError, msg=text):
+                compile_query(text)
+
+
+class EvaluateTests(unittest.TestCase):
+    def setUp(self):
+        self.ba = bytes.fromhex(
+            '60 00 1C 00 00 80 '
+            '   10 00 0A 00 00 00 07 00 00 00 '
+            '   70 00 0C 00 00 80 '
+            '       20 00 06 00 00 00 '
+            '60 00 0C 00 00 80 '
+            '   70 00 06 00 00 80'
+        )
+
+    def test_values_and_containers(self):
+        q = compile_query('Stream/0x60/*')
+        chunks = q.evaluate(self.ba)
+        self.assertEqual([(c.idn, c.depth, c.index) for c in chunks],
+                         [(0x10, 1, 0), (0x70, 1, 1), (0x70, 1, 0)])
+        chunk = list(compile_query('Stream/0x60/0x70').evaluate(self.ba))[0]
+        self.assertEqual([c.idn for c in chunk.childs], [0x20])
+
+    def test_lazy(self):
+        results = compile_query('Stream/0x60').evaluate(self.ba)
+        self.assertEqual(next(results).offset, 0)
+        self.assertEqual(next(results).offset, 28)
+
+    def test_max_file(self):
+        max_fname = str(BASE_DIR / 'data/07-standard-17_physical_cameras.max')
+        names = [c.parsed for c in
+                 query(max_fname, 'DllDirectory/0x2038/0x2037')]
+        dlls = sp.storage_parse(max_fname, 'DllDirectory', compact=True)
+        self.assertEqual(names, [c.childs[1].parsed for c in dlls
+                                 if c.idn == 0x2038])
+        names = [c.parsed for c in
+                 query(max_fname, 'Scene/*/*[class=Node]/0x962')]
+        self.assertTrue(set(dump_cameras(max_fname)) <= set(names))
+        cameras = list(query(max_fname, 'Scene/*/*[super_class=0x20]'))
+        self.assertEqual(len(cameras), 17)
@@ -0,0 +1,81 @@
+"""Unit tests for scene_index.
+"""
+import unittest
+import pathlib
+from struct import iter_unpack
+
+from max_dump.dump_cameras import CAMERA_SUPER_CLASS_ID, dump_cameras
+from max_dump.max_file import MaxFile
+from max_dump.scene_index import NODE_REFS_IDN, OBJECT_NAME_IDN, SceneIndex
+from max_dump.storage_parser import ClassHeader
+
+
+BASE_DIR = pathlib.Path(__file__).parent
+
+
+class SceneIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.class_list = [
+            ("Node", ClassHeader(0, (1, 0), 1)),
+            ("Camera", ClassHeader(0, (2, 0), CAMERA_SUPER_CLASS_ID)),
+        ]
+        # Scene: Node "A" -> [1, 2], Camera, Node "B" -> [1]
+        self.ba = bytes.fromhex(
+            '22 20 40 00 00 80 '
+            '   00 00 1A 00 00 80 '
+            '       62 09 08 00 00 00 41 00 '
+            '       35 20 0E 00 00 00 01 00 00 00 02 00 00 00 '
+            '   01 00 06 00 00 80 '
+            '   00 00 16 00 00 80 '
+            '       62 09 08 00 00 00 42 00 '
+            '       35 20 0A 00 00 00 01 00 00 00'
+        )
+
+    def test_index(self):
+        index = SceneIndex.from_buffer(self.ba, self.class_list)
+        self.assertEqual(len(index), 3)
+        self.assertEqual(list(index.classes), [0, 1, 0])
+        self.assertEqual(index.names, {0: 'A', 2: 'B'})
+        self.assertEqual(list(index.ref_offsets), [0, 2, 2, 3])
+        self.assertEqual(list(index.refs(0)), [1, 2])
+        self.assertEqual(list(index.referrers_of(1)), [0, 2])
+        self.assertEqual(list(index.referrers_of(2)), [0])
+        self.assertEqual(index.nodes_referencing(1), [0, 2])
+        self.assertEqual(list(index.objects_of_class(0)), [0, 2])
+        self.assertEqual(index.objects_of_class_name("Camera"), [1])
+        self.assertEqual(
+            index.objects_of_super_class(CAMERA_SUPER_CLASS_ID), [1]
+        )
+        self.assertEqual(index.class_name(2), "Node")
+        self.assertEqual(dump_cameras(index), ['A', 'B'])
+
+    def test_node_without_name(self):
+        # Node "B" has no name.
+        ba = bytes.fromhex(
+            '22 20 38 00 00 80 '
+            '   00 00 1A 00 00 80 '
+            '       62 09 08 00 00 00 41 00 '
+            '       35 20 0E 00 00 00 01 00 00 00 02 00 00 00 '
+            '   01 00 06 00 00 80 '
+            '   00 00 10 00 00 80 '
+            '       35 20 0A 00 00 00 01 00 00 00'
+        )
+        index = SceneIndex.from_buffer(ba, self.class_list)
+        self.assertEqual(index.names, {0: 'A'})
+        self.assertEqual(index.name(0), 'A')
+        with self.assertRaises(AssertionError):
+            dump_cameras(index)
+
+    def test_same_as_chunks(self):
+        max_fname = str(BASE_DIR / 'data/2017_many_cams_and_other_stuff.max')
+        index = SceneIndex.from_max_file(max_fname)
+        with MaxFile(max_fname) as max_file:
+            scene = max_file.parse_stream("Scene")[0].childs
+        self.assertEqual(len(index), len(scene))
+        for node in index.objects_of_class_name("Node"):
+            childs = {child.idn: child for child in scene[node].childs}
+            self.assertEqual(index.names[node],
+                             childs[OBJECT_NAME_IDN].parsed)
+            refs = childs[NODE_REFS_IDN].value
+            self.assertEqual(list(index.refs(node)),
+                             [i for i, in iter_unpack('<i', refs)])
@@ -0,0 +1,74 @@
+"""Unit tests for snapshot.
+"""
+import os
+import tempfile
+import unittest
+import pathlib
+
+from max_dump import snapshot as sn
+from max_dump import storage_parser as sp
+from max_dump.max_file import MaxFile
+
+
+BASE_DIR = pathlib.Path(__file__).parent
+
+
+class SnapshotTests(unittest.TestCase):
+    def setUp(self):
+        self.ba = bytes.fromhex(
+            '60 00 1C 00 00 80 '
+            '   10 00 0A 00 00 00 07 00 00 00 '
+            '   70 00 0C 00 00 80 '
+            '       20 00 06 00 00 00 '
+            '60 00 00 00 00 00 16 00 00 00 00 00 00 80 '
+            '   62 09 08 00 00 00 41 00'
+        )
+        self.snapshot = sn.Snapshot(sn.snapshot_bytes(self.ba, 'Test'))
+
+    def test_nodes(self):
+        snapshot = self.snapshot
+        self.assertEqual(snapshot.stream_name, 'Test')
+        self.assertEqual(len(snapshot), 6)
+        self.assertEqual(snapshot.roots(), [0, 4])
+        self.assertEqual(snapshot.children(0), [1, 2])
+        self.assertEqual(snapshot.children(2), [3])
+        self.assertEqual(snapshot.children(3), [])
+        self.assertEqual(
+            snapshot.node(4),
+            sn.NodeRecord(0x60, sn.CONTAINER_FLAG | sn.EXTENDED_FLAG, 28, 8,
+                          sn.NO_NODE, 5, sn.NO_NODE)
+        )
+        self.assertEqual(snapshot.node(1).next_sibling, 2)
+        self.assertEqual(snapshot.find(0x962), [5])
+        self.assertEqual(bytes(snapshot.value(1)), b'\x07\x00\x00\x00')
+        self.assertEqual(bytes(snapshot.value(5)), b'A\x00')
+        with self.assertRaises(sn.SnapshotError):
+            snapshot.value(0)
+
+    def test_chunks(self):
+        expected = sp.parse_chunks(self.ba)
+        chunks = self.snapshot.chunks()
+        self.assertEqual([chunk.asdict() for chunk in chunks],
+                         [chunk.asdict() for chunk in expected])
+        self.assertEqual(chunks[1].childs[0].parsed, 'A')
+        self.assertEqual(chunks[1].childs[0].depth, 1)
+        self.assertEqual(chunks[0].childs[1].index, 1)
+
+    def test_invalid(self):
+        data = sn.snapshot_bytes(self.ba)
+        for bad in (b'', b'XXXX' + data[4:], data[:4] + b'\x02' + data[5:],
+                    data[:-1]):
+            with self.assertRaises(sn.SnapshotError):
+                sn.Snapshot(bad)
+
+    def test_file(self):
+        max_fname = str(BASE_DIR / 'data/01-teapot_no_cams_vray.max')
+        fd, fname = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, fname)
+        with MaxFile(max_fname) as max_file:
+            sn.export_stream(max_file, 'Scene', fname)
+            expected = max_file.storage_parse('Scene')
+        with sn.Snapshot(fname) as snapshot:
+            chunks = snapshot.chunks()
+        self.assertEqual([chunk.asdict() for chunk in chunks], expected)
@@ -1,13 +1,18 @@
 """Not yet a unittest.
 """
+import io
 import os
 import json
 import unittest
+from unittest import mock
 import pathlib
+import sys
 
 import attr
+import olefile
 
 import max_dump
+import max_dump.storage_parser as sp
 from max_dump.storage_parser import extract_vpq
 
 
@@ -23,4 +28,310 @@ class SimpleTest(unittest.TestCase):
         res_json = str(BASE_DIR / './data/01-teapot_no_cams_vray_storage_vpq.json')
         with open(res_json) as fin:
             serialized_old = fin.read().strip()
-        self.assertEqual(serialized, serialized_old)
\ No newline at end of file
+        self.assertEqual(serialized, serialized_old)
+
+
+class ParseBufferTest(unittest.TestCase):
+    def test_values_are_views(self):
+        ba = bytes.fromhex(
+            '50 00 0A 00 00 00 01 00 00 00 '
+            '60 00 0C 00 00 80 '
+            '   20 00 06 00 00 00'
+        )
+        nodes = sp.parse_buffer(ba)
+        self.assertEqual(len(nodes), 2)
+        self.assertIsInstance(nodes[0].value, memoryview)
+        self.assertIs(nodes[0].value.obj, ba)
+        self.assertEqual(nodes[0].value_bytes, b'\x01\x00\x00\x00')
+        self.assertEqual(nodes[1].header.storage_type, sp.StorageType.CONTAINER)
+        self.assertEqual(nodes[1].childs[0].value_bytes, b'')
+
+    def test_extended_header(self):
+        ba = bytes.fromhex(
+            '12 20 00 00 00 00 18 00 00 00 00 00 00 80 '
+            '   62 09 0A 00 00 00 41 00 42 00'
+        )
+        nodes = sp.parse_buffer(ba)
+        self.assertEqual(nodes[0].header.idn, 0x2012)
+        self.assertEqual(nodes[0].header.length, 10)
+        self.assertEqual(nodes[0].childs[0].parsed, 'AB')
+
+    def test_truncated_header(self):
+        with self.assertRaises(sp.StorageException):
+            sp.parse_buffer(b'\x50\x00\x0a')
+
+    def test_dict_rendering(self):
+        ba = bytes.fromhex('50 00 0A 00 00 00 01 00 00 00')
+        self.assertEqual(sp.read_container(io.BytesIO(ba), len(ba)), [{
+            "ascii": "....",
+            "header": {"idn": "0x50", "storage_type_name": "VALUE"},
+            "hex_spaced": "01 00 00 00",
+            "parsed": None,
+        }])
+
+
+class IterChunksTest(unittest.TestCase):
+    def test_events(self):
+        ba = bytes.fromhex(
+            '50 00 0A 00 00 00 01 00 00 00 '
+            '60 00 0C 00 00 80 '
+            '   20 00 06 00 00 00'
+        )
+        events = [(e.kind, e.idn, e.depth, e.offset, e.length)
+                  for e in sp.iter_chunks(ba)]
+        self.assertEqual(events, [
+            (sp.VALUE, 0x50, 0, 0, 4),
+            (sp.ENTER, 0x60, 0, 10, 6),
+            (sp.VALUE, 0x20, 1, 16, 0),
+            (sp.EXIT, 0x60, 0, 10, 6),
+        ])
+
+    def test_storage_iter(self):
+        max_fname = str(BASE_DIR / 'data/01-teapot_no_cams_vray.max')
+        events = sp.storage_iter(max_fname, 'VideoPostQueue')
+        tree = [sp.asdict(node) for node in sp.build_tree(events)]
+        self.assertEqual(tree, extract_vpq(max_fname))
+
+
+def _recursive_events(buf, offset, length, depth, events):
+    """The recursive walk the explicit stack parser replaced.
+    """
+    pos = offset
+    while pos - offset < length:
+        start = pos
+        header, pos = sp.read_header_at(buf, pos)
+        event = (header.idn, depth, start, header.length)
+        if header.storage_type.is_container():
+            events.append((sp.ENTER, ) + event)
+            pos = _recursive_events(buf, pos, header.length, depth + 1,
+                                    events)
+            events.append((sp.EXIT, ) + event)
+        else:
+            events.append((sp.VALUE, ) + event)
+            pos += header.length
+    return pos
+
+
+class IterativeParserTest(unittest.TestCase):
+    def test_same_as_recursive_on_test_data(self):
+        for max_fname in sorted((BASE_DIR / 'data').glob('*.max')):
+            ole = olefile.OleFileIO(str(max_fname))
+            stream_names = ['/'.join(x) for x in ole.listdir()]
+            ole.close()
+            for stream_name in stream_names:
+                ba = memoryview(sp.read_stream(str(max_fname), stream_name))
+                try:
+                    expected = []
+                    _recursive_events(ba, 0, len(ba), 0, expected)
+                except sp.StorageException:
+                    with self.assertRaises(sp.StorageException):
+                        list(sp.iter_chunks(ba))
+                    continue
+                events = [(e.kind, e.idn, e.depth, e.offset, e.length)
+                          for e in sp.iter_chunks(ba)]
+                self.assertEqual(events, expected,
+                                 (max_fname.name, stream_name))
+
+    def test_deep_nesting(self):
+        depth = sys.getrecursionlimit() * 2
+        ba = b'\x20\x00\x06\x00\x00\x00'
+        for _ in range(depth):
+            length = (len(ba) + sp.HEADER_LENGTH) | 1 << 31
+            ba = b'\x60\x00' + length.to_bytes(4, 'little') + ba
+        nodes = sp.parse_buffer(ba)
+        node = nodes[0]
+        while node.header.storage_type.is_container():
+            node = node.childs[0]
+        self.assertEqual(node.depth, depth)
+
+
+@unittest.skipIf(sp.np is None, "numpy is not installed")
+class ChunkTableTest(unittest.TestCase):
+    def test_table(self):
+        ba = bytes.fromhex(
+            '50 00 0A 00 00 00 01 00 00 00 '
+            '60 00 00 00 00 00 14 00 00 00 00 00 00 80 '
+            '   20 00 06 00 00 00'
+        )
+        table, buf = sp.chunk_table(ba)
+        self.assertIs(buf.obj, ba)
+        self.assertEqual(table.tolist(), [
+            (0, 0x50, 6, 4, False, 0, -1),
+            (10, 0x60, 14, 6, True, 0, -1),
+            (24, 0x20, 6, 0, False, 1, 1),
+        ])
+
+    def test_storage_chunk_table(self):
+        max_fname = str(BASE_DIR / 'data/01-teapot_no_cams_vray.max')
+        table, _ = sp.storage_chunk_table(max_fname, 'ClassDirectory3')
+        events = [e for e in sp.storage_iter(max_fname, 'ClassDirectory3')
+                  if e.kind != sp.EXIT]
+        self.assertEqual(len(table), len(events))
+        self.assertEqual(table['idn'].tolist(),
+                         [e.idn for e in events])
+
+
+class CompactChunkTest(unittest.TestCase):
+    def test_chunks(self):
+        ba = bytes.fromhex(
+            '50 00 0A 00 00 00 01 00 00 00 '
+            '60 00 0C 00 00 80 '
+            '   62 09 06 00 00 00'
+        )
+        chunks = sp.parse_chunks(ba)
+        self.assertEqual([c.idn for c in chunks], [0x50, 0x60])
+        self.assertEqual(chunks[0].value_bytes, b'\x01\x00\x00\x00')
+        self.assertIs(chunks[0].value.obj, ba)
+        self.assertEqual(chunks[1].childs[0].idn, 0x962)
+        self.assertEqual(chunks[1].childs[0].depth, 1)
+        self.assertEqual(chunks[1].childs[0].storage_type,
+                         sp.StorageType.SCENE_OBJECT_NAME)
+        self.assertFalse(hasattr(chunks[0], '__dict__'))
+
+    def test_same_dicts(self):
+        max_fname = str(BASE_DIR / 'data/01-teapot_no_cams_vray.max')
+        chunks = sp.storage_parse(max_fname, 'ClassDirectory3', compact=True)
+        ba = sp.read_stream(max_fname, 'ClassDirectory3')
+        self.assertEqual([c.asdict() for c in chunks],
+                         [sp.asdict(node) for node in sp.parse_buffer(ba)])
+
+
+class RepresentationTest(unittest.TestCase):
+    def setUp(self):
+        self.ba = bytes.fromhex('62 09 0A 00 00 00 41 00 42 00')
+
+    def test_lazy_and_cached(self):
+        chunk, = sp.parse_chunks(self.ba)
+        with mock.patch('hexdump.dump', return_value='41 00 42 00') as dump:
+            chunk.asdict(representations=('parsed', ))
+            dump.assert_not_called()
+            self.assertEqual(chunk.hex_spaced, '41 00 42 00')
+            self.assertEqual(chunk.hex_spaced, '41 00 42 00')
+            dump.assert_called_once()
+
+    def test_chosen_representations(self):
+        node, = sp.parse_buffer(self.ba)
+        rendered = sp.asdict(node, representations=('utf_16', 'parsed'))
+        self.assertEqual(rendered, {
+            "header": {"idn": "0x962",
+                       "storage_type_name": "SCENE_OBJECT_NAME"},
+            "utf_16": "AB",
+            "parsed": "AB",
+        })
+
+    def test_dump_cameras_does_not_hexdump(self):
+        max_fname = str(BASE_DIR / 'data/07-standard-17_physical_cameras.max')
+        with mock.patch('hexdump.dump', side_effect=AssertionError):
+            self.assertTrue(max_dump.dump_cameras(max_fname))
+
+
+class ParseStatsTest(unittest.TestCase):
+    def setUp(self):
+        self.ba = bytes.fromhex(
+            '50 00 0A 00 00 00 01 00 00 00 '
+            '60 00 10 00 00 80 '
+            '   62 09 0A 00 00 00 41 00 42 00'
+        )
+
+    def test_counters(self):
+        with sp.ParseStats() as stats:
+            chunks = sp.parse_chunks(self.ba, 'Test')
+            chunks[1].childs[0].parsed
+        counters = stats.asdict()
+        stream = counters['streams']['Test']
+        self.assertEqual(
+            (stream['count'], stream['containers'], stream['values'],
+             stream['payload_bytes'], stream['max_depth']),
+            (3, 1, 2, 8, 1)
+        )
+        self.assertEqual(stream['idns']['0x962']['payload_bytes'], 4)
+        self.assertEqual(counters['decoders']['0x962']['calls'], 1)
+        self.assertEqual(counters['decoders']['0x962']['decoder'],
+                         'utf_16_decode')
+
+    def test_inactive(self):
+        stats = sp.ParseStats()
+        with stats:
+            pass
+        sp.parse_chunks(self.ba, 'Test')[1].childs[0].parsed
+        self.assertEqual(stats.asdict(), {'streams': {}, 'decoders': {}})
+        self.assertIsNone(sp._stats)
+
+
+class KnownTypesTest(unittest.TestCase):
+    def test_class_header(self):
+        ba = bytes.fromhex(
+            '60 20 16 00 00 00 '
+            '   FF FF FF FF 8F F5 01 00 9F A2 03 00 60 11 00 00'
+        )
+        chunk, = sp.parse_chunks(ba)
+        self.assertEqual(chunk.storage_type, sp.StorageType.CLASS_HEADER)
+        self.assertEqual(chunk.parsed,
+                         sp.ClassHeader(-1, (0x1f58f, 0x3a29f), 0x1160))
+        self.assertEqual(chunk.asdict(representations=('parsed', )), {
+            "header": {"idn": "0x2060", "storage_type_name": "CLASS_HEADER"},
+            "parsed": {
+                "dll_index": -1,
+                "class_id": ["0x3a29f", "0x1f58f"],
+                "super_class_id": "0x1160",
+            },
+        })
+
+    def test_class_entry(self):
+        ba = bytes.fromhex(
+            '40 20 1C 00 00 80 '
+            '   60 20 16 00 00 00 '
+            '       FF FF FF FF 8F F5 01 00 9F A2 03 00 60 11 00 00'
+        )
+        entry, = sp.parse_chunks(ba)
+        self.assertEqual(entry.storage_type, sp.StorageType.CLASS_ENTRY)
+        self.assertTrue(entry.is_container())
+        self.assertEqual(entry.childs[0].storage_type,
+                         sp.StorageType.CLASS_HEADER)
+
+
+class SelectTest(unittest.TestCase):
+    def setUp(self):
+        self.ba = bytes.fromhex(
+            '50 00 0A 00 00 00 01 00 00 00 '
+            '60 00 1C 00 00 80 '
+            '   10 00 0A 00 00 00 07 00 00 00 '
+            '   70 00 0C 00 00 80 '
+            '       20 00 06 00 00 00 '
+            '62 09 06 00 00 00'
+        )
+
+    def test_idns(self):
+        chunks = sp.parse_chunks(self.ba, select={0x60, 0x70, 0x962})
+        self.assertEqual([(c.idn, c.index) for c in chunks],
+                         [(0x60, 1), (0x962, 2)])
+        self.assertEqual([(c.idn, c.index) for c in chunks[0].childs],
+                         [(0x70, 1)])
+        self.assertEqual(chunks[0].childs[0].childs, [])
+
+    def test_predicate(self):
+        calls = []
+
+        def select(path, idn, depth):
+            calls.append((path, idn, depth))
+            return depth == 0 or path == (0x60, )
+        events = [(e.kind, e.idn, e.index)
+                  for e in sp.iter_chunks(self.ba, select=select)]
+        self.assertEqual(events, [
+            (sp.VALUE, 0x50, 0),
+            (sp.ENTER, 0x60, 1),
+            (sp.VALUE, 0x10, 0),
+            (sp.ENTER, 0x70, 1),
+            (sp.EXIT, 0x70, 1),
+            (sp.EXIT, 0x60, 1),
+            (sp.VALUE, 0x962, 2),
+        ])
+        self.assertIn(((0x60, 0x70), 0x20, 2), calls)
+
+    def test_select_everything(self):
+        for max_fname in sorted((BASE_DIR / 'data').glob('*.max')):
+            ba = sp.read_stream(str(max_fname), 'Scene')
+            self.assertEqual(
+                list(sp.iter_chunks(ba, select=lambda *args: True)),
+                list(sp.iter_chunks(ba)), max_fname.name
+            )
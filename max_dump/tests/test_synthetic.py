@@ -0,0 +1,62 @@
+"""Unit tests for synthetic.
+"""
+import os
+import tempfile
+import unittest
+
+from max_dump import storage_parser as sp
+from max_dump import synthetic as sy
+from max_dump.dump_cameras import dump_cameras
+from max_dump.max_file import MaxFile
+from max_dump.scene_index import SceneIndex
+
+
+class GenerateTests(unittest.TestCase):
+    def setUp(self):
+        fd, self.fname = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, self.fname)
+
+    def test_parsed_back(self):
+        spec = sy.Spec(objects=300, depth=3, seed=7)
+        manifest = sy.generate(self.fname, spec)
+        self.assertEqual(len(manifest.node_names), 75)
+        self.assertEqual(len(manifest.cameras), 8)
+        self.assertEqual(dump_cameras(self.fname), manifest.cameras)
+        index = SceneIndex.from_max_file(self.fname)
+        self.assertEqual(list(index.classes), manifest.object_classes)
+        self.assertEqual(index.names, manifest.node_names)
+        with MaxFile(self.fname) as max_file:
+            names = [entry.childs[1].parsed
+                     for entry in max_file.class_directory]
+            self.assertEqual(names, manifest.classes)
+            self.assertEqual(len(max_file.dll_directory), spec.dlls + 1)
+            scene = max_file.read_stream('Scene')
+            self.assertEqual(len(scene), manifest.stream_sizes['Scene'])
+            depth = max(event.depth for event in sp.iter_chunks(scene))
+        # the Scene container, the object and the nested containers
+        self.assertEqual(depth, 1 + 1 + spec.depth)
+
+    def test_deterministic(self):
+        streams, _ = sy.build_streams(sy.Spec(objects=100, seed=1))
+        same, _ = sy.build_streams(sy.Spec(objects=100, seed=1))
+        other, _ = sy.build_streams(sy.Spec(objects=100, seed=2))
+        self.assertEqual(streams, same)
+        self.assertNotEqual(streams['Scene'], other['Scene'])
+
+    def test_extended_headers(self):
+        spec = sy.Spec(objects=50, extended_ratio=1, seed=3)
+        manifest = sy.generate(self.fname, spec)
+        self.assertEqual(dump_cameras(self.fname), manifest.cameras)
+        scene = sp.read_stream(self.fname, 'Scene')
+        self.assertTrue(all(event.header.header_length == 14
+                            for event in sp.iter_chunks(scene)
+                            if event.kind != sp.EXIT))
+
+    def test_ratios(self):
+        _, manifest = sy.build_streams(
+            sy.Spec(objects=20, node_ratio=0.5, camera_ratio=1, depth=0)
+        )
+        self.assertEqual(len(manifest.cameras), 10)
+        with self.assertRaises(ValueError):
+            sy.Spec(node_ratio=0.6)
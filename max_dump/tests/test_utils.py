@@ -64,6 +64,9 @@ class UtilsTest(unittest.TestCase):
         self.assertEqual(a_hex, 'ffffffffffffffd6')
         self.assertEqual(b_hex, '7fffffffffffffd6')
 
+    def test_bin2ascii(self):
+        self.assertEqual(utils.bin2ascii(b'ab\x00\xffc'), 'ab..c')
+
     def test_index_by(self):
         l = [{"id": 1, "age": 30}, {"id": 2, "age": 31}, ]
         k = utils.index_by(l, "id")
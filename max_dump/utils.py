@@ -1,3 +1,4 @@
+import string
 from collections import defaultdict
 from struct import unpack, calcsize
 
@@ -9,6 +10,13 @@ def read_int(bio):
     return unpack('i', bio.read(INT_S))[0]
 
 
+def bin2ascii(ba):
+    """Return printable ascii characters of `ba', the rest become dots.
+    """
+    s = bytes(ba).decode('ascii', 'replace')
+    return ''.join(x if x in string.printable else '.' for x in s)
+
+
 def _new_key(entry, key):
     new_key = entry
     for sub_key in key.split('__'):
@@ -64,7 +64,8 @@ setup(
     # You can just specify the packages manually here if your project is
     # simple. Or you can use find_packages().
     #  packages='max_dump',
-    packages=find_packages(exclude=['contrib', 'docs', 'tests']),
+    packages=find_packages(exclude=['contrib', 'docs', 'tests',
+                                    'benchmarks', 'benchmarks.*']),
 
 
     # Alternatively, if you want to distribute just a my_module.py, uncomment
@@ -82,6 +83,7 @@ setup(
     # for example:
     # $ pip install -e .[dev,test]
     extras_require={
+        'table': ['numpy'],
         #  'dev': ['check-manifest'],
         #  'test': ['coverage'],
     },